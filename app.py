@@ -1,19 +1,41 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash, abort
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash, abort, Response, stream_with_context, has_request_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf import FlaskForm
 from flask_wtf.csrf import CSRFProtect, generate_csrf
 from wtforms import StringField, PasswordField, SubmitField, IntegerField, SelectField, DateField, TextAreaField
 from wtforms.validators import DataRequired, NumberRange, Email, Optional, Length
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DisconnectionError, IntegrityError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.hybrid import hybrid_property
 from werkzeug.security import generate_password_hash, check_password_hash
-from functools import wraps
+from werkzeug.utils import secure_filename
+from email_validator import validate_email, EmailNotValidError
+from functools import lru_cache, wraps
 from datetime import datetime, timedelta
+import base64
 import json
 import csv
 import io
 import os
 import logging
+import time
 from logging.handlers import RotatingFileHandler
 from collections import Counter
+from types import SimpleNamespace
+from typing import NamedTuple
+
+import search
+from audit import AuditWriter
+from cache import ViewCache, create_backend
+from engine_profile import apply_sqlite_pragmas
+from metrics import Instrumentation
+from prefix_index import PrefixIndex
+from profiler import Profiler
+from replica import ReplicaRouter, RoutingSession, use_primary, use_replica
+from write_coordinator import WriteCoordinator
+from config import Config
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -22,16 +44,77 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or 'dev-key-change-this-in-production'
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or 'sqlite:///inventory.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = Config.engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+app.config['SQLITE_PRAGMAS'] = Config.SQLITE_PRAGMAS
+if Config.DATABASE_READ_URL:
+    app.config['SQLALCHEMY_BINDS'] = {
+        'replica': {'url': Config.DATABASE_READ_URL, **Config.engine_options(Config.DATABASE_READ_URL)}
+    }
+app.config['REPLICA_RETRY_INTERVAL'] = Config.REPLICA_RETRY_INTERVAL
+app.config['REPLICA_STICKY_SECONDS'] = Config.REPLICA_STICKY_SECONDS
+app.config['WRITE_COORDINATOR_ENABLED'] = Config.WRITE_COORDINATOR_ENABLED
+app.config['WRITE_BATCH_SIZE'] = Config.WRITE_BATCH_SIZE
+app.config['WRITE_BATCH_DELAY'] = Config.WRITE_BATCH_DELAY
+app.config['WRITE_TIMEOUT'] = Config.WRITE_TIMEOUT
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(minutes=30)
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
+app.config['ITEMS_PER_PAGE'] = Config.ITEMS_PER_PAGE
+app.config['MAX_ITEMS_PER_PAGE'] = Config.MAX_ITEMS_PER_PAGE
+app.config['STOCK_SNAPSHOT_HOURLY'] = Config.STOCK_SNAPSHOT_HOURLY
+app.config['MAX_ANALYTICS_POINTS'] = Config.MAX_ANALYTICS_POINTS
+app.config['IMPORT_EXTENSIONS'] = Config.IMPORT_EXTENSIONS
+app.config['IMPORT_BATCH_SIZE'] = Config.IMPORT_BATCH_SIZE
+app.config['IMPORT_MAX_REPORTED_ERRORS'] = Config.IMPORT_MAX_REPORTED_ERRORS
+app.config['AUDIT_BUFFER_ENABLED'] = Config.AUDIT_BUFFER_ENABLED
+app.config['AUDIT_BATCH_SIZE'] = Config.AUDIT_BATCH_SIZE
+app.config['AUDIT_FLUSH_INTERVAL'] = Config.AUDIT_FLUSH_INTERVAL
+app.config['AUDIT_FALLBACK_FILE'] = Config.AUDIT_FALLBACK_FILE
+app.config['ARCHIVE_ASSIGNMENTS_AFTER_DAYS'] = Config.ARCHIVE_ASSIGNMENTS_AFTER_DAYS
+app.config['ARCHIVE_ACTIVITY_LOGS_AFTER_DAYS'] = Config.ARCHIVE_ACTIVITY_LOGS_AFTER_DAYS
+app.config['ARCHIVE_BATCH_SIZE'] = Config.ARCHIVE_BATCH_SIZE
+app.config['CACHE_BACKEND'] = Config.CACHE_BACKEND
+app.config['CACHE_REDIS_URL'] = Config.CACHE_REDIS_URL
+app.config['CACHE_DEFAULT_TTL'] = Config.CACHE_DEFAULT_TTL
+app.config['CACHE_MAX_ENTRIES'] = Config.CACHE_MAX_ENTRIES
+app.config['AUTOCOMPLETE_CHECK_INTERVAL'] = Config.AUTOCOMPLETE_CHECK_INTERVAL
+app.config['METRICS_ENABLED'] = Config.METRICS_ENABLED
+app.config['METRICS_TOKEN'] = Config.METRICS_TOKEN
+app.config['SLOW_QUERY_THRESHOLD_MS'] = Config.SLOW_QUERY_THRESHOLD_MS
+app.config['PROFILE_SAMPLE_RATE'] = Config.PROFILE_SAMPLE_RATE
+app.config['PROFILE_ENDPOINTS'] = Config.PROFILE_ENDPOINTS
+app.config['PROFILE_INTERVAL_MS'] = Config.PROFILE_INTERVAL_MS
+app.config['PROFILE_MAX_STORED'] = Config.PROFILE_MAX_STORED
 
 # Ensure upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 # Initialize extensions
-db = SQLAlchemy(app)
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
 csrf = CSRFProtect(app)
+with app.app_context():
+    apply_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+    if 'replica' in db.engines:
+        # The journal mode is the business of whatever keeps the copy in sync
+        apply_sqlite_pragmas(db.engines['replica'], {
+            name: value for name, value in app.config['SQLITE_PRAGMAS'].items() if name != 'journal_mode'
+        })
+def cache_scope():
+    """Keep results read from the replica apart from those read from the
+    primary, and let users who just wrote (kept on the primary by
+    read_replica) skip the cache, which may hold results computed before
+    their write reached the replica or this process."""
+    if db.session.info.get('replica_router'):
+        return 'replica'
+    if has_request_context() and session.get('primary_until', 0) >= time.time():
+        return None
+    return 'primary'
+
+view_cache = ViewCache(
+    create_backend(app.config['CACHE_BACKEND'], app.config['CACHE_MAX_ENTRIES'], app.config['CACHE_REDIS_URL']),
+    default_ttl=app.config['CACHE_DEFAULT_TTL'],
+    scope=cache_scope
+)
 
 # Configure logging
 if not app.debug:
@@ -45,6 +128,42 @@ if not app.debug:
     app.logger.setLevel(logging.INFO)
     app.logger.info('Inventory System Startup')
 
+# Request latency, SQL and pool metrics for /metrics; slow statements are
+# logged with the route that ran them
+instrumentation = Instrumentation(
+    slow_query_threshold=app.config['SLOW_QUERY_THRESHOLD_MS'] / 1000,
+    slow_query_logger=app.logger
+)
+if app.config['METRICS_ENABLED']:
+    instrumentation.init_app(app)
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            instrumentation.instrument_engine(engine, bind or 'primary')
+
+def cache_metrics():
+    views = view_cache.stats()['views']
+    return [
+        ('inventory_cache_hits_total', 'counter', 'View cache hits',
+         [({'view': view}, counts['hits']) for view, counts in views.items()]),
+        ('inventory_cache_misses_total', 'counter', 'View cache misses',
+         [({'view': view}, counts['misses']) for view, counts in views.items()]),
+        ('inventory_cache_hit_ratio', 'gauge', 'View cache hit rate since startup',
+         [({'view': view}, counts['hit_rate'] or 0) for view, counts in views.items()]),
+    ]
+
+instrumentation.registry.register_collector(cache_metrics)
+
+# Sampling profiles of a fraction of requests, or of admin requests sent
+# with X-Profile: 1, downloadable from /admin/profiles
+profiler = Profiler(
+    sample_rate=app.config['PROFILE_SAMPLE_RATE'],
+    endpoints=app.config['PROFILE_ENDPOINTS'],
+    interval=app.config['PROFILE_INTERVAL_MS'] / 1000,
+    max_profiles=app.config['PROFILE_MAX_STORED'],
+    authorize=lambda: bool(session.get('is_admin'))
+)
+profiler.init_app(app)
+
 # Database Models
 class User(db.Model):
     __tablename__ = 'users'
@@ -64,6 +183,12 @@ class User(db.Model):
 
 class ActivityLog(db.Model):
     __tablename__ = 'activity_logs'
+    __table_args__ = (
+        db.Index('ix_activity_logs_timestamp', 'timestamp'),
+        # audit trail filtered by user or action, newest first
+        db.Index('ix_activity_logs_user_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_activity_logs_action_timestamp', 'action', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
@@ -74,6 +199,10 @@ class ActivityLog(db.Model):
 
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        # category filter, and the store listing sorted by category within one
+        db.Index('ix_products_category_id', 'category', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -88,12 +217,45 @@ class Product(db.Model):
     # Relationships
     assignments = db.relationship('ProductAssignment', backref='product', lazy=True)
     
-    @property
+    @hybrid_property
     def is_low_stock(self):
         return self.quantity <= self.min_stock_level
+    
+    @is_low_stock.expression
+    def is_low_stock(cls):
+        # Same test written as a difference so ix_products_low_stock can serve it
+        return cls.quantity - cls.min_stock_level <= 0
+
+# A plain index cannot compare two columns of the same row, so index the difference
+db.Index('ix_products_low_stock', Product.quantity - Product.min_stock_level)
+# store listing: one index per sort key (see STORE_SORTS), with and without
+# a category filter, so every page is a seek instead of a scan and sort
+# (the '' is a literal, not a bound parameter, so that SQLite matches the
+# sort expression to the index)
+PRODUCT_CATEGORY_SORT = db.func.coalesce(Product.category, db.literal_column("''"))
+db.Index('ix_products_name_id', Product.name, Product.id)
+db.Index('ix_products_quantity_id', Product.quantity, Product.id)
+db.Index('ix_products_category_sort', PRODUCT_CATEGORY_SORT, Product.id)
+db.Index('ix_products_category_name_id', Product.category, Product.name, Product.id)
+db.Index('ix_products_category_quantity_id', Product.category, Product.quantity, Product.id)
+
+# WHERE clause of the partial indexes over open assignments
+OPEN_ASSIGNMENT = db.text("status = 'assigned'")
 
 class ProductAssignment(db.Model):
     __tablename__ = 'product_assignments'
+    __table_args__ = (
+        # Open assignments are a small, stable subset of an ever-growing
+        # history, so their lookups get partial indexes covering only them
+        db.Index('ix_product_assignments_open_student', 'student_id', 'product_id',
+                 sqlite_where=OPEN_ASSIGNMENT, postgresql_where=OPEN_ASSIGNMENT),
+        db.Index('ix_product_assignments_open_product', 'product_id',
+                 sqlite_where=OPEN_ASSIGNMENT, postgresql_where=OPEN_ASSIGNMENT),
+        db.Index('ix_product_assignments_open_assigned_date', 'assigned_date',
+                 sqlite_where=OPEN_ASSIGNMENT, postgresql_where=OPEN_ASSIGNMENT),
+        # reports date ranges, recent assignments
+        db.Index('ix_product_assignments_assigned_date', 'assigned_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
@@ -105,9 +267,26 @@ class ProductAssignment(db.Model):
     
     # Relationships
     student = db.relationship('Student', backref='assignments', lazy=True)
+    
+    @hybrid_property
+    def is_open(self):
+        return self.status == 'assigned'
+    
+    @is_open.expression
+    def is_open(cls):
+        # Rendered as a literal: SQLite only uses a partial index when the
+        # query repeats the index's WHERE clause, which a bound parameter does not
+        return cls.status == db.literal('assigned', literal_execute=True)
 
 class Student(db.Model):
     __tablename__ = 'students'
+    __table_args__ = (
+        db.Index('ix_students_department', 'department'),
+        # students listing by name, whole roster or one department
+        db.Index('ix_students_full_name_id', 'full_name', 'id'),
+        db.Index('ix_students_department_full_name_id', 'department', 'full_name', 'id'),
+        db.Index('ix_students_product_id', 'product_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     full_name = db.Column(db.String(100), nullable=False)
@@ -123,21 +302,214 @@ class Student(db.Model):
     # Relationships
     current_product = db.relationship('Product', foreign_keys=[product_id], backref='current_holders', lazy=True)
 
+class InventoryCounters(db.Model):
+    """Single-row table of running totals, updated in the same transaction
+    as every write that changes them (see adjust_inventory_counters)."""
+    __tablename__ = 'inventory_counters'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    total_products = db.Column(db.Integer, default=0, nullable=False)
+    total_quantity = db.Column(db.Integer, default=0, nullable=False)
+    low_stock_count = db.Column(db.Integer, default=0, nullable=False)
+    assigned_products = db.Column(db.Integer, default=0, nullable=False)
+    total_students = db.Column(db.Integer, default=0, nullable=False)
+    active_assignments = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AutocompleteVersion(db.Model):
+    """Change counter of one autocomplete index's source table, bumped in
+    every transaction that changes what the index holds, so that other
+    processes notice their copy is out of date (see prefix_index.py)."""
+    __tablename__ = 'autocomplete_versions'
+    
+    name = db.Column(db.String(20), primary_key=True)  # source table
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class StockSnapshot(db.Model):
+    """Stock on hand for one category at the end of a day or hour bucket.
+
+    Rows are written by record_stock_change() on every stock movement and
+    by snapshot_stock.py; a bucket with no row means nothing changed since
+    the previous one.
+    """
+    __tablename__ = 'stock_snapshots'
+    __table_args__ = (
+        db.UniqueConstraint('granularity', 'category', 'bucket', name='uq_stock_snapshots_bucket'),
+        db.Index('ix_stock_snapshots_range', 'granularity', 'bucket'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(10), nullable=False)  # 'day' or 'hour'
+    bucket = db.Column(db.DateTime, nullable=False)  # start of the day/hour
+    category = db.Column(db.String(50), nullable=False, default='')  # '' for uncategorised
+    total_quantity = db.Column(db.Integer, nullable=False, default=0)
+    product_count = db.Column(db.Integer, nullable=False, default=0)
+
+class ProductAssignmentArchive(db.Model):
+    """Returned assignments moved out of product_assignments by archive_history().
+
+    Same columns as ProductAssignment, keeping the original id; no foreign
+    keys, so archived history survives the product or student being deleted.
+    """
+    __tablename__ = 'product_assignments_archive'
+    __table_args__ = (
+        db.Index('ix_product_assignments_archive_assigned_date', 'assigned_date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    product_id = db.Column(db.Integer, nullable=False)
+    student_id = db.Column(db.Integer, nullable=False)
+    assigned_date = db.Column(db.DateTime, nullable=False)
+    returned_date = db.Column(db.DateTime, nullable=True)
+    status = db.Column(db.String(20), nullable=False)
+    notes = db.Column(db.Text, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class ActivityLogArchive(db.Model):
+    """Old activity log entries moved out of activity_logs by archive_history()."""
+    __tablename__ = 'activity_logs_archive'
+    __table_args__ = (
+        db.Index('ix_activity_logs_archive_timestamp', 'timestamp'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    action = db.Column(db.String(100), nullable=False)
+    details = db.Column(db.Text, nullable=True)
+    timestamp = db.Column(db.DateTime)
+    ip_address = db.Column(db.String(45), nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+# Full-text search indexes live outside the ORM metadata (see search.py)
+@event.listens_for(db.metadata, 'after_create')
+def install_search_indexes(target, connection, **kw):
+    search.install(connection)
+
+@event.listens_for(db.metadata, 'before_drop')
+def drop_search_indexes(target, connection, **kw):
+    search.uninstall(connection)
+
+# Autocomplete indexes (see prefix_index.py), loaded on first use and kept
+# current from the session: flushed ORM changes are applied when the
+# transaction commits, and bulk statements on an indexed table make the
+# index reload on its next lookup. Every such commit also bumps the table's
+# AutocompleteVersion row, which the other processes check before lookups.
+def load_product_index():
+    rows = db.session.query(Product.id, Product.name, Product.quantity).yield_per(10000)
+    return ((row.id, [row.name], {'name': row.name, 'quantity': row.quantity}) for row in rows)
+
+def load_student_index():
+    rows = db.session.query(Student.id, Student.full_name, Student.roll_number, Student.department).yield_per(10000)
+    return ((row.id, [row.full_name, row.roll_number], student_index_payload(row)) for row in rows)
+
+def student_index_payload(student):
+    return {'full_name': student.full_name, 'roll_number': student.roll_number, 'department': student.department}
+
+def autocomplete_version(table_name):
+    return lambda: db.session.scalar(
+        db.select(AutocompleteVersion.version).where(AutocompleteVersion.name == table_name)
+    )
+
+product_index = PrefixIndex(load_product_index, autocomplete_version('products'),
+                            app.config['AUTOCOMPLETE_CHECK_INTERVAL'])
+student_index = PrefixIndex(load_student_index, autocomplete_version('students'),
+                            app.config['AUTOCOMPLETE_CHECK_INTERVAL'])
+
+# table -> index built from it
+AUTOCOMPLETE_SOURCES = {
+    'products': product_index,
+    'students': student_index,
+}
+
+@event.listens_for(AutocompleteVersion.__table__, 'after_create')
+def create_autocomplete_versions(target, connection, **kw):
+    connection.execute(target.insert(), [{'name': name, 'version': 0} for name in AUTOCOMPLETE_SOURCES])
+
+def autocomplete_entry(obj):
+    """``(texts, payload)`` of a product or student as the index stores it."""
+    if isinstance(obj, Product):
+        return [obj.name], {'name': obj.name, 'quantity': obj.quantity}
+    return [obj.full_name, obj.roll_number], student_index_payload(obj)
+
+def note_autocomplete_change(session, obj, deleted=False):
+    """Queue an index update for ``obj``, applied when the session commits.
+
+    The entry is captured now: after the commit the instance is expired and
+    no SQL may be emitted to reload it.
+    """
+    changes = session.info.setdefault('autocomplete_changes', {})
+    changes[(type(obj), obj.id)] = None if deleted else autocomplete_entry(obj)
+
+@event.listens_for(db.session, 'after_flush')
+def collect_autocomplete_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, (Product, Student)):
+            note_autocomplete_change(session, obj)
+    for obj in session.deleted:
+        if isinstance(obj, (Product, Student)):
+            note_autocomplete_change(session, obj, deleted=True)
+
+@event.listens_for(db.session, 'do_orm_execute')
+def detect_bulk_autocomplete_changes(orm_execute_state):
+    """Bulk INSERT/UPDATE/DELETE statements on an indexed table make its
+    index reload, unless the caller marked them ``autocomplete_synced``:
+    they leave the indexed columns alone, or the caller passes the change
+    to note_autocomplete_change()."""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if orm_execute_state.execution_options.get('autocomplete_synced'):
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    if getattr(table, 'name', None) in AUTOCOMPLETE_SOURCES:
+        orm_execute_state.session.info.setdefault('autocomplete_stale', set()).add(table.name)
+
+@event.listens_for(db.session, 'before_commit')
+def bump_autocomplete_versions(session):
+    session.flush()
+    changed = set(session.info.get('autocomplete_stale', ()))
+    changed.update(model.__tablename__ for model, _ in session.info.get('autocomplete_changes', {}))
+    versions = session.info.setdefault('autocomplete_versions', {})
+    for table_name in changed - set(versions):
+        versions[table_name] = session.execute(
+            db.update(AutocompleteVersion).where(AutocompleteVersion.name == table_name).values(
+                version=AutocompleteVersion.version + 1
+            ).returning(AutocompleteVersion.version)
+        ).scalar()
+
+@event.listens_for(db.session, 'after_commit')
+def apply_autocomplete_changes(session):
+    stale = session.info.pop('autocomplete_stale', set())
+    for table_name, version in session.info.pop('autocomplete_versions', {}).items():
+        index = AUTOCOMPLETE_SOURCES[table_name]
+        if table_name in stale or version is None:
+            index.invalidate()
+        else:
+            index.advance(version - 1, version)
+    for (model, id_), entry in session.info.pop('autocomplete_changes', {}).items():
+        index = AUTOCOMPLETE_SOURCES[model.__tablename__]
+        if entry is None:
+            index.remove(id_)
+        else:
+            index.put(id_, *entry)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_autocomplete_changes(session):
+    session.info.pop('autocomplete_changes', None)
+    session.info.pop('autocomplete_stale', None)
+    session.info.pop('autocomplete_versions', None)
+
 # Forms
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired()])
     password = PasswordField('Password', validators=[DataRequired()])
     submit = SubmitField('Login')
 
+PRODUCT_CATEGORIES = ['Electronics', 'Stationery', 'Furniture', 'Lab Equipment', 'Sports', 'Other']
+
 class ProductForm(FlaskForm):
     name = StringField('Item Name', validators=[DataRequired(), Length(min=2, max=100)])
     category = SelectField('Category', choices=[
-        ('Electronics', 'Electronics'),
-        ('Stationery', 'Stationery'),
-        ('Furniture', 'Furniture'),
-        ('Lab Equipment', 'Lab Equipment'),
-        ('Sports', 'Sports'),
-        ('Other', 'Other')
+        (category, category) for category in PRODUCT_CATEGORIES
     ], validators=[DataRequired()])
     quantity = IntegerField('Quantity', validators=[
         DataRequired(),
@@ -177,61 +549,1106 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Read-only views may send their SELECTs to the replica (see replica.py)
+replica_router = ReplicaRouter(
+    probe=db.select(Product.id).limit(1),
+    retry_interval=app.config['REPLICA_RETRY_INTERVAL']
+)
+with app.app_context():
+    replica_router.configure(db.engines.get('replica'))
+
+def read_replica(f):
+    """Serve the view's reads from the replica, unless the user wrote
+    something in the last REPLICA_STICKY_SECONDS and might not see it there."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if replica_router.engine is not None and session.get('primary_until', 0) < time.time():
+            use_replica(db.session, replica_router)
+        return f(*args, **kwargs)
+    return decorated_function
+
+@app.before_request
+def reset_replica_routing():
+    db.session.info.pop('replica_router', None)
+    db.session.info.pop('wrote', None)
+
+@app.after_request
+def stick_to_primary_after_write(response):
+    if replica_router.engine is not None and db.session.info.get('wrote'):
+        session['primary_until'] = time.time() + app.config['REPLICA_STICKY_SECONDS']
+    return response
+
 # Helper Functions
+# Writes go through run_write(), which hands them to the single writer
+# thread when WRITE_COORDINATOR_ENABLED is set (see write_coordinator.py)
+write_coordinator = WriteCoordinator(
+    lambda: db.session,
+    context=app.app_context,
+    max_batch=app.config['WRITE_BATCH_SIZE'],
+    max_delay=app.config['WRITE_BATCH_DELAY']
+)
+
+class WriteRejected(Exception):
+    """Rolls back a write operation that answered with a non-200 status."""
+    
+    def __init__(self, status, payload):
+        super().__init__(status, payload)
+        self.status = status
+        self.payload = payload
+
+def _rejecting(fn, *args):
+    status, payload = fn(*args)
+    if status != 200:
+        raise WriteRejected(status, payload)
+    return status, payload
+
+def run_write(fn, *args):
+    """Run the write operation ``fn(*args)`` and commit it.
+
+    ``fn`` works in db.session and returns ``(status, payload)`` like
+    bulk_assign_product; any status but 200 rolls its changes back. With
+    WRITE_COORDINATOR_ENABLED it runs on the writer thread, sharing a
+    transaction with other queued writes; otherwise in the caller's
+    session. Returns ``(status, payload)`` once the outcome is final.
+    """
+    if app.config['WRITE_COORDINATOR_ENABLED'] and not write_coordinator.closed:
+        # Hand the caller's pooled connection back while it waits, or enough
+        # waiting requests would leave the writer none to work with
+        db.session.rollback()
+        try:
+            result = write_coordinator.run(_rejecting, fn, *args, timeout=app.config['WRITE_TIMEOUT'])
+        except WriteRejected as e:
+            return e.status, e.payload
+        # Written by another session: make this one read it back from the primary
+        use_primary(db.session)
+        return result
+    status, payload = fn(*args)
+    if status == 200:
+        db.session.commit()
+    else:
+        db.session.rollback()
+    return status, payload
+
+def insert_activity_batch(entries):
+    db.session.execute(db.insert(ActivityLog), entries)
+    return 200, {'written': len(entries)}
+
+def write_activity_batch(entries):
+    """Bulk-insert buffered activity log entries (runs on the audit thread)."""
+    with app.app_context():
+        try:
+            run_write(insert_activity_batch, entries)
+        except Exception:
+            db.session.rollback()
+            raise
+
+audit_writer = AuditWriter(
+    write_activity_batch,
+    batch_size=app.config['AUDIT_BATCH_SIZE'],
+    flush_interval=app.config['AUDIT_FLUSH_INTERVAL'],
+    fallback_path=app.config['AUDIT_FALLBACK_FILE'],
+    # The database is locked, unreachable or too busy; any other error
+    # (a constraint, a bad value) is about the entries themselves
+    transient_errors=(OperationalError, InterfaceError, DisconnectionError, PoolTimeoutError, TimeoutError, OSError)
+)
+
 def log_activity(user_id, action, details=None):
-    """Log user activity to the database."""
+    """Log user activity to the database.
+
+    With AUDIT_BUFFER_ENABLED the entry is queued and written in bulk by
+    the audit writer thread instead of costing the request a commit.
+    """
+    entry = {
+        'user_id': user_id,
+        'action': action,
+        'details': details,
+        'timestamp': datetime.utcnow(),
+        'ip_address': request.remote_addr if has_request_context() else None
+    }
+    if app.config['AUDIT_BUFFER_ENABLED']:
+        audit_writer.submit(entry)
+        return
     try:
-        activity = ActivityLog(
-            user_id=user_id,
-            action=action,
-            details=details,
-            ip_address=request.remote_addr
-        )
-        db.session.add(activity)
+        db.session.add(ActivityLog(**entry))
         db.session.commit()
     except Exception as e:
         app.logger.error(f'Error logging activity: {str(e)}')
         db.session.rollback()
 
-# Routes
-@app.route('/')
-@login_required
-def index():
-    # Dashboard statistics
-    total_products = Product.query.count()
-    total_students = Student.query.count()
-    total_quantity = db.session.query(db.func.sum(Product.quantity)).scalar() or 0
-    active_assignments = ProductAssignment.query.filter_by(status='assigned').count()
-    low_stock_count = Product.query.filter(Product.quantity <= Product.min_stock_level).count()
-    
-    # Recent activity
-    recent_assignments = ProductAssignment.query.order_by(
-        ProductAssignment.assigned_date.desc()
-    ).limit(5).all()
+COUNTER_FIELDS = (
+    'total_products',
+    'total_quantity',
+    'low_stock_count',
+    'assigned_products',
+    'total_students',
+    'active_assignments'
+)
+
+def compute_inventory_counters():
+    """Compute every counter from the base tables."""
+    totals = db.session.execute(db.select(
+        db.func.count(Product.id).label('total_products'),
+        db.func.coalesce(db.func.sum(Product.quantity), 0).label('total_quantity'),
+        db.func.coalesce(db.func.sum(
+            db.case((Product.is_low_stock, 1), else_=0)
+        ), 0).label('low_stock_count'),
+        db.func.coalesce(db.func.sum(
+            db.case((Product.is_assigned.is_(True), 1), else_=0)
+        ), 0).label('assigned_products'),
+        db.select(db.func.count(Student.id)).scalar_subquery().label('total_students'),
+        db.select(db.func.count(ProductAssignment.id)).where(
+            ProductAssignment.is_open
+        ).scalar_subquery().label('active_assignments')
+    )).one()
+    return {field: int(getattr(totals, field)) for field in COUNTER_FIELDS}
+
+def rebuild_inventory_counters():
+    """Overwrite the stored counters with freshly computed values.
+
+    Returns a dict of {field: (stored, actual)} for every counter that had
+    drifted. The caller is responsible for committing.
+    """
+    actual = compute_inventory_counters()
+    counters = db.session.get(InventoryCounters, 1, with_for_update=True)
+    if counters is None:
+        counters = InventoryCounters(id=1)
+        db.session.add(counters)
+        drift = {}
+    else:
+        drift = {
+            field: (getattr(counters, field), value)
+            for field, value in actual.items()
+            if getattr(counters, field) != value
+        }
+    for field, value in actual.items():
+        setattr(counters, field, value)
+    counters.updated_at = datetime.utcnow()
+    return drift
+
+def get_inventory_counters():
+    """Return the counters row, building it from the base tables on first use."""
+    counters = db.session.get(InventoryCounters, 1)
+    if counters is None:
+        # Rebuild from the primary, not from a replica that may lag behind
+        use_primary(db.session)
+        try:
+            rebuild_inventory_counters()
+            db.session.commit()
+        except IntegrityError:
+            # Another request created the row first
+            db.session.rollback()
+        counters = db.session.get(InventoryCounters, 1)
+    return counters
+
+def product_counter_state(product):
+    """The contribution a single product makes to the product counters."""
+    if product is None:
+        return {}
+    return {
+        'total_products': 1,
+        'total_quantity': product.quantity or 0,
+        'low_stock_count': int(product.is_low_stock),
+        'assigned_products': int(bool(product.is_assigned))
+    }
+
+def adjust_inventory_counters(before=None, after=None, **deltas):
+    """Apply a change to the counters inside the current transaction.
+
+    ``before`` and ``after`` are product_counter_state() snapshots taken
+    around a product change; extra keyword arguments are added as raw
+    deltas (e.g. ``active_assignments=1``).
+    """
+    before = before or {}
+    after = after or {}
+    for field in set(before) | set(after):
+        deltas[field] = deltas.get(field, 0) + after.get(field, 0) - before.get(field, 0)
+    values = {
+        field: getattr(InventoryCounters, field) + delta
+        for field, delta in deltas.items() if delta
+    }
+    if not values:
+        return
+    values['updated_at'] = datetime.utcnow()
+    db.session.execute(
+        db.update(InventoryCounters).where(InventoryCounters.id == 1).values(**values)
+    )
+
+def encode_cursor(values):
+    """Turn the sort key of the last row on a page into an opaque token."""
+    raw = json.dumps(list(values), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; returns None for a missing or mangled token."""
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+def valid_cursor(values, columns):
+    """``values`` if they fit the sort key ``columns`` (one value of each
+    column's type), else None: a tampered or stale cursor starts from the
+    first page instead of failing in the database."""
+    if values is None or len(values) != len(columns):
+        return None
+    for value, column in zip(values, columns):
+        try:
+            expected = column.type.python_type
+        except NotImplementedError:
+            expected = (str, int, float)
+        if isinstance(value, bool) or not isinstance(value, expected):
+            return None
+    return values
+
+def get_per_page():
+    """Page size from the request, bounded by the configured maximum."""
+    per_page = request.args.get('per_page', app.config['ITEMS_PER_PAGE'], type=int)
+    return max(1, min(per_page, app.config['MAX_ITEMS_PER_PAGE']))
+
+def keyset_filter(columns, after, descending=False):
+    """The condition selecting the rows after the sort key values ``after``."""
+    position = db.tuple_(*columns)
+    bound = db.tuple_(*[db.literal(value) for value in after])
+    # The redundant range on the first column lets SQLite seek an
+    # expression index, which it does not do for the row value alone
+    first = db.literal(after[0])
+    return db.and_(
+        columns[0] <= first if descending else columns[0] >= first,
+        position < bound if descending else position > bound
+    )
+
+def keyset_page(query, columns, after=None, per_page=20, descending=False, key=None):
+    """Fetch one page of ``query`` using seek (keyset) pagination.
+
+    ``columns`` is the sort key, ending with a unique column (normally the
+    primary key) so the order is total. ``after`` holds the key values of
+    the last row of the previous page, and ``key(row)`` extracts them from a
+    result row. Returns ``(rows, next_after)``; ``next_after`` is None on
+    the last page.
+    """
+    if after is not None:
+        query = query.filter(keyset_filter(columns, after, descending))
+    ordering = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(*ordering).limit(per_page + 1).all()
+    if len(rows) <= per_page:
+        return rows, None
+    rows = rows[:per_page]
+    return rows, key(rows[-1])
+
+def upsert(model, rows, index_elements, set_):
+    """INSERT ... ON CONFLICT (index_elements) DO UPDATE for SQLite and PostgreSQL.
+
+    ``set_`` maps column names to the values written on conflict. It may
+    also be a callable that receives the insert statement, for values that
+    refer to ``stmt.excluded``.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        stmt = postgresql.insert(model)
+    elif dialect == 'sqlite':
+        stmt = sqlite.insert(model)
+    else:
+        raise NotImplementedError(f'upsert is not supported on {dialect}')
+    if callable(set_):
+        set_ = set_(stmt)
+    # Rows are passed as executemany parameters so the statement compiles
+    # once and stays in the compiled cache
+    return db.session.execute(stmt.on_conflict_do_update(index_elements=index_elements, set_=set_), rows)
+
+def stock_buckets(moment=None):
+    """The (granularity, bucket start) pairs that ``moment`` falls into."""
+    moment = moment or datetime.utcnow()
+    buckets = [('day', moment.replace(hour=0, minute=0, second=0, microsecond=0))]
+    if app.config['STOCK_SNAPSHOT_HOURLY']:
+        buckets.append(('hour', moment.replace(minute=0, second=0, microsecond=0)))
+    return buckets
+
+def category_stocks():
+    """Current (total quantity, product count) of every category."""
+    column = db.func.coalesce(Product.category, '')
+    rows = db.session.query(
+        column,
+        db.func.coalesce(db.func.sum(Product.quantity), 0),
+        db.func.count(Product.id)
+    ).group_by(column).all()
+    return {row[0]: (row[1], row[2]) for row in rows}
+
+def record_stock_change(category, quantity_delta, product_delta=0):
+    """Fold a stock movement of one category into the current snapshot buckets."""
+    record_stock_changes({category: (quantity_delta, product_delta)})
+
+def record_stock_changes(changes):
+    """Fold stock movements into the current snapshot buckets.
+
+    ``changes`` maps categories to ``(quantity delta, product delta)``.
+    Called in the same transaction as the changes, after all of them have
+    been applied: movements applied together must be recorded together,
+    since the first movement in a new bucket seeds it from the current
+    totals, which already include every applied change. The common case is
+    a single UPDATE per category and bucket; seeding writes the current
+    total of every category, so the categories that do not move in the
+    bucket still count towards its total.
+    """
+    moves = {}
+    for category, (quantity_delta, product_delta) in changes.items():
+        if quantity_delta or product_delta:
+            total = moves.get(category or '', (0, 0))
+            moves[category or ''] = (total[0] + quantity_delta, total[1] + product_delta)
+    if not moves:
+        return
+    for granularity, bucket in stock_buckets():
+        missing = {}
+        for category, (quantity_delta, product_delta) in moves.items():
+            updated = db.session.execute(
+                db.update(StockSnapshot).where(
+                    StockSnapshot.granularity == granularity,
+                    StockSnapshot.category == category,
+                    StockSnapshot.bucket == bucket
+                ).values(
+                    total_quantity=StockSnapshot.total_quantity + quantity_delta,
+                    product_count=StockSnapshot.product_count + product_delta
+                )
+            ).rowcount
+            if not updated:
+                missing[category] = (quantity_delta, product_delta)
+        if not missing:
+            continue
+        stocks = category_stocks()
+        for category in missing:
+            stocks.setdefault(category, (0, 0))
+        # Rows created by another transaction meanwhile are kept; those of
+        # the missing categories do not include these changes yet, so add
+        # the deltas to them. Rows updated above already have theirs
+        upsert(
+            StockSnapshot,
+            [{'granularity': granularity, 'bucket': bucket, 'category': name,
+              'total_quantity': total_quantity, 'product_count': product_count}
+             for name, (total_quantity, product_count) in stocks.items()],
+            ['granularity', 'category', 'bucket'],
+            {'total_quantity': db.case(
+                *[(StockSnapshot.category == name, StockSnapshot.total_quantity + quantity_delta)
+                  for name, (quantity_delta, _) in missing.items()],
+                else_=StockSnapshot.total_quantity),
+             'product_count': db.case(
+                *[(StockSnapshot.category == name, StockSnapshot.product_count + product_delta)
+                  for name, (_, product_delta) in missing.items()],
+                else_=StockSnapshot.product_count)}
+        )
+
+def take_stock_snapshot(moment=None):
+    """Write the current stock of every category into the current buckets."""
+    stocks = category_stocks()
+    if not stocks:
+        return 0
+    for granularity, bucket in stock_buckets(moment):
+        upsert(
+            StockSnapshot,
+            [{'granularity': granularity, 'bucket': bucket, 'category': name,
+              'total_quantity': total_quantity, 'product_count': product_count}
+             for name, (total_quantity, product_count) in stocks.items()],
+            ['granularity', 'category', 'bucket'],
+            lambda stmt: {'total_quantity': stmt.excluded.total_quantity,
+                          'product_count': stmt.excluded.product_count}
+        )
+    return len(stocks)
+
+def stock_series(start, end, granularity='day', category=None):
+    """Stock per bucket between two bucket starts (inclusive).
+
+    Returns a list of (bucket, {category: quantity}) with the last known
+    value carried forward through buckets that saw no movement. Categories
+    with no snapshot at all (stock loaded before snapshots were taken) are
+    reported at their current total. Three queries regardless of the
+    window: the rows inside it, the latest row per category before it and
+    the current totals.
+    """
+    step = timedelta(days=1) if granularity == 'day' else timedelta(hours=1)
+    filters = [StockSnapshot.granularity == granularity]
+    if category is not None:
+        filters.append(StockSnapshot.category == category)
     
-    # Low stock products
-    low_stock_products = Product.query.filter(
-        Product.quantity <= Product.min_stock_level
-    ).limit(5).all()
+    latest_before = db.session.query(
+        StockSnapshot.category,
+        db.func.max(StockSnapshot.bucket).label('bucket')
+    ).filter(*filters, StockSnapshot.bucket < start).group_by(StockSnapshot.category).subquery()
+    baseline = db.session.query(StockSnapshot.category, StockSnapshot.total_quantity).join(
+        latest_before,
+        db.and_(StockSnapshot.category == latest_before.c.category,
+                StockSnapshot.bucket == latest_before.c.bucket)
+    ).filter(*filters).all()
+    
+    in_range = db.session.query(
+        StockSnapshot.bucket, StockSnapshot.category, StockSnapshot.total_quantity
+    ).filter(*filters, StockSnapshot.bucket >= start, StockSnapshot.bucket <= end).order_by(
+        StockSnapshot.bucket
+    ).all()
+    
+    state = {row.category: row.total_quantity for row in baseline}
+    known = set(state) | {row.category for row in in_range}
+    for name, (total_quantity, _) in category_stocks().items():
+        if name not in known and (category is None or name == category):
+            state[name] = total_quantity
+    series = []
+    index = 0
+    bucket = start
+    while bucket <= end:
+        while index < len(in_range) and in_range[index].bucket <= bucket:
+            state[in_range[index].category] = in_range[index].total_quantity
+            index += 1
+        series.append((bucket, dict(state)))
+        bucket += step
+    return series
+
+def normalize_import_row(row):
+    """Lower-case and underscore the keys of an imported row, so both
+    ``min_stock_level`` and the export header ``Min Stock Level`` work."""
+    return {
+        str(key).strip().lower().replace(' ', '_'): value
+        for key, value in row.items() if key is not None
+    }
+
+def read_import_file(stream, filename):
+    """Yield the rows of an uploaded CSV or JSON file as dicts."""
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension == 'json':
+        data = json.load(io.TextIOWrapper(stream, encoding='utf-8-sig'))
+        if not isinstance(data, list):
+            raise ValueError('JSON imports must contain a list of objects')
+        for row in data:
+            yield normalize_import_row(row) if isinstance(row, dict) else {}
+    else:
+        for row in csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')):
+            yield normalize_import_row(row)
+
+def _parse_int(value):
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, int):
+        return value
+    return int(str(value).strip())
+
+def validate_product_row(row):
+    """Check an imported row against the same rules as ProductForm.
+
+    Returns ``(values, errors)``; ``values`` is ready for an insert when
+    ``errors`` is empty.
+    """
+    errors = []
+    name = str(row.get('name') or '').strip()
+    if not 2 <= len(name) <= 100:
+        errors.append('name: must be between 2 and 100 characters')
+    category = str(row.get('category') or '').strip()
+    if category not in PRODUCT_CATEGORIES:
+        errors.append(f'category: must be one of {", ".join(PRODUCT_CATEGORIES)}')
+    try:
+        quantity = _parse_int(row.get('quantity'))
+        if quantity < 0:
+            errors.append('quantity: cannot be negative')
+    except (TypeError, ValueError):
+        quantity = None
+        errors.append('quantity: must be a whole number')
+    try:
+        min_stock_level = _parse_int(row.get('min_stock_level'))
+        if min_stock_level < 1:
+            errors.append('min_stock_level: must be at least 1')
+    except (TypeError, ValueError):
+        min_stock_level = None
+        errors.append('min_stock_level: must be a whole number')
+    description = str(row.get('description') or '').strip() or None
+    if description and len(description) > 500:
+        errors.append('description: must be at most 500 characters')
+    
+    values = {
+        'name': name,
+        'category': category,
+        'quantity': quantity,
+        'min_stock_level': min_stock_level,
+        'description': description
+    }
+    return values, errors
+
+def import_products(rows, batch_size=None):
+    """Validate and bulk-insert products, committing once per batch.
+
+    Returns a report with the number of imported and rejected rows and the
+    errors of the first IMPORT_MAX_REPORTED_ERRORS rejected rows (row
+    numbers are 1-based, not counting a CSV header).
+    """
+    batch_size = batch_size or app.config['IMPORT_BATCH_SIZE']
+    max_errors = app.config['IMPORT_MAX_REPORTED_ERRORS']
+    today = datetime.utcnow().date()
+    report = {'imported': 0, 'rejected': 0, 'errors': []}
+    batch = []
+    
+    def write_batch():
+        db.session.execute(db.insert(Product), batch)
+        by_category = Counter()
+        count_by_category = Counter()
+        for values in batch:
+            by_category[values['category']] += values['quantity']
+            count_by_category[values['category']] += 1
+        adjust_inventory_counters(
+            total_products=len(batch),
+            total_quantity=sum(by_category.values()),
+            low_stock_count=sum(1 for values in batch if values['quantity'] <= values['min_stock_level'])
+        )
+        record_stock_changes({category: (quantity, count_by_category[category])
+                              for category, quantity in by_category.items()})
+        db.session.commit()
+        report['imported'] += len(batch)
+        batch.clear()
+    
+    for number, row in enumerate(rows, start=1):
+        values, errors = validate_product_row(row)
+        if errors:
+            report['rejected'] += 1
+            if len(report['errors']) < max_errors:
+                report['errors'].append({'row': number, 'errors': errors})
+            continue
+        values['date_of_issue'] = today
+        values['is_assigned'] = False
+        batch.append(values)
+        if len(batch) >= batch_size:
+            write_batch()
+    if batch:
+        write_batch()
+    return report
+
+def validate_student_row(row):
+    """Check an imported roster row against the StudentForm rules (plus the
+    department, which add_student also requires)."""
+    errors = []
+    full_name = str(row.get('full_name') or row.get('fullname') or '').strip()
+    if not 2 <= len(full_name) <= 100:
+        errors.append('full_name: must be between 2 and 100 characters')
+    roll_number = str(row.get('roll_number') or row.get('rollnumber') or '').strip()
+    if not 3 <= len(roll_number) <= 20:
+        errors.append('roll_number: must be between 3 and 20 characters')
+    department = str(row.get('department') or '').strip()
+    if not department or len(department) > 50:
+        errors.append('department: is required and must be at most 50 characters')
+    email = str(row.get('email') or '').strip() or None
+    if email and email != 'N/A':
+        try:
+            validate_email(email, check_deliverability=False)
+        except EmailNotValidError:
+            errors.append('email: is not a valid email address')
+    else:
+        email = None
+    phone = str(row.get('phone') or '').strip() or None
+    if phone == 'N/A':
+        phone = None
+    if phone and len(phone) > 20:
+        errors.append('phone: must be at most 20 characters')
+    
+    values = {
+        'full_name': full_name,
+        'roll_number': roll_number,
+        'email': email,
+        'phone': phone,
+        'department': department
+    }
+    return values, errors
+
+STUDENT_UPSERT_COLUMNS = ('full_name', 'email', 'phone', 'department')
+
+def _upsert_students(rows):
+    upsert(
+        Student,
+        rows,
+        ['roll_number'],
+        lambda stmt: {column: stmt.excluded[column] for column in STUDENT_UPSERT_COLUMNS}
+    )
+
+def import_students(rows, batch_size=None):
+    """Create or update students keyed on roll_number, one batch at a time.
+
+    Each batch is a single INSERT ... ON CONFLICT (roll_number) DO UPDATE
+    plus one SELECT to tell new roll numbers from existing ones. If a batch
+    hits another constraint (a duplicate email) it is retried row by row so
+    only the offending rows are rejected. A roll number that repeats an
+    earlier row of the file is rejected too, so every student is counted
+    once, as created or updated. Memory use is bounded by the batch size
+    plus the roll numbers seen so far.
+    """
+    batch_size = batch_size or app.config['IMPORT_BATCH_SIZE']
+    max_errors = app.config['IMPORT_MAX_REPORTED_ERRORS']
+    report = {'created': 0, 'updated': 0, 'rejected': 0, 'errors': []}
+    batch = {}
+    first_rows = {}
+    
+    def reject(number, errors):
+        report['rejected'] += 1
+        if len(report['errors']) < max_errors:
+            report['errors'].append({'row': number, 'errors': errors})
+    
+    def write_batch():
+        existing = {
+            roll_number for (roll_number,) in db.session.query(Student.roll_number).filter(
+                Student.roll_number.in_(list(batch))
+            )
+        }
+        try:
+            _upsert_students([values for _, values in batch.values()])
+            created = len(batch.keys() - existing)
+            updated = len(batch) - created
+        except IntegrityError:
+            db.session.rollback()
+            created = updated = 0
+            for roll_number, (number, values) in batch.items():
+                try:
+                    with db.session.begin_nested():
+                        _upsert_students([values])
+                except IntegrityError:
+                    reject(number, ['email: already used by another student'])
+                    continue
+                if roll_number in existing:
+                    updated += 1
+                else:
+                    created += 1
+        adjust_inventory_counters(total_students=created)
+        db.session.commit()
+        report['created'] += created
+        report['updated'] += updated
+        batch.clear()
+    
+    for number, row in enumerate(rows, start=1):
+        values, errors = validate_student_row(row)
+        if errors:
+            reject(number, errors)
+            continue
+        first = first_rows.setdefault(values['roll_number'], number)
+        if first != number:
+            reject(number, [f'roll_number: repeats row {first}'])
+            continue
+        batch[values['roll_number']] = (number, values)
+        if len(batch) >= batch_size:
+            write_batch()
+    if batch:
+        write_batch()
+    return report
+
+def reserve_stock(product, count=1):
+    """Atomically take ``count`` units of ``product`` out of stock.
+
+    Runs ``UPDATE products SET quantity = quantity - count WHERE id = ?
+    AND quantity >= count`` and checks the row count, so concurrent
+    requests can never oversell or overwrite each other's decrement. The
+    UPDATE also holds the row (on SQLite, the database) write lock until
+    commit, so the values read back afterwards are stable. Returns the
+    product's counter state from before the change, or None when there was
+    not enough stock.
+    """
+    products_table = Product.__table__
+    taken = db.session.execute(
+        db.update(products_table).where(
+            products_table.c.id == product.id,
+            products_table.c.quantity >= count
+        ).values(quantity=products_table.c.quantity - count),
+        execution_options={'autocomplete_synced': True}
+    ).rowcount
+    db.session.refresh(product)
+    if not taken:
+        return None
+    old_state = product_counter_state(product)
+    old_state['total_quantity'] = product.quantity + count
+    old_state['low_stock_count'] = int(product.quantity + count <= product.min_stock_level)
+    product.is_assigned = product.quantity == 0
+    note_autocomplete_change(db.session, product)
+    return old_state
+
+def release_stock(product, count=1):
+    """Atomically put ``count`` units back; the counterpart of reserve_stock.
+
+    Returns the product's counter state from before the change.
+    """
+    products_table = Product.__table__
+    db.session.execute(
+        db.update(products_table).where(products_table.c.id == product.id).values(
+            quantity=products_table.c.quantity + count
+        ),
+        execution_options={'autocomplete_synced': True}
+    )
+    db.session.refresh(product)
+    note_autocomplete_change(db.session, product)
+    old_state = product_counter_state(product)
+    old_state['total_quantity'] = product.quantity - count
+    old_state['low_stock_count'] = int(product.quantity - count <= product.min_stock_level)
+    product.is_assigned = False
+    return old_state
+
+# Keeps IN (...) lists well under every database's bound-parameter limit
+IN_CLAUSE_CHUNK = 500
+
+def chunked(items, size=IN_CLAUSE_CHUNK):
+    """Split a list into consecutive slices of at most ``size`` items."""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def bulk_assign_product(product_id, student_ids=None, department=None):
+    """Issue one unit of a product to each of many students in one transaction.
+
+    Students are given either by id or by department. Students that do not
+    exist or already hold a product are skipped and reported; if the stock
+    cannot cover everyone else, nothing is assigned. Returns
+    ``(status_code, payload)``; the caller commits or rolls back.
+    """
+    product = db.session.get(Product, product_id)
+    if product is None:
+        return 404, {'success': False, 'message': 'Product not found.'}
+    
+    columns = (Student.id, Student.full_name, Student.product_id)
+    if department:
+        found = db.session.query(*columns).filter(Student.department == department).order_by(Student.id).all()
+        requested = [row.id for row in found]
+    else:
+        requested = list(dict.fromkeys(student_ids or []))
+        found = []
+        for ids in chunked(requested):
+            found.extend(db.session.query(*columns).filter(Student.id.in_(ids)).all())
+    by_id = {row.id: row for row in found}
+    
+    results = []
+    eligible = []
+    for student_id in requested:
+        row = by_id.get(student_id)
+        if row is None:
+            results.append({'student_id': student_id, 'status': 'not_found'})
+        elif row.product_id is not None:
+            results.append({'student_id': student_id, 'status': 'already_assigned'})
+        else:
+            eligible.append(student_id)
+            results.append({'student_id': student_id, 'status': 'assigned'})
+    
+    if not eligible:
+        return 400, {'success': False, 'message': 'None of the selected students can receive a product.',
+                     'results': results}
+    # One atomic decrement for the whole batch
+    old_state = reserve_stock(product, len(eligible))
+    if old_state is None:
+        return 400, {'success': False,
+                     'message': f'Only {product.quantity} {product.name} in stock for {len(eligible)} students.',
+                     'results': results}
+    
+    now = datetime.utcnow()
+    db.session.execute(db.insert(ProductAssignment), [
+        {'product_id': product.id, 'student_id': student_id, 'assigned_date': now, 'status': 'assigned'}
+        for student_id in eligible
+    ])
+    updated = 0
+    for ids in chunked(eligible):
+        updated += db.session.execute(
+            db.update(Student).where(Student.id.in_(ids), Student.product_id.is_(None)).values(
+                product_id=product.id, assignment_date=now.date(), return_date=None
+            ).execution_options(synchronize_session=False, autocomplete_synced=True)
+        ).rowcount
+    if updated != len(eligible):
+        # Someone assigned one of these students in the meantime; the
+        # caller rolls back the stock already reserved
+        return 409, {'success': False, 'message': 'Some students were assigned concurrently; please retry.'}
+    
+    adjust_inventory_counters(old_state, product_counter_state(product), active_assignments=len(eligible))
+    record_stock_change(product.category, -len(eligible))
+    
+    return 200, {'success': True,
+                 'message': f'{product.name} assigned to {len(eligible)} students.',
+                 'assigned': len(eligible),
+                 'remaining_quantity': product.quantity,
+                 'results': results}
+
+def read_roll_numbers(stream):
+    """Roll numbers from a barcode scan file: one per line, or the first
+    column of a CSV; blank lines and a header line are skipped."""
+    roll_numbers = []
+    for line in io.TextIOWrapper(stream, encoding='utf-8-sig'):
+        value = line.split(',', 1)[0].strip().strip('"')
+        if value and value.lower() not in ('roll_number', 'roll number'):
+            roll_numbers.append(value)
+    return roll_numbers
+
+def bulk_return_products(student_ids=None, roll_numbers=None):
+    """Take back the current product of many students in one transaction.
+
+    Each student is claimed with ``UPDATE ... WHERE id IN (...) AND
+    product_id = ?`` per product, as return_product_from_student() does, so
+    a student returned concurrently is neither returned nor credited twice;
+    stock goes back with one ``quantity = quantity + n`` UPDATE per product
+    (executemany), counted from the claimed rows only. Returns the
+    per-student results and the number of returns; the caller commits.
+    """
+    columns = (Student.id, Student.full_name, Student.roll_number, Student.product_id)
+    if roll_numbers is not None:
+        requested = list(dict.fromkeys(roll_numbers))
+        key_column, key, result_key = Student.roll_number, 'roll_number', 'roll_number'
+    else:
+        requested = list(dict.fromkeys(student_ids or []))
+        key_column, key, result_key = Student.id, 'id', 'student_id'
+    found = {}
+    for keys in chunked(requested):
+        for row in db.session.query(*columns).filter(key_column.in_(keys)):
+            found[getattr(row, key)] = row
+    
+    holders_per_product = {}
+    for row in found.values():
+        if row.product_id is not None:
+            holders_per_product.setdefault(row.product_id, []).append(row.id)
+    
+    # Claim the students that still hold the product read above
+    now = datetime.utcnow()
+    students_table = Student.__table__
+    claimed = {}
+    for product_id, holder_ids in holders_per_product.items():
+        for ids in chunked(holder_ids):
+            for student_id in db.session.execute(
+                db.update(students_table).where(
+                    students_table.c.id.in_(ids),
+                    students_table.c.product_id == product_id
+                ).values(
+                    product_id=None, assignment_date=None, return_date=now.date()
+                ).returning(students_table.c.id),
+                execution_options={'autocomplete_synced': True}
+            ).scalars():
+                claimed[student_id] = product_id
+    
+    results = []
+    for value in requested:
+        row = found.get(value)
+        if row is None:
+            status = 'not_found'
+        elif row.id not in claimed:
+            status = 'nothing_assigned'
+        else:
+            status = 'returned'
+        results.append({result_key: value, 'status': status})
+    if not claimed:
+        return results, 0
+    
+    # Latest open assignment for each claimed (student, product) pair
+    open_assignments = {}
+    for ids in chunked(list(claimed)):
+        rows = db.session.query(
+            ProductAssignment.id, ProductAssignment.student_id,
+            ProductAssignment.product_id, ProductAssignment.assigned_date
+        ).filter(ProductAssignment.student_id.in_(ids), ProductAssignment.is_open)
+        for row in rows:
+            if row.product_id != claimed[row.student_id]:
+                continue
+            current = open_assignments.get(row.student_id)
+            if current is None or row.assigned_date > current.assigned_date:
+                open_assignments[row.student_id] = row
+    
+    for ids in chunked([row.id for row in open_assignments.values()]):
+        db.session.execute(
+            db.update(ProductAssignment).where(ProductAssignment.id.in_(ids)).values(
+                status='returned', returned_date=now
+            ).execution_options(synchronize_session=False)
+        )
+    
+    returned_per_product = Counter(claimed.values())
+    products = {}
+    for ids in chunked(list(returned_per_product)):
+        # Locked (on SQLite, the claim above already holds the write lock)
+        # so the counter deltas below match the UPDATE
+        for product in db.session.query(
+            Product.id, Product.quantity, Product.min_stock_level, Product.is_assigned, Product.category
+        ).filter(Product.id.in_(ids)).with_for_update():
+            products[product.id] = product
+    products_table = Product.__table__
+    db.session.execute(
+        db.update(products_table).where(products_table.c.id == db.bindparam('product_id')).values(
+            quantity=products_table.c.quantity + db.bindparam('returned'),
+            is_assigned=False
+        ),
+        [{'product_id': product_id, 'returned': count}
+         for product_id, count in returned_per_product.items() if product_id in products]
+    )
+    
+    stock_by_category = Counter()
+    before, after = Counter(), Counter()
+    for product_id, count in returned_per_product.items():
+        product = products.get(product_id)
+        if product is None:
+            continue
+        stock_by_category[product.category] += count
+        before.update(low_stock_count=int(product.quantity <= product.min_stock_level),
+                      assigned_products=int(bool(product.is_assigned)),
+                      total_quantity=product.quantity)
+        after.update(low_stock_count=int(product.quantity + count <= product.min_stock_level),
+                     total_quantity=product.quantity + count)
+    adjust_inventory_counters(dict(before), dict(after), active_assignments=-len(open_assignments))
+    record_stock_changes({category: (count, 0) for category, count in stock_by_category.items()})
+    # Rows touched through Core above may be cached in the session
+    db.session.expire_all()
+    return results, len(claimed)
+
+# History archiving
+def archive_rows(model, archive_model, condition, batch_size=None, max_batches=None):
+    """Move the rows of ``model`` matching ``condition`` into ``archive_model``.
+
+    Rows are copied and deleted in primary-key order, ``batch_size`` at a
+    time, committing after each batch so no lock is held for longer than one
+    batch takes. Yields the number of rows moved by each batch; stop
+    iterating (or pass ``max_batches``) to pause, and the next run carries on
+    where this one left off.
+    """
+    batch_size = batch_size or app.config['ARCHIVE_BATCH_SIZE']
+    table = model.__table__
+    names = [column.name for column in table.columns]
+    last_id = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = db.session.execute(
+            db.select(table.c.id).where(condition, table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        db.session.execute(db.insert(archive_model.__table__).from_select(
+            names, db.select(*[table.c[name] for name in names]).where(table.c.id.in_(ids))
+        ))
+        db.session.execute(db.delete(table).where(table.c.id.in_(ids)))
+        db.session.commit()
+        last_id = ids[-1]
+        batches += 1
+        yield len(ids)
+
+def archive_assignments(older_than_days=None, **kwargs):
+    """Archive assignments returned more than ``older_than_days`` ago."""
+    days = older_than_days if older_than_days is not None else app.config['ARCHIVE_ASSIGNMENTS_AFTER_DAYS']
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    return archive_rows(ProductAssignment, ProductAssignmentArchive, db.and_(
+        ProductAssignment.status == 'returned', ProductAssignment.returned_date < cutoff
+    ), **kwargs)
+
+def archive_activity_logs(older_than_days=None, **kwargs):
+    """Archive activity log entries older than ``older_than_days``."""
+    days = older_than_days if older_than_days is not None else app.config['ARCHIVE_ACTIVITY_LOGS_AFTER_DAYS']
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    return archive_rows(ActivityLog, ActivityLogArchive, ActivityLog.timestamp < cutoff, **kwargs)
+
+ASSIGNMENT_HISTORY_COLUMNS = ('id', 'product_id', 'student_id', 'assigned_date', 'returned_date', 'status', 'notes')
+
+def assignment_history(start=None, end=None):
+    """Assignments with ``start <= assigned_date < end``, live and archived.
+
+    Returns a select over the live table alone when the archive holds
+    nothing that recent (one indexed MAX lookup), so ordinary reports never
+    touch the archive; otherwise a UNION ALL of both tables.
+    """
+    def select_from(model):
+        query = db.select(*[getattr(model, name) for name in ASSIGNMENT_HISTORY_COLUMNS])
+        if start is not None:
+            query = query.where(model.assigned_date >= start)
+        if end is not None:
+            query = query.where(model.assigned_date < end)
+        return query
+    
+    live = select_from(ProductAssignment)
+    if start is not None:
+        newest_archived = db.session.scalar(db.select(db.func.max(ProductAssignmentArchive.assigned_date)))
+        if newest_archived is None or newest_archived < start:
+            return live
+    return db.union_all(live, select_from(ProductAssignmentArchive))
+
+def count_assignments(start=None, end=None):
+    history = assignment_history(start, end).subquery()
+    return db.session.scalar(db.select(db.func.count()).select_from(history))
+
+class DashboardStats(NamedTuple):
+    """Snapshot of everything the dashboard template renders."""
+    total_products: int
+    total_students: int
+    total_quantity: int
+    active_assignments: int
+    low_stock_count: int
+    recent_assignments: list
+    low_stock_products: list
+    products_by_category: list
+
+def get_dashboard_stats():
+    """Collect dashboard statistics in a fixed number of queries.
+
+    The headline numbers are a primary-key lookup on the materialized
+    counters; the category breakdown and the two short lists add one query
+    each.
+    """
+    counters = get_inventory_counters()
     
-    # Top categories
     products_by_category = db.session.query(
         Product.category,
         db.func.count(Product.id).label('count')
     ).group_by(Product.category).all()
     
-    return render_template(
-        'dashboard.html',
-        total_products=total_products,
-        total_students=total_students,
-        total_quantity=total_quantity,
-        active_assignments=active_assignments,
-        low_stock_count=low_stock_count,
+    # Pick the five latest ids first, then join their product and student,
+    # so the template does not trigger a query per assignment
+    latest = db.select(ProductAssignment.id).order_by(
+        ProductAssignment.assigned_date.desc()
+    ).limit(5).subquery()
+    recent_assignments = ProductAssignment.query.join(
+        latest, ProductAssignment.id == latest.c.id
+    ).options(
+        db.joinedload(ProductAssignment.product),
+        db.joinedload(ProductAssignment.student)
+    ).order_by(ProductAssignment.assigned_date.desc()).all()
+    
+    low_stock_products = Product.query.filter(
+        Product.is_low_stock
+    ).limit(5).all()
+    
+    return DashboardStats(
+        total_products=counters.total_products,
+        total_students=counters.total_students,
+        total_quantity=counters.total_quantity,
+        active_assignments=counters.active_assignments,
+        low_stock_count=counters.low_stock_count,
         recent_assignments=recent_assignments,
         low_stock_products=low_stock_products,
         products_by_category=products_by_category
     )
 
+# Views whose results are kept in view_cache, invalidated by the write
+# routes after they commit
+INVENTORY_VIEWS = ('dashboard', 'reports', 'notifications', 'analytics')
+STUDENT_VIEWS = ('dashboard', 'reports')
+
+@lru_cache(maxsize=None)
+def snapshot_keys(model):
+    """Column and hybrid property names of ``model`` copied by snapshot()."""
+    mapper = db.inspect(model)
+    return tuple(
+        key for key, attribute in mapper.all_orm_descriptors.items()
+        if key in mapper.column_attrs or isinstance(attribute, hybrid_property)
+    )
+
+def snapshot(obj, *relationships):
+    """Plain copy of a model instance for view_cache.
+
+    Carries the column values, hybrid properties and the named (already
+    loaded) relationships, so templates read it like the instance, but it
+    is not tied to a session and can be shared between requests or pickled.
+    """
+    values = {key: getattr(obj, key) for key in snapshot_keys(type(obj))}
+    for name in relationships:
+        related = getattr(obj, name)
+        values[name] = snapshot(related) if related is not None else None
+    return SimpleNamespace(**values)
+
+@view_cache.cached('dashboard')
+def cached_dashboard_stats():
+    stats = get_dashboard_stats()
+    return stats._replace(
+        recent_assignments=[snapshot(a, 'product', 'student') for a in stats.recent_assignments],
+        low_stock_products=[snapshot(p) for p in stats.low_stock_products]
+    )
+
+# Routes
+@app.route('/')
+@login_required
+def index():
+    stats = cached_dashboard_stats()
+    return render_template('dashboard.html', stats=stats, **stats._asdict())
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if 'user_id' in session:
@@ -267,42 +1684,93 @@ def logout():
     flash('You have been logged out.', 'info')
     return redirect(url_for('login'))
 
+# Sortable columns for the store listing: (sort expression, key of a row)
+STORE_SORTS = {
+    'name': (Product.name, lambda p: p.name),
+    'quantity': (Product.quantity, lambda p: p.quantity),
+    'category': (PRODUCT_CATEGORY_SORT, lambda p: p.category or '')
+}
+
+def store_sort_key(sort, category=None):
+    """``(columns, key)`` of the store listing for keyset_page()."""
+    if category and sort == 'category':
+        # Every row has the same category, so this is the id order
+        return (Product.id,), lambda p: (p.id,)
+    sort_column, sort_key = STORE_SORTS[sort]
+    return (sort_column, Product.id), lambda p: (sort_key(p), p.id)
+
 @app.route('/store')
 @login_required
 def store():
-    products = Product.query.all()
-    total_items = sum(p.quantity for p in products)
-    low_stock_count = len([p for p in products if p.is_low_stock])
-    assigned_items_count = len([p for p in products if p.is_assigned])
+    sort = request.args.get('sort', 'name')
+    if sort not in STORE_SORTS:
+        sort = 'name'
+    order = 'desc' if request.args.get('order') == 'desc' else 'asc'
+    category = request.args.get('category') or None
+    low_stock_only = request.args.get('low_stock') == '1'
+    per_page = get_per_page()
+    
+    query = Product.query
+    if category:
+        query = query.filter(Product.category == category)
+    if low_stock_only:
+        query = query.filter(Product.is_low_stock)
+    
+    columns, key = store_sort_key(sort, category)
+    products, next_after = keyset_page(
+        query,
+        columns,
+        after=valid_cursor(decode_cursor(request.args.get('cursor')), columns),
+        per_page=per_page,
+        descending=(order == 'desc'),
+        key=key
+    )
+    counters = get_inventory_counters()
     
     return render_template(
         'store.html',
         products=products,
-        total_items=total_items,
-        low_stock_count=low_stock_count,
-        assigned_items_count=assigned_items_count,
+        next_cursor=encode_cursor(next_after) if next_after else None,
+        sort=sort,
+        order=order,
+        category=category,
+        low_stock=low_stock_only,
+        per_page=per_page,
+        total_items=counters.total_quantity,
+        low_stock_count=counters.low_stock_count,
+        assigned_items_count=counters.assigned_products,
         form=ProductForm()
     )
 
+def create_product(fields):
+    """Add a product from validated form fields (a run_write operation)."""
+    product = Product(
+        date_of_issue=datetime.utcnow().date(),
+        is_assigned=False,
+        **fields
+    )
+    db.session.add(product)
+    adjust_inventory_counters(after=product_counter_state(product))
+    record_stock_change(product.category, product.quantity, 1)
+    db.session.flush()
+    return 200, {'id': product.id, 'name': product.name}
+
 @app.route('/add_product', methods=['POST'])
 @login_required
 def add_product():
     form = ProductForm()
     if form.validate_on_submit():
         try:
-            product = Product(
-                name=form.name.data,
-                category=form.category.data,
-                quantity=form.quantity.data,
-                min_stock_level=form.min_stock_level.data,
-                description=form.description.data,
-                date_of_issue=datetime.utcnow().date(),
-                is_assigned=False
-            )
-            db.session.add(product)
-            db.session.commit()
+            _, product = run_write(create_product, {
+                'name': form.name.data,
+                'category': form.category.data,
+                'quantity': form.quantity.data,
+                'min_stock_level': form.min_stock_level.data,
+                'description': form.description.data
+            })
+            view_cache.invalidate(*INVENTORY_VIEWS)
             
-            log_activity(session['user_id'], 'add_product', f'Added product: {product.name}')
+            log_activity(session['user_id'], 'add_product', f'Added product: {product["name"]}')
             flash('Product added successfully!', 'success')
         except Exception as e:
             db.session.rollback()
@@ -315,6 +1783,47 @@ def add_product():
     
     return redirect(url_for('store'))
 
+@app.route('/import/products', methods=['POST'])
+@login_required
+@admin_required
+def import_products_upload():
+    """Bulk-create products from an uploaded CSV or JSON file.
+
+    The upload is bounded by MAX_CONTENT_LENGTH and staged in UPLOAD_FOLDER
+    while it is processed. Responds with the import report as JSON.
+    """
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'success': False, 'message': 'Please choose a CSV or JSON file to import.'}), 400
+    filename = secure_filename(upload.filename)
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension not in app.config['IMPORT_EXTENSIONS']:
+        return jsonify({'success': False, 'message': 'Only .csv and .json files can be imported.'}), 400
+    
+    path = os.path.join(app.config['UPLOAD_FOLDER'], f'{datetime.utcnow():%Y%m%d%H%M%S%f}_{filename}')
+    upload.save(path)
+    try:
+        with open(path, 'rb') as stream:
+            report = import_products(read_import_file(stream, filename))
+    except (ValueError, UnicodeDecodeError) as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Could not read {filename}: {e}'}), 400
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f'Error importing products: {str(e)}')
+        return jsonify({'success': False, 'message': 'An error occurred while importing products.'}), 500
+    finally:
+        os.remove(path)
+        # Batches before a failure stay committed
+        view_cache.invalidate(*INVENTORY_VIEWS)
+    
+    log_activity(
+        session['user_id'],
+        'import_products',
+        f'Imported {report["imported"]} products from {filename} ({report["rejected"]} rejected)'
+    )
+    return jsonify({'success': True, **report})
+
 @app.route('/update_product', methods=['POST'])
 @login_required
 def update_product():
@@ -326,16 +1835,50 @@ def update_product():
                 flash('Product ID is missing', 'danger')
                 return redirect(url_for('store'))
                 
-            product = Product.query.get_or_404(product_id)
+            # Locked (fresh from the database, not the identity map) so an
+            # assignment or return cannot slip in between this read and the
+            # write below and be overwritten by the absolute quantity
+            product = db.session.get(Product, product_id, with_for_update=True, populate_existing=True)
+            if product is None:
+                abort(404)
             old_quantity = product.quantity
+            old_category = product.category
+            old_state = product_counter_state(product)
             
-            product.name = form.name.data
-            product.category = form.category.data
-            product.quantity = form.quantity.data
-            product.min_stock_level = form.min_stock_level.data
-            product.description = form.description.data
+            # SQLite ignores FOR UPDATE, so the write is also conditional on
+            # the values the counter deltas were computed from
+            products_table = Product.__table__
+            updated = db.session.execute(
+                db.update(products_table).where(
+                    products_table.c.id == product.id,
+                    products_table.c.quantity == old_quantity,
+                    products_table.c.category.is_not_distinct_from(old_category),
+                    products_table.c.min_stock_level == product.min_stock_level,
+                    products_table.c.is_assigned == product.is_assigned
+                ).values(
+                    name=form.name.data,
+                    category=form.category.data,
+                    quantity=form.quantity.data,
+                    min_stock_level=form.min_stock_level.data,
+                    description=form.description.data
+                ),
+                execution_options={'autocomplete_synced': True}
+            ).rowcount
+            if not updated:
+                db.session.rollback()
+                flash('The product changed while you were saving it. Please check it and try again.', 'warning')
+                return redirect(url_for('store'))
+            db.session.refresh(product)
+            note_autocomplete_change(db.session, product)
             
+            adjust_inventory_counters(old_state, product_counter_state(product))
+            if old_category != product.category:
+                record_stock_changes({old_category: (-old_quantity, -1),
+                                      product.category: (product.quantity, 1)})
+            else:
+                record_stock_change(product.category, product.quantity - old_quantity)
             db.session.commit()
+            view_cache.invalidate(*INVENTORY_VIEWS)
             
             # Log quantity changes
             if old_quantity != product.quantity:
@@ -367,17 +1910,20 @@ def delete_product(product_id):
         product_name = product.name
         
         # Check if product is assigned to any student
-        active_assignments = ProductAssignment.query.filter_by(
-            product_id=product_id,
-            status='assigned'
+        active_assignments = ProductAssignment.query.filter(
+            ProductAssignment.product_id == product_id,
+            ProductAssignment.is_open
         ).count()
         
         if active_assignments > 0:
             flash(f'Cannot delete {product_name} as it is currently assigned to {active_assignments} student(s).', 'danger')
             return redirect(url_for('store'))
         
+        adjust_inventory_counters(before=product_counter_state(product))
         db.session.delete(product)
+        record_stock_change(product.category, -product.quantity, -1)
         db.session.commit()
+        view_cache.invalidate(*INVENTORY_VIEWS)
         
         log_activity(session['user_id'], 'delete_product', f'Deleted product: {product_name}')
         flash(f'Product "{product_name}" has been deleted.', 'success')
@@ -388,12 +1934,112 @@ def delete_product(product_id):
     
     return redirect(url_for('store'))
 
+def load_students_page(department=None, after=None, per_page=20):
+    """One page of students ordered by name, with current_product loaded.
+
+    The products for the whole page are fetched with one extra SELECT ... IN
+    query, so the number of statements does not grow with the page size.
+    """
+    query = Student.query.options(db.selectinload(Student.current_product))
+    if department:
+        query = query.filter(Student.department == department)
+    columns = (Student.full_name, Student.id)
+    return keyset_page(
+        query,
+        columns,
+        after=valid_cursor(after, columns),
+        per_page=per_page,
+        key=lambda s: (s.full_name, s.id)
+    )
+
 @app.route('/students')
 @login_required
 def students():
-    students_list = Student.query.all()
-    available_products = Product.query.filter(Product.quantity > 0).all()
-    return render_template("student_details.html", students=students_list, products=available_products)
+    department = request.args.get('department') or None
+    per_page = get_per_page()
+    students_list, next_after = load_students_page(
+        department=department,
+        after=decode_cursor(request.args.get('cursor')),
+        per_page=per_page
+    )
+    return render_template(
+        "student_details.html",
+        students=students_list,
+        next_cursor=encode_cursor(next_after) if next_after else None,
+        department=department,
+        per_page=per_page
+    )
+
+@app.route('/api/products/available')
+@app.route('/api/autocomplete/products')
+@login_required
+def api_available_products():
+    """Products whose name, or any word in it, starts with ``q``, served
+    from the in-memory prefix index. Only in-stock products are listed
+    unless ``available=0``; this feeds the assign-product picker."""
+    query = request.args.get('q') or ''
+    limit = max(1, min(request.args.get('limit', 20, type=int), app.config['MAX_ITEMS_PER_PAGE']))
+    in_stock_only = request.args.get('available', '1') != '0'
+    
+    matches = product_index.search(
+        query, limit, predicate=(lambda product: product['quantity'] > 0) if in_stock_only else None
+    )
+    return jsonify({
+        'products': [
+            {'id': product_id, 'name': product['name'], 'quantity': product['quantity']}
+            for product_id, product in matches
+        ]
+    })
+
+@app.route('/api/autocomplete/students')
+@login_required
+def api_autocomplete_students():
+    """Students whose name (any word) or roll number starts with ``q``"""
+    query = request.args.get('q') or ''
+    limit = max(1, min(request.args.get('limit', 20, type=int), app.config['MAX_ITEMS_PER_PAGE']))
+    return jsonify({
+        'students': [
+            {'id': student_id, **student}
+            for student_id, student in student_index.search(query, limit)
+        ]
+    })
+
+@app.route('/api/search')
+@login_required
+def api_search():
+    """Search over products and students for type-ahead.
+
+    ``q`` is free text: every word must match a whole word except the
+    last, which may be the start of one. ``type`` restricts to
+    ``products`` or ``students`` and ``limit`` caps the results per type.
+    """
+    query = (request.args.get('q') or '').strip()
+    kind = request.args.get('type')
+    limit = max(1, min(request.args.get('limit', 10, type=int), app.config['MAX_ITEMS_PER_PAGE']))
+    kinds = [kind] if kind in search.SEARCH_TABLES else list(search.SEARCH_TABLES)
+    
+    connection = db.session.connection()
+    results = {}
+    if 'products' in kinds:
+        ids = search.match_ids(connection, 'products', query, limit)
+        rows = {row.id: row for row in db.session.query(
+            Product.id, Product.name, Product.category, Product.quantity
+        ).filter(Product.id.in_(ids))}
+        results['products'] = [
+            {'id': row.id, 'name': row.name, 'category': row.category, 'quantity': row.quantity}
+            for row in (rows.get(id_) for id_ in ids) if row is not None
+        ]
+    if 'students' in kinds:
+        ids = search.match_ids(connection, 'students', query, limit)
+        rows = {row.id: row for row in db.session.query(
+            Student.id, Student.full_name, Student.roll_number, Student.department
+        ).filter(Student.id.in_(ids))}
+        results['students'] = [
+            {'id': row.id, 'full_name': row.full_name, 'roll_number': row.roll_number,
+             'department': row.department}
+            for row in (rows.get(id_) for id_ in ids) if row is not None
+        ]
+    return jsonify({'query': query, **results})
 
 @app.route('/add_student', methods=['POST'])
 @login_required
@@ -432,7 +2078,9 @@ def add_student():
             department=department
         )
         db.session.add(student)
+        adjust_inventory_counters(total_students=1)
         db.session.commit()
+        view_cache.invalidate(*STUDENT_VIEWS)
         
         log_activity(session['user_id'], 'add_student', f'Added student: {student.full_name}')
         flash(f'Student {full_name} added successfully!', 'success')
@@ -443,6 +2091,128 @@ def add_student():
     
     return redirect(url_for('students'))
 
+@app.route('/import/students', methods=['POST'])
+@login_required
+@admin_required
+def import_students_upload():
+    """Create or update students from an uploaded roster (CSV or JSON).
+
+    Rows are matched on roll_number; responds with created, updated and
+    rejected counts as JSON.
+    """
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'success': False, 'message': 'Please choose a roster file to import.'}), 400
+    filename = secure_filename(upload.filename)
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension not in app.config['IMPORT_EXTENSIONS']:
+        return jsonify({'success': False, 'message': 'Only .csv and .json files can be imported.'}), 400
+    
+    try:
+        report = import_students(read_import_file(upload.stream, filename))
+    except (ValueError, UnicodeDecodeError) as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Could not read {filename}: {e}'}), 400
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f'Error importing students: {str(e)}')
+        return jsonify({'success': False, 'message': 'An error occurred while importing the roster.'}), 500
+    finally:
+        # Batches before a failure stay committed
+        view_cache.invalidate(*STUDENT_VIEWS)
+    
+    log_activity(
+        session['user_id'],
+        'import_students',
+        f'Imported roster {filename}: {report["created"]} created, '
+        f'{report["updated"]} updated, {report["rejected"]} rejected'
+    )
+    return jsonify({'success': True, **report})
+
+@app.route('/assign_product/bulk', methods=['POST'])
+@login_required
+def assign_product_bulk():
+    """Assign one product to many students (JSON: product_id plus either
+    student_ids or department)"""
+    data = request.get_json(silent=True) or {}
+    product_id = data.get('product_id')
+    student_ids = data.get('student_ids')
+    department = data.get('department')
+    if not product_id or not (student_ids or department):
+        return jsonify({'success': False,
+                        'message': 'product_id and either student_ids or department are required.'}), 400
+    try:
+        student_ids = [int(student_id) for student_id in student_ids or []]
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'student_ids must be a list of ids.'}), 400
+    
+    try:
+        status, payload = bulk_assign_product(product_id, student_ids=student_ids, department=department)
+        if status != 200:
+            db.session.rollback()
+            return jsonify(payload), status
+        db.session.commit()
+        view_cache.invalidate(*INVENTORY_VIEWS)
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f'Error bulk assigning product: {str(e)}')
+        return jsonify({'success': False, 'message': 'An error occurred while assigning the product.'}), 500
+    
+    log_activity(
+        session['user_id'],
+        'bulk_assign_product',
+        f'Assigned product ID {product_id} to {payload["assigned"]} students'
+        + (f' in {department}' if department else '')
+    )
+    return jsonify(payload)
+
+def assign_product_to_student(student_id, product_id):
+    """Give one unit of a product to a student (a run_write operation).
+
+    Returns ``(status, payload)`` with the JSON response for the route.
+    """
+    student = db.session.get(Student, student_id)
+    product = db.session.get(Product, product_id)
+    if student is None or product is None:
+        return 404, {'success': False, 'message': 'Student or product not found.'}
+    
+    # Check if product is already assigned (if it's a single-item product)
+    if product.is_assigned and product.quantity <= 1:
+        return 400, {'success': False, 'message': f'This {product.name} is already assigned to another student.'}
+    
+    # Check if product is in stock
+    if product.quantity <= 0:
+        return 400, {'success': False, 'message': f'Sorry, {product.name} is out of stock.'}
+    
+    # Decrease quantity by 1 when assigned; a concurrent request may have
+    # taken the last unit since the check above
+    old_state = reserve_stock(product)
+    if old_state is None:
+        return 400, {'success': False, 'message': f'Sorry, {product.name} is out of stock.'}
+    
+    # Create a new assignment record
+    assignment = ProductAssignment(
+        product_id=product.id,
+        student_id=student.id,
+        assigned_date=datetime.utcnow(),
+        status='assigned'
+    )
+    
+    db.session.add(assignment)
+    
+    # Update student's current product
+    student.product_id = product.id
+    student.assignment_date = datetime.utcnow().date()
+    student.return_date = None
+    
+    adjust_inventory_counters(old_state, product_counter_state(product), active_assignments=1)
+    record_stock_change(product.category, -1)
+    return 200, {
+        'success': True,
+        'message': f'{product.name} assigned to {student.full_name} successfully!',
+        'remaining_quantity': product.quantity
+    }
+
 @app.route('/assign_product/<int:student_id>', methods=['POST'])
 @login_required
 @csrf.exempt  # Temporarily exempt to test
@@ -473,68 +2243,28 @@ def assign_product(student_id):
             
         student = Student.query.get_or_404(student_id)
         product = Product.query.get_or_404(product_id)
+        student_name, product_name = student.full_name, product.name
         
-        # Check if product is already assigned (if it's a single-item product)
-        if product.is_assigned and product.quantity <= 1:
-            if request.is_json:
-                return jsonify({
-                    'success': False, 
-                    'message': f'This {product.name} is already assigned to another student.'
-                }), 400
-            else:
-                flash(f'This {product.name} is already assigned to another student.', 'danger')
-                return redirect(url_for('students'))
-            
-        # Check if product is in stock
-        if product.quantity <= 0:
+        status, payload = run_write(assign_product_to_student, student.id, product.id)
+        if status != 200:
             if request.is_json:
-                return jsonify({
-                    'success': False,
-                    'message': f'Sorry, {product.name} is out of stock.'
-                }), 400
+                return jsonify(payload), status
             else:
-                flash(f'Sorry, {product.name} is out of stock.', 'danger')
+                flash(payload['message'], 'danger')
                 return redirect(url_for('students'))
-            
-        # Decrease quantity by 1 when assigned
-        product.quantity -= 1
-        
-        # Mark as assigned if this was the last item
-        if product.quantity == 0:
-            product.is_assigned = True
-        
-        # Create a new assignment record
-        assignment = ProductAssignment(
-            product_id=product.id,
-            student_id=student.id,
-            assigned_date=datetime.utcnow(),
-            status='assigned'
-        )
-        
-        db.session.add(assignment)
-        
-        # Update student's current product
-        student.product_id = product.id
-        student.assignment_date = datetime.utcnow().date()
-        student.return_date = None
-        
-        db.session.commit()
+        view_cache.invalidate(*INVENTORY_VIEWS)
         
         # Log the assignment
         log_activity(
             session['user_id'],
             'assign_product',
-            f'Assigned {product.name} to {student.full_name} (ID: {student.id})'
+            f'Assigned {product_name} to {student_name} (ID: {student_id})'
         )
         
         if request.is_json:
-            return jsonify({
-                'success': True,
-                'message': f'{product.name} assigned to {student.full_name} successfully!',
-                'remaining_quantity': product.quantity
-            })
+            return jsonify(payload)
         else:
-            flash(f'{product.name} assigned to {student.full_name} successfully!', 'success')
+            flash(payload['message'], 'success')
             return redirect(url_for('students'))
         
     except Exception as e:
@@ -549,56 +2279,85 @@ def assign_product(student_id):
             flash('An error occurred while assigning the product.', 'danger')
             return redirect(url_for('students'))
 
+def return_product_from_student(student_id):
+    """Take back the product a student holds (a run_write operation).
+
+    Returns ``(status, payload)`` with the JSON response for the route.
+    """
+    student = db.session.get(Student, student_id)
+    if student is None or not student.product_id:
+        return 400, {
+            'success': False,
+            'message': 'This student does not have any product assigned.'
+        }
+    
+    product_id = student.product_id
+    product = db.session.get(Product, product_id)
+    
+    # Clear the student's product only if nobody else returned it
+    # concurrently, so the stock cannot be credited twice
+    students_table = Student.__table__
+    claimed = db.session.execute(
+        db.update(students_table).where(
+            students_table.c.id == student.id,
+            students_table.c.product_id == product_id
+        ).values(product_id=None, assignment_date=None, return_date=datetime.utcnow().date()),
+        execution_options={'autocomplete_synced': True}
+    ).rowcount
+    if not claimed:
+        return 400, {
+            'success': False,
+            'message': 'This student does not have any product assigned.'
+        }
+    
+    # Update assignment status
+    assignment = ProductAssignment.query.filter(
+        ProductAssignment.student_id == student.id,
+        ProductAssignment.product_id == product_id,
+        ProductAssignment.is_open
+    ).order_by(ProductAssignment.assigned_date.desc()).first()
+    
+    if assignment:
+        assignment.returned_date = datetime.utcnow()
+        assignment.status = 'returned'
+    
+    # Increase quantity when returned
+    if product:
+        old_state = release_stock(product)
+        adjust_inventory_counters(
+            old_state,
+            product_counter_state(product),
+            active_assignments=-1 if assignment else 0
+        )
+        record_stock_change(product.category, 1)
+    db.session.refresh(student)
+    return 200, {
+        'success': True,
+        'message': f'Product returned successfully from {student.full_name}.',
+        'updated_quantity': product.quantity if product else 0,
+        'product_name': product.name if product else 'item'
+    }
+
 @app.route('/return_product/<int:student_id>', methods=['POST'])
 @login_required
 def return_product(student_id):
     try:
         student = Student.query.get_or_404(student_id)
+        student_name = student.full_name
         
-        if not student.product_id:
-            return jsonify({
-                'success': False,
-                'message': 'This student does not have any product assigned.'
-            }), 400
-            
-        product = Product.query.get(student.product_id)
-        
-        # Update assignment status
-        assignment = ProductAssignment.query.filter_by(
-            product_id=student.product_id,
-            student_id=student.id,
-            status='assigned'
-        ).order_by(ProductAssignment.assigned_date.desc()).first()
-        
-        if assignment:
-            assignment.returned_date = datetime.utcnow()
-            assignment.status = 'returned'
-        
-        # Update product quantity
-        if product:
-            product.quantity += 1  # Increase quantity when returned
-            if product.quantity > 0:
-                product.is_assigned = False
-        
-        # Update student record
-        student.product_id = None
-        student.assignment_date = None
-        student.return_date = datetime.utcnow().date()
-        
-        db.session.commit()
+        status, payload = run_write(return_product_from_student, student.id)
+        if status != 200:
+            return jsonify(payload), status
+        view_cache.invalidate(*INVENTORY_VIEWS)
         
         # Log the return
         log_activity(
             session['user_id'],
             'return_product',
-            f'Returned {product.name if product else "item"} from {student.full_name} (ID: {student.id})'
+            f'Returned {payload.pop("product_name")} from {student_name} (ID: {student_id})'
         )
         
-        return jsonify({
-            'success': True,
-            'message': f'Product returned successfully from {student.full_name}.',
-            'updated_quantity': product.quantity if product else 0
-        })
+        return jsonify(payload)
         
     except Exception as e:
         db.session.rollback()
@@ -608,15 +2367,44 @@ def return_product(student_id):
             'message': 'An error occurred while processing the return.'
         }), 500
 
-# Reports
-@app.route('/reports')
+@app.route('/return_product/bulk', methods=['POST'])
 @login_required
-def reports():
-    # Get statistics
-    total_products = Product.query.count()
-    total_students = Student.query.count()
-    assigned_products = ProductAssignment.query.filter_by(status='assigned').count()
-    low_stock_products = Product.query.filter(Product.quantity <= Product.min_stock_level).count()
+def return_product_bulk():
+    """Process many returns at once: JSON with student_ids or roll_numbers,
+    or an uploaded scan file (one roll number per line) in ``file``"""
+    upload = request.files.get('file')
+    if upload and upload.filename:
+        student_ids, roll_numbers = None, read_roll_numbers(upload.stream)
+    else:
+        data = request.get_json(silent=True) or {}
+        student_ids, roll_numbers = data.get('student_ids'), data.get('roll_numbers')
+        if roll_numbers is not None:
+            roll_numbers = [str(roll_number).strip() for roll_number in roll_numbers]
+        else:
+            try:
+                student_ids = [int(student_id) for student_id in student_ids or []]
+            except (TypeError, ValueError):
+                return jsonify({'success': False, 'message': 'student_ids must be a list of ids.'}), 400
+    if not student_ids and not roll_numbers:
+        return jsonify({'success': False, 'message': 'No students given.'}), 400
+    
+    try:
+        results, returned = bulk_return_products(student_ids=student_ids, roll_numbers=roll_numbers)
+        db.session.commit()
+        view_cache.invalidate(*INVENTORY_VIEWS)
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f'Error processing bulk return: {str(e)}')
+        return jsonify({'success': False, 'message': 'An error occurred while processing the returns.'}), 500
+    
+    log_activity(session['user_id'], 'bulk_return_product', f'Processed {returned} returns in bulk')
+    return jsonify({'success': True, 'returned': returned, 'results': results})
+
+# Reports
+@view_cache.cached('reports')
+def report_data():
+    """Everything the reports page renders, as template keyword arguments."""
+    counters = get_inventory_counters()
     
     # Get products by category
     category_counts = db.session.query(
@@ -636,113 +2424,257 @@ def reports():
     
     # Recent assignments count (last 30 days)
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    recent_assignments = ProductAssignment.query.filter(
-        ProductAssignment.assigned_date >= thirty_days_ago
-    ).count()
-    
-    return render_template('reports.html',
-                         total_products=total_products,
-                         total_students=total_students,
-                         assigned_products=assigned_products,
-                         low_stock_products=low_stock_products,
-                         category_data=json.dumps(category_data),
-                         department_data=json.dumps(department_data),
-                         recent_assignments=recent_assignments)
+    
+    return {
+        'total_products': counters.total_products,
+        'total_students': counters.total_students,
+        'assigned_products': counters.active_assignments,
+        'low_stock_products': counters.low_stock_count,
+        'category_data': json.dumps(category_data),
+        'department_data': json.dumps(department_data),
+        'recent_assignments': count_assignments(start=thirty_days_ago)
+    }
+
+@app.route('/reports')
+@login_required
+@read_replica
+def reports():
+    return render_template('reports.html', **report_data())
 
 # API endpoint for analytics
 @app.route('/api/analytics')
 @login_required
+@read_replica
 def api_analytics():
-    """API endpoint for real-time analytics data"""
-    # Generate mock stock trend data for last 30 days
+    """Stock history served from the stock_snapshots table.
+
+    Query parameters: ``start``/``end`` (YYYY-MM-DD, default the last 30
+    days), ``granularity`` (day or hour), ``category`` to restrict to one
+    category and ``by_category=1`` to include a per-category breakdown.
+    """
+    granularity = 'hour' if request.args.get('granularity') == 'hour' else 'day'
+    category = request.args.get('category')
+    by_category = request.args.get('by_category') == '1'
+    
+    try:
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d') if request.args.get('end') else today
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d') if request.args.get('start') else end - timedelta(days=29)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates must be in YYYY-MM-DD format.'}), 400
+    if granularity == 'hour':
+        end = min(end + timedelta(hours=23), datetime.utcnow().replace(minute=0, second=0, microsecond=0))
+    
+    step = timedelta(days=1) if granularity == 'day' else timedelta(hours=1)
+    points = (end - start) // step + 1
+    if points < 1 or points > app.config['MAX_ANALYTICS_POINTS']:
+        return jsonify({
+            'success': False,
+            'message': f'The range must cover between 1 and {app.config["MAX_ANALYTICS_POINTS"]} {granularity}s.'
+        }), 400
+    
+    return jsonify(analytics_payload(start, end, granularity, category, by_category))
+
+@view_cache.cached('analytics')
+def analytics_payload(start, end, granularity='day', category=None, by_category=False):
+    date_format = '%Y-%m-%d' if granularity == 'day' else '%Y-%m-%dT%H:00'
     stock_trend = []
-    for i in range(30, 0, -1):
-        date = (datetime.utcnow() - timedelta(days=i)).strftime('%Y-%m-%d')
-        # Get total stock for that day (simplified - using current stock)
-        total_stock = db.session.query(db.func.sum(Product.quantity)).scalar() or 0
-        stock_trend.append({
-            'date': date,
-            'stock': total_stock + (i * 2)  # Simulate historical data
-        })
+    for bucket, quantities in stock_series(start, end, granularity, category):
+        point = {'date': bucket.strftime(date_format), 'stock': sum(quantities.values())}
+        if by_category:
+            point['categories'] = {name or 'Uncategorized': qty for name, qty in quantities.items()}
+        stock_trend.append(point)
     
-    return jsonify({
+    return {
+        'granularity': granularity,
+        'start': start.strftime(date_format),
+        'end': end.strftime(date_format),
         'stock_trend': stock_trend
-    })
+    }
 
 # Export routes
+EXPORT_BATCH_SIZE = 1000
+
+def stream_csv(filename, header, rows):
+    """Stream ``rows`` to the client as a CSV attachment.
+
+    Rows are written through the csv module (so embedded commas and quotes
+    are escaped) into a small buffer that is flushed every few kilobytes;
+    the full file never exists in memory.
+    """
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= 16 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    response = Response(stream_with_context(generate()), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
 @app.route('/export/products')
 @login_required
+@read_replica
 def export_products():
     """Export products to CSV"""
-    import io
-    from flask import make_response
-    
-    # Get all products
-    products = Product.query.all()
-    
-    # Create CSV
-    output = io.StringIO()
-    output.write('ID,Name,Category,Quantity,Min Stock Level,Description,Date of Issue,Status\n')
-    
-    for product in products:
-        status = 'Low Stock' if product.is_low_stock else 'In Stock'
-        output.write(f'{product.id},{product.name},{product.category},{product.quantity},'
-                    f'{product.min_stock_level},"{product.description or ""}",{product.date_of_issue},{status}\n')
-    
-    # Create response
-    response = make_response(output.getvalue())
-    response.headers['Content-Disposition'] = 'attachment; filename=products_export.csv'
-    response.headers['Content-Type'] = 'text/csv'
-    
-    return response
+    # Plain column tuples: no ORM instances, no identity map
+    products = db.session.query(
+        Product.id, Product.name, Product.category, Product.quantity,
+        Product.min_stock_level, Product.description, Product.date_of_issue
+    ).order_by(Product.id).yield_per(EXPORT_BATCH_SIZE)
+    rows = (
+        (product.id, product.name, product.category, product.quantity,
+         product.min_stock_level, product.description or '', product.date_of_issue,
+         'Low Stock' if product.quantity <= product.min_stock_level else 'In Stock')
+        for product in products
+    )
+    return stream_csv(
+        'products_export.csv',
+        ['ID', 'Name', 'Category', 'Quantity', 'Min Stock Level', 'Description', 'Date of Issue', 'Status'],
+        rows
+    )
 
 @app.route('/export/students')
 @login_required
+@read_replica
 def export_students():
     """Export students to CSV"""
-    import io
-    from flask import make_response
-    
-    # Get all students
-    students = Student.query.all()
-    
-    # Create CSV
-    output = io.StringIO()
-    output.write('ID,Full Name,Roll Number,Email,Phone,Department,Assigned Product,Assignment Date\n')
-    
-    for student in students:
-        product_name = student.current_product.name if student.product_id and student.current_product else 'None'
-        assignment_date = student.assignment_date if student.assignment_date else 'N/A'
-        output.write(f'{student.id},{student.full_name},{student.roll_number},'
-                    f'{student.email or "N/A"},{student.phone or "N/A"},{student.department or "N/A"},'
-                    f'{product_name},{assignment_date}\n')
-    
-    # Create response
-    response = make_response(output.getvalue())
-    response.headers['Content-Disposition'] = 'attachment; filename=students_export.csv'
-    response.headers['Content-Type'] = 'text/csv'
+    # One outer join for the assigned product name instead of a lazy load per student
+    students = db.session.query(
+        Student.id, Student.full_name, Student.roll_number, Student.email,
+        Student.phone, Student.department, Student.assignment_date,
+        Product.name.label('product_name')
+    ).outerjoin(Product, Student.product_id == Product.id).order_by(Student.id).yield_per(EXPORT_BATCH_SIZE)
+    rows = (
+        (student.id, student.full_name, student.roll_number,
+         student.email or 'N/A', student.phone or 'N/A', student.department or 'N/A',
+         student.product_name or 'None', student.assignment_date or 'N/A')
+        for student in students
+    )
+    return stream_csv(
+        'students_export.csv',
+        ['ID', 'Full Name', 'Roll Number', 'Email', 'Phone', 'Department', 'Assigned Product', 'Assignment Date'],
+        rows
+    )
+
+@app.route('/export/assignments')
+@login_required
+@read_replica
+def export_assignments():
+    """Export assignment history to CSV, including archived assignments
+    when ``start``/``end`` (YYYY-MM-DD, both optional) reach back that far"""
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d') if request.args.get('start') else None
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d') + timedelta(days=1) if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates must be in YYYY-MM-DD format.'}), 400
     
-    return response
+    history = assignment_history(start, end).subquery()
+    assignments = db.session.query(
+        history.c.id, Product.name.label('product_name'), Student.full_name, Student.roll_number,
+        history.c.assigned_date, history.c.returned_date, history.c.status
+    ).outerjoin(Product, history.c.product_id == Product.id).outerjoin(
+        Student, history.c.student_id == Student.id
+    ).order_by(history.c.assigned_date, history.c.id).yield_per(EXPORT_BATCH_SIZE)
+    rows = (
+        (row.id, row.product_name or 'Deleted product', row.full_name or 'Deleted student',
+         row.roll_number or 'N/A', row.assigned_date, row.returned_date or 'N/A', row.status)
+        for row in assignments
+    )
+    return stream_csv(
+        'assignments_export.csv',
+        ['ID', 'Product', 'Student', 'Roll Number', 'Assigned Date', 'Returned Date', 'Status'],
+        rows
+    )
 
 # Notifications
-@app.route('/notifications')
-@login_required
-def notifications():
+@view_cache.cached('notifications')
+def notification_data():
     # Get low stock products
     low_stock_products = Product.query.filter(
-        Product.quantity <= Product.min_stock_level
+        Product.is_low_stock
     ).all()
     
     # Get overdue returns (products assigned for more than 30 days)
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
     overdue_assignments = ProductAssignment.query.filter(
-        ProductAssignment.status == 'assigned',
+        ProductAssignment.is_open,
         ProductAssignment.assigned_date < thirty_days_ago
+    ).options(
+        db.joinedload(ProductAssignment.product),
+        db.joinedload(ProductAssignment.student)
     ).all()
     
-    return render_template('notifications.html',
-                         low_stock_products=low_stock_products,
-                         overdue_assignments=overdue_assignments)
+    return {
+        'low_stock_products': [snapshot(product) for product in low_stock_products],
+        'overdue_assignments': [snapshot(a, 'product', 'student') for a in overdue_assignments]
+    }
+
+@app.route('/notifications')
+@login_required
+@read_replica
+def notifications():
+    return render_template('notifications.html', **notification_data())
+
+@app.route('/api/cache/stats')
+@login_required
+@admin_required
+def api_cache_stats():
+    """Hit/miss counters of the view cache in this process."""
+    return jsonify(view_cache.stats())
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint, for admins or with METRICS_TOKEN."""
+    token = app.config['METRICS_TOKEN']
+    authorized = session.get('is_admin') or (
+        token and request.headers.get('Authorization') == f'Bearer {token}')
+    if not authorized:
+        abort(403)
+    return Response(instrumentation.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/profiles')
+@login_required
+@admin_required
+def admin_profiles():
+    """Profiler settings and the recent profiles of this process."""
+    return jsonify({'settings': profiler.settings(), 'profiles': profiler.profiles()})
+
+@app.route('/admin/profiles/settings', methods=['POST'])
+@login_required
+@admin_required
+def admin_profile_settings():
+    """Change the sampling rate (0 to 1) and the profiled endpoints
+    (an empty list profiles every endpoint) without a restart."""
+    data = request.get_json(silent=True) or {}
+    endpoints = data.get('endpoints')
+    if endpoints is not None and (not isinstance(endpoints, list)
+                                  or any(name not in app.view_functions for name in endpoints)):
+        return jsonify({'success': False, 'message': 'Endpoints must be a list of endpoint names.'}), 400
+    try:
+        profiler.configure(sample_rate=data.get('sample_rate'), endpoints=endpoints)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'The sample rate must be a number between 0 and 1.'}), 400
+    app.logger.info(f'Profiler settings changed by user {session["user_id"]}: {profiler.settings()}')
+    return jsonify({'success': True, **profiler.settings()})
+
+@app.route('/admin/profiles/<int:profile_id>.folded')
+@login_required
+@admin_required
+def admin_profile_download(profile_id):
+    """A stored profile as collapsed stacks, for flamegraph.pl or speedscope."""
+    collapsed = profiler.collapsed(profile_id)
+    if collapsed is None:
+        return jsonify({'success': False, 'message': 'Profile not found.'}), 404
+    response = Response(collapsed, mimetype='text/plain')
+    response.headers['Content-Disposition'] = f'attachment; filename=profile-{profile_id}.folded'
+    return response
 
 # Settings
 @app.route('/settings')
@@ -751,13 +2683,134 @@ def settings():
     return render_template('settings.html')
 
 # Activity Logs
+ACTIVITY_LOG_COUNT_CAP = 10000
+
+def activity_log_filters(model=ActivityLog):
+    """Filters for ``model`` from the request's ``user_id``, ``action`` and
+    ``start``/``end`` (YYYY-MM-DD, inclusive) arguments; raises ValueError
+    on a malformed date."""
+    filters = []
+    user_id = request.args.get('user_id', type=int)
+    if user_id is not None:
+        filters.append(model.user_id == user_id)
+    if request.args.get('action'):
+        filters.append(model.action == request.args['action'])
+    if request.args.get('start'):
+        filters.append(model.timestamp >= datetime.strptime(request.args['start'], '%Y-%m-%d'))
+    if request.args.get('end'):
+        filters.append(model.timestamp < datetime.strptime(request.args['end'], '%Y-%m-%d') + timedelta(days=1))
+    return filters
+
+def load_activity_logs_page(filters=(), after=None, per_page=20, model=ActivityLog):
+    """One page of log entries, newest first, keyed on (timestamp, id).
+
+    Unlike OFFSET, the cost of a page does not depend on how deep it is.
+    Legacy entries without a timestamp come after all the others, newest id
+    first, whatever order the database gives NULLs; in the cursor their
+    timestamp is None.
+    """
+    if after is not None:
+        try:
+            after = (None if after[0] is None else datetime.fromisoformat(after[0]), int(after[1]))
+        except (TypeError, ValueError, IndexError):
+            after = None
+    key = lambda log: (log.timestamp.isoformat() if log.timestamp else None, log.id)
+    query = model.query.filter(*filters)
+    untimed = query.filter(model.timestamp.is_(None))
+    rows = []
+    if after is None or after[0] is not None:
+        rows, next_after = keyset_page(
+            query.filter(model.timestamp.isnot(None)),
+            (model.timestamp, model.id),
+            after=after,
+            per_page=per_page,
+            descending=True,
+            key=key
+        )
+        if next_after is not None:
+            return rows, next_after
+        if len(rows) == per_page:
+            more = db.session.query(untimed.exists()).scalar()
+            return rows, key(rows[-1]) if more else None
+        after = None
+    tail, next_after = keyset_page(
+        untimed,
+        (model.id,),
+        after=after[1:] if after else None,
+        per_page=per_page - len(rows),
+        descending=True,
+        key=key
+    )
+    return rows + tail, next_after
+
+def approximate_activity_count(filters=(), model=ActivityLog):
+    """Cheap total for the log listing; returns ``(count, exact)``.
+
+    Without filters the id range is used (ids only grow and archiving
+    removes the oldest ones), or the planner's row estimate on PostgreSQL.
+    Filtered counts stop at ACTIVITY_LOG_COUNT_CAP rows.
+    """
+    if not filters:
+        if db.session.get_bind().dialect.name == 'postgresql':
+            estimate = db.session.scalar(db.text(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = :table'
+            ), {'table': model.__tablename__})
+        else:
+            low, high = db.session.execute(db.select(db.func.min(model.id), db.func.max(model.id))).one()
+            estimate = high - low + 1 if high is not None else 0
+        return max(int(estimate or 0), 0), False
+    capped = db.select(model.id).where(*filters).limit(ACTIVITY_LOG_COUNT_CAP + 1).subquery()
+    count = db.session.scalar(db.select(db.func.count()).select_from(capped))
+    return min(count, ACTIVITY_LOG_COUNT_CAP), count <= ACTIVITY_LOG_COUNT_CAP
+
+def activity_log_listing():
+    """Shared by the page and the JSON endpoint; returns a dict or raises ValueError."""
+    model = ActivityLogArchive if request.args.get('archived') == '1' else ActivityLog
+    filters = activity_log_filters(model)
+    per_page = get_per_page()
+    logs, next_after = load_activity_logs_page(
+        filters,
+        after=decode_cursor(request.args.get('cursor')),
+        per_page=per_page,
+        model=model
+    )
+    listing = {
+        'logs': logs,
+        'next_cursor': encode_cursor(next_after) if next_after else None,
+        'per_page': per_page,
+        'total': None,
+        'total_exact': None
+    }
+    if request.args.get('total') == '1':
+        listing['total'], listing['total_exact'] = approximate_activity_count(filters, model)
+    return listing
+
 @app.route('/activity_logs')
 @login_required
 @admin_required
 def activity_logs():
-    page = request.args.get('page', 1, type=int)
-    logs = ActivityLog.query.order_by(ActivityLog.timestamp.desc()).paginate(page=page, per_page=20)
-    return render_template('activity_logs.html', logs=logs)
+    try:
+        listing = activity_log_listing()
+    except ValueError:
+        flash('Dates must be in YYYY-MM-DD format.', 'danger')
+        return redirect(url_for('activity_logs'))
+    return render_template('activity_logs.html', **listing, filters=request.args)
+
+@app.route('/api/activity_logs')
+@login_required
+@admin_required
+def api_activity_logs():
+    """Activity log entries as JSON; same arguments as /activity_logs"""
+    try:
+        listing = activity_log_listing()
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates must be in YYYY-MM-DD format.'}), 400
+    listing['logs'] = [
+        {'id': log.id, 'user_id': log.user_id, 'action': log.action, 'details': log.details,
+         'timestamp': log.timestamp.isoformat() if log.timestamp else None, 'ip_address': log.ip_address}
+        for log in listing['logs']
+    ]
+    return jsonify(listing)
 
 # Error Handlers
 @app.errorhandler(404)
@@ -783,6 +2836,10 @@ def init_db():
             db.session.add(admin)
             db.session.commit()
             print('Created admin user with username: admin, password: admin')
+        
+        # Warm the autocomplete indexes so the first lookup is not a load
+        product_index.load()
+        student_index.load()
 
 if __name__ == '__main__':
     init_db()
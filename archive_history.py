@@ -0,0 +1,46 @@
+"""
+Move old history out of product_assignments and activity_logs
+Usage: python archive_history.py [--assignments-days N] [--logs-days N]
+                                 [--batch-size N] [--max-batches N] [--pause SECONDS]
+
+Returned assignments and activity log entries older than the configured
+age (ARCHIVE_ASSIGNMENTS_AFTER_DAYS / ARCHIVE_ACTIVITY_LOGS_AFTER_DAYS) are
+moved to the *_archive tables in small batches, each in its own short
+transaction, so the application keeps running while this does. Run it from
+cron, e.g. nightly; --max-batches bounds one run and the next run continues
+where it stopped.
+"""
+
+import argparse
+import time
+
+from app import app, db, archive_assignments, archive_activity_logs
+
+def run(label, batches, pause):
+    moved = 0
+    start = time.perf_counter()
+    for count in batches:
+        moved += count
+        print(f"  {label}: {moved} archived", end='\r', flush=True)
+        if pause:
+            time.sleep(pause)
+    print(f"[OK] Archived {moved} {label} in {time.perf_counter() - start:.2f}s")
+    return moved
+
+def main():
+    parser = argparse.ArgumentParser(description='Move old history into the archive tables')
+    parser.add_argument('--assignments-days', type=int, default=None)
+    parser.add_argument('--logs-days', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('--max-batches', type=int, default=None, help='stop after this many batches per table')
+    parser.add_argument('--pause', type=float, default=0, help='seconds to sleep between batches')
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        options = {'batch_size': args.batch_size, 'max_batches': args.max_batches}
+        run('returned assignments', archive_assignments(args.assignments_days, **options), args.pause)
+        run('activity log entries', archive_activity_logs(args.logs_days, **options), args.pause)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""
+Buffered writer for activity log entries
+
+log_activity() used to add and commit an ActivityLog row inside every
+request, doubling the number of commits on each write route. AuditWriter
+collects the entries in memory instead and hands them to a flush function
+in batches from a background thread, either when the batch fills up or
+after a short interval, and once more at interpreter shutdown.
+
+If a flush fails because the database is away (locked, unreachable: one
+of ``transient_errors``) the batch is appended to a JSON-lines fallback
+file and replayed in front of the next successful flush, so entries are
+not lost meanwhile. Any other error means some entry cannot be stored at
+all (a constraint or type error), so the batch is retried entry by entry
+and the entries that still fail are moved to a quarantine file
+(``<fallback>.rejected.jsonl``) instead of blocking every later flush.
+
+The fallback file may be shared by several worker processes. Appending to
+it, and replaying and removing it, happen under an exclusive lock on
+``<fallback>.lock``; where file locks are not available (no fcntl), each
+process uses a fallback file of its own instead.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+def _decode(obj):
+    if '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+class AuditWriter:
+    """Queue entries in memory and write them in bulk from a worker thread.
+
+    ``flush_fn(entries)`` receives a list of dicts and must raise if they
+    could not be stored, storing none of them. ``transient_errors`` are the
+    exception types that mean the store is unavailable rather than that an
+    entry is bad.
+    """
+
+    def __init__(self, flush_fn, batch_size=100, flush_interval=1.0, fallback_path=None,
+                 transient_errors=(OSError,)):
+        self.flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        if fallback_path and fcntl is None:
+            root, ext = os.path.splitext(fallback_path)
+            fallback_path = f'{root}.{os.getpid()}{ext}'
+        self.fallback_path = fallback_path
+        self.transient_errors = tuple(transient_errors)
+        self._fallback_locked = False
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._closed = False
+
+    def submit(self, entry):
+        """Queue one entry; starts the worker thread on first use."""
+        with self._lock:
+            if self._thread is None and not self._closed:
+                self._start()
+            self._pending.append(entry)
+            full = len(self._pending) >= self.batch_size
+        if full or self._closed:
+            self._wakeup.set()
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Write everything queued so far; returns the number of entries stored."""
+        with self._flush_lock:
+            with self._lock:
+                entries, self._pending = self._pending, []
+            if not self._has_fallback():
+                stored, failed = self._store(entries)
+                if failed:
+                    self._write_fallback(failed)
+                return stored
+            with self._fallback_lock():
+                replay = self._read_fallback()
+                stored, failed = self._store(replay + entries)
+                if failed:
+                    # Replaced in one step: a crash may replay entries twice
+                    # but cannot lose them
+                    temporary = self.fallback_path + '.tmp'
+                    if os.path.exists(temporary):
+                        os.remove(temporary)
+                    self._write_lines(temporary, failed)
+                    os.replace(temporary, self.fallback_path)
+                else:
+                    os.remove(self.fallback_path)
+                return stored
+
+    def _store(self, entries):
+        """Write ``entries``; returns the number stored and the entries that
+        failed because the store is unavailable."""
+        if not entries:
+            return 0, []
+        try:
+            self.flush_fn(entries)
+            return len(entries), []
+        except self.transient_errors as e:
+            logger.error(f'Error writing {len(entries)} activity log entries: {e}')
+            return 0, entries
+        except Exception as e:
+            logger.error(f'Error writing {len(entries)} activity log entries, retrying them one by one: {e}')
+        stored = 0
+        for position, entry in enumerate(entries):
+            try:
+                self.flush_fn([entry])
+            except self.transient_errors as e:
+                logger.error(f'Error writing {len(entries) - position} activity log entries: {e}')
+                return stored, entries[position:]
+            except Exception as e:
+                logger.error(f'Quarantined an activity log entry that cannot be stored: {e}')
+                self._quarantine(entry)
+            else:
+                stored += 1
+        return stored, []
+
+    def close(self):
+        """Stop the worker thread and flush synchronously."""
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval * 5)
+        self.flush()
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Unexpected error in the audit writer thread')
+
+    @property
+    def quarantine_path(self):
+        if not self.fallback_path:
+            return None
+        return os.path.splitext(self.fallback_path)[0] + '.rejected.jsonl'
+
+    def _has_fallback(self):
+        return bool(self.fallback_path) and os.path.exists(self.fallback_path)
+
+    @contextmanager
+    def _fallback_lock(self):
+        """Hold the fallback files against the other processes sharing them."""
+        if fcntl is None or self._fallback_locked:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.fallback_path) or '.', exist_ok=True)
+        with open(self.fallback_path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._fallback_locked = True
+            try:
+                yield
+            finally:
+                self._fallback_locked = False
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_fallback(self):
+        if not self._has_fallback():
+            return []
+        with open(self.fallback_path, encoding='utf-8') as fallback:
+            return [json.loads(line, object_hook=_decode) for line in fallback if line.strip()]
+
+    def _write_fallback(self, entries):
+        if not self.fallback_path:
+            logger.error(f'Dropped {len(entries)} activity log entries (no fallback file configured)')
+            return
+        with self._fallback_lock():
+            self._write_lines(self.fallback_path, entries)
+
+    def _quarantine(self, entry):
+        if not self.fallback_path:
+            logger.error(f'Dropped an activity log entry that cannot be stored: {entry!r}')
+            return
+        with self._fallback_lock():
+            self._write_lines(self.quarantine_path, [entry])
+
+    def _write_lines(self, path, entries):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as lines:
+            for entry in entries:
+                lines.write(json.dumps(entry, default=_encode) + '\n')
+            lines.flush()
+            os.fsync(lines.fileno())
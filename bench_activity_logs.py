@@ -0,0 +1,68 @@
+"""
+Benchmark browsing the activity log: the original paginate() (COUNT(*) plus
+OFFSET) versus cursor pagination on (timestamp, id), for page 1 and a deep
+page.
+
+Usage: python bench_activity_logs.py [--rows N] [--page N] [--iterations N]
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from bench_common import app, db, report, reset_database, time_calls
+from app import ActivityLog, load_activity_logs_page
+
+ACTIONS = ['login', 'logout', 'assign_product', 'return_product', 'add_product', 'update_product']
+
+def seed_logs(rows, batch_size=50000):
+    start = datetime.utcnow() - timedelta(days=365)
+    step = timedelta(days=365) / rows
+    insert = 'INSERT INTO activity_logs (user_id, action, details, timestamp, ip_address) VALUES (?, ?, ?, ?, ?)'
+    with db.engine.begin() as connection:
+        for first in range(0, rows, batch_size):
+            connection.exec_driver_sql(insert, [
+                (random.randint(1, 50), random.choice(ACTIONS), f'Synthetic entry {i}',
+                 (start + step * i).isoformat(' ', 'microseconds'), '127.0.0.1')
+                for i in range(first, min(first + batch_size, rows))
+            ])
+        connection.exec_driver_sql('ANALYZE')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--page', type=int, default=10000)
+    parser.add_argument('--per-page', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    with app.app_context():
+        print(f'Seeding {args.rows} activity log entries...')
+        reset_database()
+        seed_logs(args.rows)
+
+        def legacy(page):
+            return lambda: ActivityLog.query.order_by(ActivityLog.timestamp.desc()).paginate(
+                page=page, per_page=args.per_page, error_out=False
+            ).items
+
+        # Cursor of the row just before the deep page, as a client would hold it
+        previous = ActivityLog.query.order_by(ActivityLog.timestamp.desc(), ActivityLog.id.desc()).offset(
+            (args.page - 1) * args.per_page - 1
+        ).first()
+        deep_cursor = [previous.timestamp.isoformat(), previous.id]
+
+        def keyset(after):
+            return lambda: load_activity_logs_page(after=after, per_page=args.per_page)
+
+        report('paginate page 1', time_calls(legacy(1), args.iterations))
+        report(f'paginate page {args.page}', time_calls(legacy(args.page), args.iterations))
+        report('cursor page 1', time_calls(keyset(None), args.iterations))
+        report(f'cursor page {args.page}', time_calls(keyset(deep_cursor), args.iterations))
+
+        logs, _ = load_activity_logs_page(after=deep_cursor, per_page=args.per_page)
+        expected = legacy(args.page)()
+        assert [log.id for log in logs] == [log.id for log in expected]
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark assign/return throughput with synchronous activity logging
+versus the buffered audit writer.
+
+Usage: python bench_audit.py [--operations N]
+"""
+
+import argparse
+import time
+
+from bench_common import app, db, Product, Student, reset_database, seed_inventory
+from app import audit_writer, ActivityLog
+
+def run_cycles(client, student_ids, product_ids, operations):
+    """Alternate assign and return requests; returns operations per second"""
+    start = time.perf_counter()
+    for i in range(operations // 2):
+        student_id = student_ids[i % len(student_ids)]
+        client.post(f'/assign_product/{student_id}', json={'product_id': product_ids[i % len(product_ids)]})
+        client.post(f'/return_product/{student_id}')
+    return (operations // 2 * 2) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--operations', type=int, default=2000)
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.logger.disabled = True
+    with app.app_context():
+        reset_database()
+        seed_inventory(products=100, students=100)
+        db.session.execute(db.update(Product).values(quantity=1000000))
+        db.session.commit()
+        student_ids = [row.id for row in db.session.query(Student.id)]
+        product_ids = [row.id for row in db.session.query(Product.id)]
+
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+            sess['username'] = 'admin'
+            sess['is_admin'] = True
+
+        for label, buffered in [('synchronous log_activity', False), ('buffered audit writer', True)]:
+            app.config['AUDIT_BUFFER_ENABLED'] = buffered
+            ops = run_cycles(client, student_ids, product_ids, args.operations)
+            audit_writer.flush()
+            print(f'{label:<26} {ops:8.1f} ops/s')
+
+    with app.app_context():
+        print(f'Activity log rows written: {ActivityLog.query.count()}')
+
+if __name__ == '__main__':
+    main()
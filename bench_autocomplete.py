@@ -0,0 +1,45 @@
+"""
+Benchmark product type-ahead: the original ILIKE prefix query behind
+/api/products/available versus the in-memory prefix index.
+
+Usage: python bench_autocomplete.py [--products N] [--iterations N]
+"""
+
+import argparse
+import random
+import string
+import time
+
+from bench_common import app, db, Product, report, reset_database, seed_inventory, time_calls
+from app import product_index
+
+def legacy_available_products(prefix, limit=20):
+    """The picker query as it was before the prefix index"""
+    query = db.session.query(Product.id, Product.name, Product.quantity).filter(Product.quantity > 0)
+    if prefix:
+        query = query.filter(Product.name.ilike(f'{prefix}%'))
+    return query.order_by(Product.name, Product.id).limit(limit).all()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=200000)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    with app.app_context():
+        print(f'Seeding {args.products} products...')
+        reset_database()
+        seed_inventory(products=args.products, students=0)
+
+        start = time.perf_counter()
+        product_index.load()
+        print(f'Index warmed with {len(product_index)} products in {time.perf_counter() - start:.2f}s')
+
+        prefixes = [''] + ['Product ' + ''.join(random.choices(string.digits, k=n)) for n in (1, 3, 5)]
+        in_stock = lambda product: product['quantity'] > 0
+        for prefix in prefixes:
+            report(f'ILIKE {prefix!r}', time_calls(lambda: legacy_available_products(prefix), args.iterations // 10))
+            report(f'index {prefix!r}', time_calls(lambda: product_index.search(prefix, 20, in_stock), args.iterations))
+
+if __name__ == '__main__':
+    main()
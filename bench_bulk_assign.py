@@ -0,0 +1,49 @@
+"""
+Benchmark issuing one product to a whole class: one /assign_product
+request per student versus a single /assign_product/bulk request.
+
+Usage: python bench_bulk_assign.py [--students N]
+"""
+
+import argparse
+import time
+
+from bench_common import app, db, Product, Student, reset_database, seed_inventory
+
+def prepare(students):
+    with app.app_context():
+        reset_database()
+        seed_inventory(products=2, students=students)
+        db.session.execute(db.update(Product).values(quantity=students * 2))
+        db.session.commit()
+        return [row.id for row in db.session.query(Student.id).order_by(Student.id)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=1000)
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.logger.disabled = True
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+            sess['username'] = 'admin'
+            sess['is_admin'] = True
+
+        student_ids = prepare(args.students)
+        start = time.perf_counter()
+        for student_id in student_ids:
+            client.post(f'/assign_product/{student_id}', json={'product_id': 1})
+        loop = time.perf_counter() - start
+        print(f'per-student requests  {loop:7.2f}s  {len(student_ids) / loop:9.1f} students/s')
+
+        student_ids = prepare(args.students)
+        start = time.perf_counter()
+        response = client.post('/assign_product/bulk', json={'product_id': 1, 'student_ids': student_ids})
+        bulk = time.perf_counter() - start
+        assert response.get_json()['assigned'] == len(student_ids)
+        print(f'single bulk request   {bulk:7.2f}s  {len(student_ids) / bulk:9.1f} students/s')
+
+if __name__ == '__main__':
+    main()
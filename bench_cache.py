@@ -0,0 +1,91 @@
+"""
+Load-test the read-heavy views with and without the view cache.
+
+Worker threads issue a mix of dashboard, reports, notifications and
+analytics requests for a fixed time; every --write-every requests one of
+them invalidates the cached views, as a write route does after it commits.
+The same workload runs once with the cache disabled (NullCache) and once
+with the in-process LRU, and the throughput of each is printed.
+
+/api/analytics goes through the test client; the other views render
+templates, so their workers call the functions that produce the template
+data (which is what the cache holds).
+
+Usage: python bench_cache.py [--products N] [--students N] [--threads N]
+                             [--seconds S] [--write-every N]
+"""
+
+import argparse
+import threading
+import time
+
+from bench_common import app, db, percentile, reset_database, seed_inventory
+from app import (view_cache, cached_dashboard_stats, report_data, notification_data,
+                 take_stock_snapshot, INVENTORY_VIEWS)
+from cache import MemoryCache, NullCache
+
+def worker(deadline, write_every, latencies, errors):
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+            sess['username'] = 'admin'
+            sess['is_admin'] = True
+        with app.app_context():
+            requests = [
+                cached_dashboard_stats,
+                report_data,
+                notification_data,
+                lambda: client.get('/api/analytics?by_category=1').get_json()['stock_trend'],
+            ]
+            count = 0
+            while time.perf_counter() < deadline:
+                count += 1
+                if count % write_every == 0:
+                    view_cache.invalidate(*INVENTORY_VIEWS)
+                start = time.perf_counter()
+                try:
+                    requests[count % len(requests)]()
+                except Exception:
+                    errors.append(1)
+                latencies.append((time.perf_counter() - start) * 1000)
+                db.session.remove()
+
+def load_test(threads, seconds, write_every):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + seconds
+    workers = [threading.Thread(target=worker, args=(deadline, write_every, latencies, errors))
+               for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return latencies, errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-every', type=int, default=100)
+    args = parser.parse_args()
+
+    with app.app_context():
+        print(f'Seeding {args.products} products / {args.students} students...')
+        reset_database()
+        seed_inventory(products=args.products, students=args.students, assignments=args.students)
+        take_stock_snapshot()
+        db.session.commit()
+        cached_dashboard_stats.uncached()  # builds the inventory counters
+
+    for label, backend in [('no cache', NullCache()), ('memory LRU', MemoryCache())]:
+        view_cache.backend = backend
+        view_cache.clear()
+        latencies, errors = load_test(args.threads, args.seconds, args.write_every)
+        stats = view_cache.stats()
+        print(f'{label:<12} {len(latencies) / args.seconds:9.1f} req/s  '
+              f'p50={percentile(latencies, 50):8.2f}ms  p99={percentile(latencies, 99):8.2f}ms  '
+              f'hit rate={stats["hit_rate"] or 0:.2%}  errors={len(errors)}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Shared helpers for the benchmark scripts (bench_*.py)
+
+Importing this module points the application at a scratch database, so
+benchmarks never touch the real inventory database: BENCH_DATABASE_URL, or
+by default a SQLite file in the temp directory (BENCH_DB). DATABASE_URL
+and DATABASE_READ_URL are overridden even if they are set, since
+reset_database() drops every table; it also refuses to run against any
+other database.
+"""
+
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BENCH_DB = os.path.abspath(os.environ.get('BENCH_DB') or os.path.join(tempfile.gettempdir(), 'inventory_bench.db'))
+BENCH_DATABASE_URL = os.environ.get('BENCH_DATABASE_URL') or f'sqlite:///{BENCH_DB}'
+os.environ['DATABASE_URL'] = BENCH_DATABASE_URL
+os.environ.pop('DATABASE_READ_URL', None)
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from app import app, db, Product, Student, ProductAssignment
+
+CATEGORIES = ['Electronics', 'Stationery', 'Furniture', 'Lab Equipment', 'Sports', 'Other']
+DEPARTMENTS = ['Computer Science', 'Electrical Engineering', 'Mechanical Engineering', 'Biology', 'Physics']
+
+class QueryCounter:
+    """Count the SQL statements executed on the app's engine while active."""
+
+    def __init__(self):
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(db.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, 'before_cursor_execute', self._on_execute)
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of a list of numbers."""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+def time_calls(fn, iterations):
+    """Call fn repeatedly and return the latency of each call in milliseconds."""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def report(label, samples, queries=None):
+    """Print a one-line latency summary."""
+    line = f'{label:<28} p50={percentile(samples, 50):8.2f}ms  p99={percentile(samples, 99):8.2f}ms'
+    if queries is not None:
+        line += f'  queries={queries}'
+    print(line)
+
+def reset_database():
+    """Drop and recreate every table in the benchmark database."""
+    url = db.engine.url.render_as_string(hide_password=False)
+    if url != make_url(BENCH_DATABASE_URL).render_as_string(hide_password=False):
+        raise RuntimeError(f'Refusing to drop the tables of {db.engine.url}: '
+                           f'it is not the benchmark database {make_url(BENCH_DATABASE_URL)}')
+    db.drop_all()
+    db.create_all()
+
+def seed_inventory(products=1000, students=500, assignments=0, batch_size=10000):
+    """Bulk-insert synthetic products, students and open assignments."""
+    today = datetime.utcnow().date()
+    for start in range(0, products, batch_size):
+        db.session.execute(db.insert(Product), [
+            {
+                'name': f'Product {i}',
+                'description': f'Synthetic product {i}',
+                'quantity': random.randint(0, 50),
+                'min_stock_level': random.randint(1, 10),
+                'category': CATEGORIES[i % len(CATEGORIES)],
+                'date_of_issue': today,
+                'is_assigned': False
+            }
+            for i in range(start, min(start + batch_size, products))
+        ])
+    for start in range(0, students, batch_size):
+        db.session.execute(db.insert(Student), [
+            {
+                'full_name': f'Student {i}',
+                'roll_number': f'R{i:08d}',
+                'email': f'student{i}@example.edu',
+                'department': DEPARTMENTS[i % len(DEPARTMENTS)]
+            }
+            for i in range(start, min(start + batch_size, students))
+        ])
+    now = datetime.utcnow()
+    for start in range(0, assignments, batch_size):
+        db.session.execute(db.insert(ProductAssignment), [
+            {
+                'product_id': random.randint(1, products),
+                'student_id': random.randint(1, students),
+                'assigned_date': now - timedelta(days=random.randint(0, 90)),
+                'status': 'assigned' if i % 10 == 0 else 'returned'
+            }
+            for i in range(start, min(start + batch_size, assignments))
+        ])
+    db.session.commit()
@@ -0,0 +1,64 @@
+"""
+Benchmark the dashboard statistics: the original per-counter queries versus
+get_dashboard_stats().
+
+Usage: python bench_dashboard.py [--products N] [--students N] [--iterations N]
+"""
+
+import argparse
+
+from bench_common import (app, db, Product, Student, ProductAssignment, QueryCounter,
+                          report, reset_database, seed_inventory, time_calls)
+from app import get_dashboard_stats
+
+def legacy_dashboard_stats():
+    """The dashboard queries as the index view used to issue them."""
+    total_products = Product.query.count()
+    total_students = Student.query.count()
+    total_quantity = db.session.query(db.func.sum(Product.quantity)).scalar() or 0
+    active_assignments = ProductAssignment.query.filter_by(status='assigned').count()
+    low_stock_count = Product.query.filter(Product.quantity <= Product.min_stock_level).count()
+    recent_assignments = ProductAssignment.query.order_by(
+        ProductAssignment.assigned_date.desc()
+    ).limit(5).all()
+    low_stock_products = Product.query.filter(
+        Product.quantity <= Product.min_stock_level
+    ).limit(5).all()
+    products_by_category = db.session.query(
+        Product.category,
+        db.func.count(Product.id).label('count')
+    ).group_by(Product.category).all()
+    # The template touches both sides of every recent assignment
+    for assignment in recent_assignments:
+        assignment.product.name, assignment.student.full_name
+    return (total_products, total_students, total_quantity, active_assignments,
+            low_stock_count, low_stock_products, products_by_category)
+
+def current_dashboard_stats():
+    stats = get_dashboard_stats()
+    for assignment in stats.recent_assignments:
+        assignment.product.name, assignment.student.full_name
+    return stats
+
+def run(products, students, iterations):
+    with app.app_context():
+        print(f'Seeding {products} products / {students} students...')
+        reset_database()
+        seed_inventory(products=products, students=students, assignments=students)
+
+        for label, fn in [('legacy (per-counter)', legacy_dashboard_stats),
+                          ('get_dashboard_stats', current_dashboard_stats)]:
+            fn()  # warm-up (builds the inventory counters on first use)
+            with QueryCounter() as counter:
+                fn()
+            db.session.remove()
+            samples = time_calls(fn, iterations)
+            report(label, samples, counter.count)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+    run(args.products, args.students, args.iterations)
@@ -0,0 +1,110 @@
+"""
+Concurrent read/write throughput with the default and the tuned SQLite engine.
+
+Separate processes stand in for gunicorn workers: readers look up a
+product and a page of a category, writers take a unit of stock and log the
+activity in one transaction. Each profile runs the same mix for a fixed
+time:
+
+  default  -- rollback journal, synchronous=FULL, no engine options
+  tuned    -- the Config engine profile (WAL, synchronous=NORMAL,
+              busy_timeout, cache/mmap sizes, pooled connections)
+
+Usage: python bench_engine.py [--products N] [--readers N] [--writers N] [--seconds S]
+"""
+
+import argparse
+import multiprocessing
+import random
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from bench_common import BENCH_DB, CATEGORIES, app, db, percentile, reset_database, seed_inventory
+from config import Config
+from engine_profile import apply_sqlite_pragmas
+
+URL = f'sqlite:///{BENCH_DB}'
+
+PROFILES = {
+    'default': ({}, {'journal_mode': 'DELETE', 'synchronous': 'FULL'}),
+    'tuned': (Config.engine_options(URL), Config.SQLITE_PRAGMAS),
+}
+
+def read(connection, products):
+    connection.execute(text('SELECT * FROM products WHERE id = :id'), {'id': random.randint(1, products)}).all()
+    connection.execute(text(
+        'SELECT id, name, quantity FROM products WHERE category = :category ORDER BY id LIMIT 20'
+    ), {'category': random.choice(CATEGORIES)}).all()
+
+def write(connection, products):
+    with connection.begin():
+        connection.execute(text(
+            'UPDATE products SET quantity = quantity - 1 WHERE id = :id AND quantity > 0'
+        ), {'id': random.randint(1, products)})
+        connection.execute(text(
+            "INSERT INTO activity_logs (user_id, action, details, timestamp) "
+            "VALUES (1, 'bench_write', 'took one unit', CURRENT_TIMESTAMP)"
+        ))
+
+def worker(profile, role, products, seconds, results):
+    options, pragmas = PROFILES[profile]
+    engine = create_engine(URL, **options)
+    apply_sqlite_pragmas(engine, pragmas)
+    operation = write if role == 'write' else read
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            with engine.connect() as connection:
+                operation(connection, products)
+                connection.commit()
+        except OperationalError:
+            errors += 1  # "database is locked"
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+    engine.dispose()
+    results.put((role, latencies, errors))
+
+def run(profile, args):
+    results = multiprocessing.Queue()
+    roles = ['read'] * args.readers + ['write'] * args.writers
+    processes = [multiprocessing.Process(target=worker, args=(profile, role, args.products, args.seconds, results))
+                 for role in roles]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    for role in ('read', 'write'):
+        latencies = [ms for r, samples, _ in collected if r == role for ms in samples]
+        errors = sum(e for r, _, e in collected if r == role)
+        if latencies:
+            print(f'{profile:<8} {role:<6} {len(latencies) / args.seconds:9.1f} ops/s  '
+                  f'p50={percentile(latencies, 50):8.2f}ms  p99={percentile(latencies, 99):8.2f}ms  '
+                  f'locked={errors}')
+        else:
+            print(f'{profile:<8} {role:<6}       0.0 ops/s  locked={errors}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    with app.app_context():
+        print(f'Seeding {args.products} products...')
+        reset_database()
+        seed_inventory(products=args.products, students=1000)
+        db.session.remove()
+        db.engine.dispose()
+
+    for profile in PROFILES:
+        run(profile, args)
+
+if __name__ == '__main__':
+    main()
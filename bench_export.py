@@ -0,0 +1,84 @@
+"""
+Benchmark the CSV exports: the original build-then-send implementation
+versus the streaming one.
+
+Each variant runs in a fresh subprocess so peak RSS is measured in
+isolation. Time to first byte is the time until the first chunk of the
+response body is available.
+
+Usage: python bench_export.py [--rows N]
+"""
+
+import argparse
+import io
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from bench_common import app, db, Product, reset_database, seed_inventory
+
+def legacy_export_products():
+    """export_products as it was before streaming"""
+    from flask import make_response
+
+    products = Product.query.all()
+    output = io.StringIO()
+    output.write('ID,Name,Category,Quantity,Min Stock Level,Description,Date of Issue,Status\n')
+    for product in products:
+        status = 'Low Stock' if product.is_low_stock else 'In Stock'
+        output.write(f'{product.id},{product.name},{product.category},{product.quantity},'
+                    f'{product.min_stock_level},"{product.description or ""}",{product.date_of_issue},{status}\n')
+    response = make_response(output.getvalue())
+    response.headers['Content-Disposition'] = 'attachment; filename=products_export.csv'
+    response.headers['Content-Type'] = 'text/csv'
+    return response
+
+app.add_url_rule('/bench/legacy_export_products', view_func=legacy_export_products)
+
+def measure(url):
+    """Download url once and return timings and peak RSS of this process"""
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+            sess['username'] = 'admin'
+            sess['is_admin'] = True
+
+        start = time.perf_counter()
+        response = client.get(url, buffered=False)
+        chunks = response.iter_encoded()
+        first = next(chunks)
+        ttfb = time.perf_counter() - start
+        size = len(first) + sum(len(chunk) for chunk in chunks)
+        total = time.perf_counter() - start
+        response.close()
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {'ttfb_ms': ttfb * 1000, 'total_s': total, 'bytes': size, 'peak_rss_mb': peak_kb / 1024}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure)))
+        return
+
+    with app.app_context():
+        print(f'Seeding {args.rows} products...')
+        reset_database()
+        seed_inventory(products=args.rows, students=0)
+
+    for label, url in [('legacy (StringIO)', '/bench/legacy_export_products'),
+                       ('streaming', '/export/products')]:
+        output = subprocess.run([sys.executable, __file__, '--measure', url],
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f'{label:<20} ttfb={result["ttfb_ms"]:9.1f}ms  total={result["total_s"]:6.2f}s  '
+              f'peak_rss={result["peak_rss_mb"]:7.1f}MB  size={result["bytes"] / 1e6:.1f}MB')
+
+if __name__ == '__main__':
+    main()
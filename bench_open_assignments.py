@@ -0,0 +1,96 @@
+"""
+Benchmark the open-assignment lookups against a large assignment history:
+the partial open-assignment indexes versus the original unindexed queries.
+
+The history is mostly returned assignments, plus one open assignment for
+every student. Each lookup is timed with the partial indexes in place,
+then the indexes are dropped and the original form of the query (a bound
+status parameter) is timed again.
+
+Usage: python bench_open_assignments.py [--history N] [--students N] [--iterations N]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from bench_common import (app, db, Product, ProductAssignment, Student, report, reset_database,
+                          seed_inventory, time_calls)
+
+PARTIAL_INDEXES = ['ix_product_assignments_open_student', 'ix_product_assignments_open_product',
+                   'ix_product_assignments_open_assigned_date']
+
+def seed_history(history, students, products, batch_size=50000):
+    """Insert `history` returned assignments and one open one per student."""
+    now = datetime.utcnow()
+    insert = ('INSERT INTO product_assignments (product_id, student_id, assigned_date, returned_date, status) '
+              'VALUES (?, ?, ?, ?, ?)')
+    with db.engine.begin() as connection:
+        for start in range(0, history, batch_size):
+            rows = []
+            for _ in range(start, min(start + batch_size, history)):
+                assigned = now - timedelta(days=random.randint(30, 3650))
+                rows.append((random.randint(1, products), random.randint(1, students),
+                             assigned.isoformat(' '), (assigned + timedelta(days=30)).isoformat(' '), 'returned'))
+            connection.exec_driver_sql(insert, rows)
+        connection.exec_driver_sql(insert, [
+            (random.randint(1, products), student_id,
+             (now - timedelta(days=random.randint(0, 90))).isoformat(' '), None, 'assigned')
+            for student_id in range(1, students + 1)
+        ])
+        connection.exec_driver_sql('ANALYZE')
+
+def lookups(students, products, open_form):
+    """name -> zero-argument callable running one lookup"""
+    status = ProductAssignment.is_open if open_form else ProductAssignment.status == 'assigned'
+    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    return {
+        'current_assignment': lambda: ProductAssignment.query.filter(
+            ProductAssignment.student_id == random.randint(1, students), status
+        ).first(),
+        'return_lookup': lambda: ProductAssignment.query.filter(
+            ProductAssignment.student_id == random.randint(1, students),
+            ProductAssignment.product_id == random.randint(1, products), status
+        ).order_by(ProductAssignment.assigned_date.desc()).first(),
+        'delete_product_check': lambda: ProductAssignment.query.filter(
+            ProductAssignment.product_id == random.randint(1, products), status
+        ).count(),
+        'overdue_count': lambda: ProductAssignment.query.filter(
+            status, ProductAssignment.assigned_date < thirty_days_ago
+        ).count(),
+    }
+
+def run(label, students, products, open_form, iterations):
+    print(f'-- {label}')
+    for name, fn in lookups(students, products, open_form).items():
+        fn()
+        report(name, time_calls(fn, iterations))
+        db.session.rollback()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--history', type=int, default=10000000)
+    parser.add_argument('--students', type=int, default=20000)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    with app.app_context():
+        print(f'Seeding {args.history} historical and {args.students} open assignments...')
+        start = time.perf_counter()
+        reset_database()
+        seed_inventory(products=args.products, students=args.students)
+        seed_history(args.history, args.students, args.products)
+        print(f'Seeded in {time.perf_counter() - start:.1f}s')
+
+        run('partial open-assignment indexes', args.students, args.products, True, args.iterations)
+
+        with db.engine.begin() as connection:
+            for name in PARTIAL_INDEXES:
+                connection.exec_driver_sql(f'DROP INDEX {name}')
+        run('original queries, no open-assignment index', args.students, args.products, False,
+            max(1, args.iterations // 10))
+
+if __name__ == '__main__':
+    main()
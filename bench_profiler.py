@@ -0,0 +1,82 @@
+"""
+Measure what the request profiler costs when it is off and when it is on.
+
+The same cheap JSON request (/api/search on a small inventory) is timed
+with the profiler hooks removed from the app, installed but disabled (the
+production default), and profiling every request. The disabled overhead is
+what every request pays and should be within noise of the baseline; since
+that noise is larger than the hooks themselves, the three disabled hooks
+are also timed on their own inside one request context.
+
+Usage: python bench_profiler.py [--iterations N] [--products N]
+"""
+
+import argparse
+import time
+
+from bench_common import app, percentile, report, reset_database, seed_inventory, time_calls
+from app import profiler
+
+HOOKS = [
+    (app.before_request_funcs, profiler._before_request),
+    (app.after_request_funcs, profiler._after_request),
+    (app.teardown_request_funcs, profiler._teardown_request),
+]
+
+def set_hooks(installed):
+    for registry, hook in HOOKS:
+        funcs = registry.setdefault(None, [])
+        if installed and hook not in funcs:
+            funcs.append(hook)
+        elif not installed and hook in funcs:
+            funcs.remove(hook)
+
+def disabled_hook_cost(iterations=100000):
+    """Microseconds the disabled before/after/teardown hooks add per request."""
+    with app.test_request_context('/api/search?q=item'):
+        response = app.response_class()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            profiler._before_request()
+            profiler._after_request(response)
+            profiler._teardown_request(None)
+        return (time.perf_counter() - start) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--products', type=int, default=200)
+    args = parser.parse_args()
+
+    with app.app_context():
+        print(f'Seeding {args.products} products...')
+        reset_database()
+        seed_inventory(products=args.products, students=10)
+
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+            sess['username'] = 'admin'
+            sess['is_admin'] = True
+        request = lambda: client.get('/api/search?q=item&type=products')
+        time_calls(request, 200)
+
+        results = {}
+        for label, installed, rate in [('hooks removed', False, 0), ('profiler disabled', True, 0),
+                                       ('hooks removed (again)', False, 0), ('profiling every request', True, 1)]:
+            set_hooks(installed)
+            profiler.configure(sample_rate=rate)
+            samples = time_calls(request, args.iterations)
+            results[label] = samples
+            report(label, samples)
+        set_hooks(True)
+        profiler.configure(sample_rate=0)
+
+    baseline = (percentile(results['hooks removed'], 50) + percentile(results['hooks removed (again)'], 50)) / 2
+    disabled = percentile(results['profiler disabled'], 50)
+    print(f'Disabled, end to end: {(disabled - baseline) * 1000:+.1f}us per request '
+          f'({(disabled / baseline - 1) * 100:+.2f}% of p50, noise included)')
+    print(f'Disabled hooks alone: {disabled_hook_cost():.2f}us per request')
+
+if __name__ == '__main__':
+    main()
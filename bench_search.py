@@ -0,0 +1,59 @@
+"""
+Benchmark /api/search style lookups against a large product table.
+
+Products get random two-word names so terms have realistic selectivity;
+the queries range from a rare number to a one-letter prefix that
+matches a large share of the table.
+
+Usage: python bench_search.py [--rows N] [--iterations N]
+"""
+
+import argparse
+import random
+import time
+
+from bench_common import app, db, CATEGORIES, Product, report, reset_database, time_calls
+import search
+
+ADJECTIVES = ['red', 'blue', 'compact', 'digital', 'heavy', 'portable', 'wireless', 'steel', 'wooden',
+              'foldable', 'precision', 'student', 'advanced', 'basic', 'deluxe', 'mini']
+NOUNS = ['microscope', 'calculator', 'projector', 'beaker', 'stool', 'racket', 'laptop', 'ruler',
+         'compass', 'tripod', 'burette', 'football', 'whiteboard', 'oscilloscope', 'multimeter', 'desk']
+
+def seed_products(rows, batch_size=50000):
+    for start in range(0, rows, batch_size):
+        db.session.execute(db.insert(Product), [
+            {
+                'name': f'{random.choice(ADJECTIVES)} {random.choice(NOUNS)} {i}',
+                'description': f'{random.choice(ADJECTIVES)} {random.choice(NOUNS)} for the lab',
+                'quantity': random.randint(0, 50),
+                'min_stock_level': 5,
+                'category': random.choice(CATEGORIES)
+            }
+            for i in range(start, min(start + batch_size, rows))
+        ])
+    db.session.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    with app.app_context():
+        print(f'Seeding {args.rows} products (indexed by the triggers as they are inserted)...')
+        start = time.perf_counter()
+        reset_database()
+        seed_products(args.rows)
+        print(f'Seeded in {time.perf_counter() - start:.1f}s')
+
+        connection = db.session.connection()
+        sample = random.randint(0, args.rows - 1)
+        for query in [str(sample), 'oscillo', 'wireless oscillo', 'portable microscope 12', 'desk', 'm']:
+            ids = search.match_ids(connection, 'products', query, limit=10)
+            samples = time_calls(lambda: search.match_ids(connection, 'products', query, limit=10),
+                                 args.iterations)
+            report(f'{query!r} ({len(ids)} hits)', samples)
+
+if __name__ == '__main__':
+    main()
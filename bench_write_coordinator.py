@@ -0,0 +1,74 @@
+"""
+Benchmark assign/return under many concurrent clients, with and without
+the single-writer coordinator.
+
+Each client thread has its own test client and student and alternates
+POST /assign_product and POST /return_product for a fixed time. Requests
+that fail (500, e.g. "database is locked") are counted, not retried.
+
+Usage: python bench_write_coordinator.py [--clients N] [--seconds S] [--products N]
+"""
+
+import argparse
+import random
+import threading
+import time
+
+from bench_common import app, db, percentile, reset_database, seed_inventory, Student
+from app import write_coordinator
+
+def client_loop(student_id, products, deadline, latencies, failures):
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+            sess['username'] = 'admin'
+            sess['is_admin'] = True
+        while time.perf_counter() < deadline:
+            for url, payload in [(f'/assign_product/{student_id}', {'product_id': random.randint(1, products)}),
+                                 (f'/return_product/{student_id}', {})]:
+                start = time.perf_counter()
+                response = client.post(url, json=payload)
+                if response.status_code == 500:
+                    failures.append(url)
+                else:
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+def run(label, clients, seconds, products, student_ids):
+    latencies, failures = [], []
+    operations, transactions = write_coordinator.operations, write_coordinator.transactions
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=client_loop, args=(student_ids[i], products, deadline, latencies, failures))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    line = (f'{label:<18} {len(latencies) / seconds:8.1f} req/s  p50={percentile(latencies, 50):8.2f}ms  '
+            f'p99={percentile(latencies, 99):8.2f}ms  failed={len(failures)}')
+    if write_coordinator.transactions > transactions:
+        grouped = (write_coordinator.operations - operations) / (write_coordinator.transactions - transactions)
+        line += f'  writes/commit={grouped:.1f}'
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--products', type=int, default=1000)
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        print(f'Seeding {args.products} products / {args.clients} students...')
+        reset_database()
+        seed_inventory(products=args.products, students=args.clients)
+        db.session.execute(db.update(db.metadata.tables['products']).values(quantity=1000000, min_stock_level=1))
+        db.session.commit()
+        student_ids = [student.id for student in Student.query.order_by(Student.id)]
+
+    for label, enabled in [('direct commits', False), ('write coordinator', True)]:
+        app.config['WRITE_COORDINATOR_ENABLED'] = enabled
+        run(label, args.clients, args.seconds, args.products, student_ids)
+
+if __name__ == '__main__':
+    main()
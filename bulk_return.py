@@ -0,0 +1,43 @@
+"""
+Process end-of-term returns from a barcode scan file
+Usage: python bulk_return.py scans.txt
+
+The file holds one roll number per line (or a CSV whose first column is the
+roll number). Every listed student's current product is returned in a
+single transaction.
+"""
+
+import argparse
+import time
+from collections import Counter
+
+from app import app, db, bulk_return_products, read_roll_numbers, log_activity, audit_writer
+
+def main():
+    parser = argparse.ArgumentParser(description='Process returns from a barcode scan file')
+    parser.add_argument('path')
+    args = parser.parse_args()
+    
+    with app.app_context():
+        db.create_all()
+        with open(args.path, 'rb') as stream:
+            roll_numbers = read_roll_numbers(stream)
+        
+        start = time.perf_counter()
+        results, returned = bulk_return_products(roll_numbers=roll_numbers)
+        db.session.commit()
+        elapsed = time.perf_counter() - start
+        
+        log_activity(None, 'bulk_return_product', f'Processed {returned} returns from {args.path} (CLI)')
+        audit_writer.flush()
+    
+    statuses = Counter(result['status'] for result in results)
+    print(f"[OK] {returned} products returned in {elapsed:.2f}s")
+    for status in ('nothing_assigned', 'not_found'):
+        if statuses[status]:
+            print(f"[WARN] {statuses[status]} roll numbers {status.replace('_', ' ')}:")
+            for result in [r for r in results if r['status'] == status][:20]:
+                print(f"  - {result['roll_number']}")
+
+if __name__ == '__main__':
+    main()
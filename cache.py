@@ -0,0 +1,230 @@
+"""
+Cross-request cache for the read-heavy views
+
+The dashboard, reports, notifications and analytics views compute the same
+aggregates for every user on every request, while the inventory only
+changes on a handful of write routes. ViewCache keeps each view's result
+under the view's name plus its arguments, and the write routes call
+invalidate() with the views they affect once their transaction commits.
+
+Invalidation does not look for keys to delete: every view has a generation
+number that is part of its keys, and invalidate() bumps it, so the old
+entries are never read again and age out by LRU eviction or TTL. That costs
+one operation however many argument combinations are cached, works the same
+on every backend, and a result computed while a write was committing is
+stored under the generation it started with, where nobody will read it.
+
+Backends:
+  MemoryCache  -- in-process LRU with a TTL per entry (the default). Each
+                  worker process has its own copy, so with several workers
+                  an invalidation only reaches the one that handled the
+                  write; the others catch up when their entries expire.
+  RedisCache   -- shared by every process; needs the ``redis`` package and
+                  a server, e.g. a local one at redis://localhost:6379/0.
+                  Values are pickled, so they must be plain data rather than
+                  ORM instances bound to a session.
+  NullCache    -- caches nothing (CACHE_BACKEND=none).
+
+Hit and miss counters are kept per view in the process that serves them.
+"""
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+MISSING = object()
+
+class MemoryCache:
+    """Thread-safe LRU of at most ``max_entries`` values with per-entry TTLs."""
+
+    name = 'memory'
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # Generations live outside the LRU: an evicted counter would restart
+    # at zero and bring old entries back to life
+    def generation(self, view):
+        return self._generations.get(view, 0)
+
+    def bump(self, view):
+        with self._lock:
+            self._generations[view] = self._generations.get(view, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class RedisCache:
+    """Values pickled into Redis under ``prefix``, expiring after their TTL."""
+
+    name = 'redis'
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='inventory:cache:', client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError('CACHE_BACKEND=redis needs the redis package (pip install redis)')
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + 'v:*'))
+
+    def get(self, key):
+        data = self.client.get(self.prefix + 'v:' + key)
+        return MISSING if data is None else pickle.loads(data)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + 'v:' + key, pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def generation(self, view):
+        return int(self.client.get(self.prefix + 'g:' + view) or 0)
+
+    def bump(self, view):
+        self.client.incr(self.prefix + 'g:' + view)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + 'v:*'))
+        if keys:
+            self.client.delete(*keys)
+
+class NullCache:
+    """Stores nothing; every lookup is a miss."""
+
+    name = 'none'
+
+    def __len__(self):
+        return 0
+
+    def get(self, key):
+        return MISSING
+
+    def set(self, key, value, ttl):
+        pass
+
+    def generation(self, view):
+        return 0
+
+    def bump(self, view):
+        pass
+
+    def clear(self):
+        pass
+
+def create_backend(name='memory', max_entries=1024, redis_url=None):
+    """Backend for a CACHE_BACKEND setting: memory, redis or none."""
+    if name == 'memory':
+        return MemoryCache(max_entries)
+    if name == 'redis':
+        return RedisCache(redis_url or 'redis://localhost:6379/0')
+    if name == 'none':
+        return NullCache()
+    raise ValueError(f'Unknown cache backend: {name!r}')
+
+class ViewCache:
+    """Per-view result cache with generation-based invalidation.
+
+    ``scope`` is an optional callable whose result becomes part of every
+    key, for results that depend on where they were read (e.g. a replica or
+    the primary); when it returns None the lookup bypasses the cache.
+    """
+
+    def __init__(self, backend=None, default_ttl=60, scope=None):
+        self.backend = backend if backend is not None else MemoryCache()
+        self.default_ttl = default_ttl
+        self.scope = scope
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def _count(self, view, outcome):
+        with self._lock:
+            counts = self._counts.setdefault(view, {'hits': 0, 'misses': 0, 'invalidations': 0})
+            counts[outcome] += 1
+
+    def get_or_compute(self, view, compute, *args, ttl=None):
+        """Cached ``compute(*args)`` for ``view``; the arguments are part of
+        the key, so they must have a stable repr()."""
+        scope = self.scope() if self.scope is not None else ''
+        if scope is None:
+            self._count(view, 'misses')
+            return compute(*args)
+        key = f'{view}:{self.backend.generation(view)}:{scope}:{args!r}'
+        value = self.backend.get(key)
+        if value is not MISSING:
+            self._count(view, 'hits')
+            return value
+        self._count(view, 'misses')
+        value = compute(*args)
+        self.backend.set(key, value, self.default_ttl if ttl is None else ttl)
+        return value
+
+    def cached(self, view, ttl=None):
+        """Decorator form of get_or_compute(); the undecorated function stays
+        available as ``fn.uncached``."""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args):
+                return self.get_or_compute(view, fn, *args, ttl=ttl)
+            wrapper.uncached = fn
+            return wrapper
+        return decorator
+
+    def invalidate(self, *views):
+        """Make the cached results of ``views`` unreachable."""
+        for view in views:
+            self.backend.bump(view)
+            self._count(view, 'invalidations')
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        self.backend.clear()
+        with self._lock:
+            self._counts.clear()
+
+    def stats(self):
+        """Hit/miss/invalidation counts per view and in total."""
+        with self._lock:
+            views = {view: dict(counts) for view, counts in self._counts.items()}
+        hits = sum(counts['hits'] for counts in views.values())
+        misses = sum(counts['misses'] for counts in views.values())
+        for counts in views.values():
+            lookups = counts['hits'] + counts['misses']
+            counts['hit_rate'] = round(counts['hits'] / lookups, 4) if lookups else None
+        return {
+            'backend': self.backend.name,
+            'entries': len(self.backend),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+            'views': views,
+        }
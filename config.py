@@ -2,6 +2,8 @@ import os
 from datetime import timedelta
 from dotenv import load_dotenv
 
+import engine_profile
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -14,6 +16,36 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///inventory.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Optional read replica for reports and exports (see replica.py)
+    DATABASE_READ_URL = os.environ.get('DATABASE_READ_URL')
+    REPLICA_RETRY_INTERVAL = int(os.environ.get('REPLICA_RETRY_INTERVAL') or 30)
+    # After a write, the user's reads stay on the primary this long
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS') or 5)
+    
+    # Database engine (see engine_profile.py): pragmas applied to every
+    # SQLite connection and the connection pool size
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL',
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000),
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE') or -64000),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 * 1024),
+        # Opt-in until an existing database passes PRAGMA foreign_key_check:
+        # rows written before enforcement (e.g. activity logs for users that
+        # no longer exist) would make unrelated writes fail
+        'foreign_keys': os.environ.get('SQLITE_FOREIGN_KEYS') or 'OFF',
+    }
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 20)
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT') or 30)
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE') or 1800)
+    
+    # Single writer thread with group commit (see write_coordinator.py)
+    WRITE_COORDINATOR_ENABLED = os.environ.get('WRITE_COORDINATOR_ENABLED') == '1'
+    WRITE_BATCH_SIZE = int(os.environ.get('WRITE_BATCH_SIZE') or 50)
+    WRITE_BATCH_DELAY = float(os.environ.get('WRITE_BATCH_DELAY') or 0.002)
+    WRITE_TIMEOUT = float(os.environ.get('WRITE_TIMEOUT') or 30)
+    
     # Session
     PERMANENT_SESSION_LIFETIME = timedelta(minutes=30)
     SESSION_COOKIE_SECURE = os.environ.get('FLASK_ENV') == 'production'
@@ -25,11 +57,22 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max upload size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx'}
     
+    # Bulk imports
+    IMPORT_EXTENSIONS = {'csv', 'json'}
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE') or 1000)
+    IMPORT_MAX_REPORTED_ERRORS = 1000
+    
     # Logging
     LOG_TO_STDOUT = os.environ.get('LOG_TO_STDOUT')
     LOG_FILE = 'logs/inventory.log'
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     
+    # Activity log buffering (see audit.py)
+    AUDIT_BUFFER_ENABLED = os.environ.get('AUDIT_BUFFER_ENABLED', '1') == '1'
+    AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE') or 100)
+    AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL') or 1.0)
+    AUDIT_FALLBACK_FILE = os.environ.get('AUDIT_FALLBACK_FILE') or 'logs/audit_fallback.jsonl'
+    
     # Email (configure these in production)
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
     MAIL_PORT = int(os.environ.get('MAIL_PORT') or 25)
@@ -38,8 +81,55 @@ class Config:
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER')
     
+    # Stock history (daily buckets are always kept; hourly ones are optional)
+    STOCK_SNAPSHOT_HOURLY = os.environ.get('STOCK_SNAPSHOT_HOURLY', '1') == '1'
+    MAX_ANALYTICS_POINTS = 5000
+    
+    # History archiving (see archive_history.py)
+    ARCHIVE_ASSIGNMENTS_AFTER_DAYS = int(os.environ.get('ARCHIVE_ASSIGNMENTS_AFTER_DAYS') or 365)
+    ARCHIVE_ACTIVITY_LOGS_AFTER_DAYS = int(os.environ.get('ARCHIVE_ACTIVITY_LOGS_AFTER_DAYS') or 180)
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE') or 1000)
+    
+    # View cache for the dashboard, reports, notifications and analytics
+    # (see cache.py): memory, redis or none
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'memory'
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL') or 'redis://localhost:6379/0'
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL') or 60)
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES') or 1024)
+    
+    # Seconds between checks whether another process changed the data of
+    # the autocomplete indexes (see prefix_index.py); 0 checks every lookup
+    AUTOCOMPLETE_CHECK_INTERVAL = float(os.environ.get('AUTOCOMPLETE_CHECK_INTERVAL') or 1)
+    
+    # Request/SQL metrics on /metrics (see metrics.py). Admins can always
+    # read them; scrapers send METRICS_TOKEN as a bearer token
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS') or 250)
+    
+    # Request profiling (see profiler.py): the fraction of requests to
+    # profile, optionally only for some endpoints (comma separated); admins
+    # can also profile a single request with the X-Profile: 1 header
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE') or 0)
+    PROFILE_ENDPOINTS = [name for name in (os.environ.get('PROFILE_ENDPOINTS') or '').split(',') if name]
+    PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS') or 5)
+    PROFILE_MAX_STORED = int(os.environ.get('PROFILE_MAX_STORED') or 50)
+    
     # Pagination
-    ITEMS_PER_PAGE = 20
+    ITEMS_PER_PAGE = int(os.environ.get('ITEMS_PER_PAGE') or 20)
+    MAX_ITEMS_PER_PAGE = 100
+    
+    @classmethod
+    def engine_options(cls, url=None):
+        """SQLALCHEMY_ENGINE_OPTIONS for ``url`` (default: this config's database)"""
+        return engine_profile.engine_options(
+            url or cls.SQLALCHEMY_DATABASE_URI,
+            pool_size=cls.DB_POOL_SIZE,
+            max_overflow=cls.DB_MAX_OVERFLOW,
+            pool_timeout=cls.DB_POOL_TIMEOUT,
+            pool_recycle=cls.DB_POOL_RECYCLE,
+            busy_timeout=cls.SQLITE_PRAGMAS.get('busy_timeout', 5000)
+        )
     
     @staticmethod
     def init_app(app):
@@ -60,6 +150,7 @@ class TestingConfig(Config):
 class ProductionConfig(Config):
     DEBUG = False
     SESSION_COOKIE_SECURE = True
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 20)
     
     @classmethod
     def init_app(cls, app):
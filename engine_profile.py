@@ -0,0 +1,83 @@
+"""
+Engine settings for the application database
+
+Out of the box SQLite suits a single process: every connection uses a
+rollback journal, so one writer blocks every reader, and a connection that
+finds the database locked gives up with "database is locked". The connect
+hook installed by apply_sqlite_pragmas() sets, on every new connection:
+
+  journal_mode=WAL      readers keep going while one connection writes
+  synchronous=NORMAL    fsync at checkpoints rather than on every commit;
+                        with WAL a power cut can lose the last commits but
+                        cannot corrupt the file
+  busy_timeout          wait this many milliseconds for a lock before
+                        failing
+  cache_size, mmap_size a bigger page cache and memory-mapped reads
+  foreign_keys=ON       enforce the foreign keys the models declare
+
+engine_options() sizes the connection pool for the dialect: SQLite files
+keep a pool of open connections (opening one and applying the pragmas on
+every checkout is not free), in-memory SQLite keeps the single connection
+Flask-SQLAlchemy gives it, and server databases get a pool whose
+connections are pinged before use and recycled before the server's idle
+timeout drops them.
+"""
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,  # KiB (negative) rather than pages
+    'mmap_size': 256 * 1024 * 1024,
+    'foreign_keys': 'ON',
+}
+
+def is_memory_sqlite(url):
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+def engine_options(url, pool_size=10, max_overflow=20, pool_timeout=30, pool_recycle=1800, busy_timeout=5000):
+    """SQLALCHEMY_ENGINE_OPTIONS for the database at ``url``."""
+    backend = make_url(url).get_backend_name()
+    if backend == 'sqlite':
+        if is_memory_sqlite(url):
+            return {}
+        return {
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            'pool_timeout': pool_timeout,
+            # pysqlite's own lock wait, in seconds; covers the connect itself
+            'connect_args': {'timeout': busy_timeout / 1000},
+        }
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        'pool_recycle': pool_recycle,
+        'pool_pre_ping': True,
+    }
+
+def apply_sqlite_pragmas(engine, pragmas=None):
+    """Run ``PRAGMA name = value`` for each pragma on every new connection
+    of a SQLite ``engine``; other dialects are left alone. Returns whether
+    the hook was installed."""
+    if engine.dialect.name != 'sqlite':
+        return False
+    pragmas = dict(DEFAULT_SQLITE_PRAGMAS if pragmas is None else pragmas)
+    if is_memory_sqlite(engine.url):
+        pragmas.pop('journal_mode', None)
+        pragmas.pop('mmap_size', None)
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+        finally:
+            cursor.close()
+
+    return True
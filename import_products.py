@@ -0,0 +1,40 @@
+"""
+Bulk import products from a CSV or JSON file
+Usage: python import_products.py products.csv [--batch-size N]
+
+CSV files need a header row with name, category, quantity, min_stock_level
+and (optionally) description; a file produced by /export/products works as
+is. JSON files contain a list of objects with the same keys.
+"""
+
+import argparse
+import time
+
+from app import app, db, import_products, read_import_file, log_activity, audit_writer
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import products from a CSV or JSON file')
+    parser.add_argument('path')
+    parser.add_argument('--batch-size', type=int, default=None)
+    args = parser.parse_args()
+    
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        with open(args.path, 'rb') as stream:
+            report = import_products(read_import_file(stream, args.path), batch_size=args.batch_size)
+        elapsed = time.perf_counter() - start
+        
+        log_activity(None, 'import_products', f'Imported {report["imported"]} products from {args.path} (CLI)')
+        audit_writer.flush()
+    
+    print(f"[OK] Imported {report['imported']} products in {elapsed:.2f}s")
+    if report['rejected']:
+        print(f"[WARN] Rejected {report['rejected']} rows:")
+        for error in report['errors'][:50]:
+            print(f"  - row {error['row']}: {'; '.join(error['errors'])}")
+        if report['rejected'] > 50:
+            print(f"  ... and {report['rejected'] - 50} more")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Create or update students from a roster file
+Usage: python import_students.py roster.csv [--batch-size N]
+
+Rows are matched on roll_number: new roll numbers are created, existing
+ones get their name, email, phone and department updated. The CSV header
+needs full_name, roll_number and department (email and phone are
+optional); a file produced by /export/students works as is.
+"""
+
+import argparse
+import time
+
+from app import app, db, import_students, read_import_file, log_activity, audit_writer
+
+def main():
+    parser = argparse.ArgumentParser(description='Create or update students from a roster file')
+    parser.add_argument('path')
+    parser.add_argument('--batch-size', type=int, default=None)
+    args = parser.parse_args()
+    
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        with open(args.path, 'rb') as stream:
+            report = import_students(read_import_file(stream, args.path), batch_size=args.batch_size)
+        elapsed = time.perf_counter() - start
+        
+        log_activity(
+            None,
+            'import_students',
+            f'Imported roster {args.path} (CLI): {report["created"]} created, {report["updated"]} updated'
+        )
+        audit_writer.flush()
+    
+    print(f"[OK] {report['created']} created, {report['updated']} updated in {elapsed:.2f}s")
+    if report['rejected']:
+        print(f"[WARN] Rejected {report['rejected']} rows:")
+        for error in report['errors'][:50]:
+            print(f"  - row {error['row']}: {'; '.join(error['errors'])}")
+        if report['rejected'] > 50:
+            print(f"  ... and {report['rejected'] - 50} more")
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,7 @@ Database initialization script for Store Inventory System
 This script will create all tables and add sample data if needed
 """
 
-from app import app, db, User, Product, Student, ProductAssignment
+from app import app, db, User, Product, Student, ProductAssignment, rebuild_inventory_counters, take_stock_snapshot
 from datetime import datetime, timedelta
 import random
 
@@ -197,6 +197,13 @@ def init_database():
             db.session.commit()
             print(f"[OK] Created {len(students)} sample assignments")
         
+        # Sample data is inserted directly, so bring the counters and the
+        # stock history in line
+        rebuild_inventory_counters()
+        take_stock_snapshot()
+        db.session.commit()
+        print("[OK] Inventory counters rebuilt")
+        
         print("\n" + "="*50)
         print("DATABASE INITIALIZATION COMPLETE!")
         print("="*50)
@@ -0,0 +1,253 @@
+"""
+Request, SQL and connection-pool metrics in Prometheus text format
+
+Instrumentation.init_app() times every request by endpoint, method and
+status; instrument_engine() counts the SQL statements each endpoint runs
+and the time they take (before_cursor_execute/after_cursor_execute), times
+how long a connection checkout waits for the pool, and logs statements
+slower than the slow-query threshold with their parameter shape (never the
+values) and the route that ran them. Statements run outside a request
+(the audit writer, the write coordinator, CLI scripts) are attributed to
+the ``(background)`` endpoint.
+
+Registry.render() produces the text exposition format that Prometheus
+scrapes; app.py serves it on /metrics. Values are per process, as usual
+for Prometheus client libraries; each worker is scraped or aggregated
+separately.
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+BACKGROUND = '(background)'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name, tuple(zip(self.labelnames, labels)), value
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            counts, total = self._values.get(labels) or ([0] * (len(self.buckets) + 1), 0)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[labels] = (counts, total + value)
+
+    def count(self, labels=()):
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def samples(self):
+        with self._lock:
+            values = {labels: (list(counts), total) for labels, (counts, total) in self._values.items()}
+        for labels, (counts, total) in sorted(values.items()):
+            pairs = tuple(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield self.name + '_bucket', pairs + (('le', _number(float(bound))),), cumulative
+            yield self.name + '_sum', pairs, total
+            yield self.name + '_count', pairs, cumulative
+
+class Registry:
+    """Metrics plus collector callbacks, rendered together."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collect):
+        """``collect()`` returns ``(name, kind, help, [(labels dict, value)])``
+        tuples computed at scrape time, e.g. from other components' stats."""
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+        for collect in self._collectors:
+            try:
+                families = list(collect())
+            except Exception:
+                logger.exception('Metrics collector failed')
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_labels(tuple(labels.items()))} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+def parameter_shape(parameters, executemany=False):
+    """Describe bound parameters without their values."""
+    if executemany:
+        rows = len(parameters)
+        return f'{rows} rows of {parameter_shape(parameters[0]) if rows else "nothing"}'
+    if isinstance(parameters, dict):
+        return f'{len(parameters)} named ({", ".join(sorted(parameters))})' if parameters else 'none'
+    return f'{len(parameters)} positional' if parameters else 'none'
+
+def current_endpoint():
+    if has_request_context():
+        return request.endpoint or '(unmatched)'
+    return BACKGROUND
+
+class Instrumentation:
+    """Flask request hooks and SQLAlchemy engine events feeding a Registry."""
+
+    def __init__(self, registry=None, slow_query_threshold=0.25, slow_query_logger=None):
+        self.registry = registry or Registry()
+        self.slow_query_threshold = slow_query_threshold
+        self.slow_query_logger = slow_query_logger or logger
+        self.request_latency = self.registry.histogram(
+            'inventory_request_duration_seconds', 'Request latency by endpoint',
+            ('endpoint', 'method', 'status'))
+        self.request_statements = self.registry.histogram(
+            'inventory_request_sql_statements', 'SQL statements run by one request',
+            ('endpoint',), STATEMENT_BUCKETS)
+        self.sql_statements = self.registry.counter(
+            'inventory_sql_statements_total', 'SQL statements executed', ('endpoint',))
+        self.sql_seconds = self.registry.counter(
+            'inventory_sql_seconds_total', 'Time spent executing SQL statements', ('endpoint',))
+        self.slow_queries = self.registry.counter(
+            'inventory_slow_queries_total', 'Statements slower than the slow-query threshold', ('endpoint',))
+        self.pool_wait = self.registry.histogram(
+            'inventory_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection',
+            ('bind',), POOL_WAIT_BUCKETS)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_statements = 0
+
+    def _after_request(self, response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            endpoint = current_endpoint()
+            self.request_latency.observe(
+                (endpoint, request.method, str(response.status_code)), time.perf_counter() - start)
+            self.request_statements.observe((endpoint,), g.pop('metrics_statements', 0))
+        return response
+
+    def instrument_engine(self, engine, bind='primary'):
+        """Count and time ``engine``'s statements and its pool checkouts."""
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine, 'handle_error', self._handle_error)
+        event.listen(engine, 'engine_disposed', lambda engine: self._time_checkouts(engine, bind))
+        self._time_checkouts(engine, bind)
+        self.registry.register_collector(lambda: self._pool_gauges(engine, bind))
+
+    def _time_checkouts(self, engine, bind):
+        # There is no pool event before a checkout starts waiting, so time
+        # Pool.connect() itself; dispose() installs a new pool to wrap
+        pool = engine.pool
+        connect = pool.connect
+
+        def timed_connect():
+            start = time.perf_counter()
+            try:
+                return connect()
+            finally:
+                self.pool_wait.observe((bind,), time.perf_counter() - start)
+
+        pool.connect = timed_connect
+
+    def _pool_gauges(self, engine, bind):
+        pool = engine.pool
+        if not hasattr(pool, 'checkedout'):
+            return []
+        return [('inventory_pool_checked_out_connections', 'gauge',
+                 'Connections currently checked out of the pool', [({'bind': bind}, pool.checkedout())])]
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_query_start'].pop()
+        endpoint = current_endpoint()
+        self.sql_statements.inc((endpoint,))
+        self.sql_seconds.inc((endpoint,), elapsed)
+        if has_request_context() and 'metrics_statements' in g:
+            g.metrics_statements += 1
+        if elapsed >= self.slow_query_threshold:
+            self.slow_queries.inc((endpoint,))
+            self.slow_query_logger.warning(
+                f'Slow query ({elapsed * 1000:.1f} ms) in {endpoint}: '
+                f'{" ".join(statement.split())[:1000]} [parameters: {parameter_shape(parameters, executemany)}]'
+            )
+
+    def _handle_error(self, context):
+        starts = context.connection.info.get('metrics_query_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
@@ -0,0 +1,83 @@
+"""
+Create the indexes declared on the models in an existing database
+db.create_all() only creates missing tables, so databases created before an
+index was added to a model never get it. Run this script after upgrading;
+it is safe to run repeatedly and only creates what is missing. Indexes
+that have since been replaced are dropped.
+"""
+
+from app import app, db
+
+OBSOLETE_INDEXES = {
+    # Superseded by the partial indexes over open assignments
+    'product_assignments': [
+        'ix_product_assignments_product_student_status',
+        'ix_product_assignments_student_status',
+        'ix_product_assignments_status_assigned_date',
+    ],
+    # Superseded by ix_products_category_id, which also orders by id
+    'products': ['ix_products_category'],
+}
+
+def existing_index_names(table_name):
+    if db.engine.dialect.name == 'sqlite':
+        # The inspector skips expression indexes on SQLite, so ask the catalog
+        with db.engine.connect() as connection:
+            rows = connection.execute(db.text(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"
+            ), {'table': table_name})
+            return {row[0] for row in rows}
+    return {index['name'] for index in db.inspect(db.engine).get_indexes(table_name)}
+
+def drop_obsolete_indexes():
+    """Drop the indexes listed in OBSOLETE_INDEXES; returns their names."""
+    inspector = db.inspect(db.engine)
+    dropped = []
+    for table_name, names in OBSOLETE_INDEXES.items():
+        if not inspector.has_table(table_name):
+            continue
+        existing = existing_index_names(table_name)
+        with db.engine.begin() as connection:
+            for name in names:
+                if name in existing:
+                    connection.exec_driver_sql(f'DROP INDEX {name}')
+                    dropped.append(name)
+    return dropped
+
+def create_missing_indexes():
+    """Create every model index not yet in the database; returns their names."""
+    inspector = db.inspect(db.engine)
+    created = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = existing_index_names(table.name)
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in existing:
+                index.create(db.engine)
+                created.append(index.name)
+    if created and db.engine.dialect.name in ('sqlite', 'postgresql'):
+        # Refresh the planner statistics so the new indexes get picked up
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('ANALYZE')
+    return created
+
+def migrate_indexes():
+    with app.app_context():
+        db.create_all()
+        dropped = drop_obsolete_indexes()
+        created = create_missing_indexes()
+
+        if not created and not dropped:
+            print("[OK] All indexes already exist")
+            return created
+
+        for name in dropped:
+            print(f"- Dropped index {name}")
+        for name in created:
+            print(f"+ Created index {name}")
+        print(f"[OK] Created {len(created)} and dropped {len(dropped)} index(es)")
+        return created
+
+if __name__ == '__main__':
+    migrate_indexes()
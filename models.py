@@ -1,5 +1,6 @@
 from app import db
 from datetime import datetime
+from sqlalchemy.ext.hybrid import hybrid_property
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 
@@ -39,6 +40,11 @@ class User(db.Model, UserMixin):
 
 class ActivityLog(db.Model):
     __tablename__ = 'activity_logs'
+    __table_args__ = (
+        db.Index('ix_activity_logs_timestamp', 'timestamp'),
+        db.Index('ix_activity_logs_user_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_activity_logs_action_timestamp', 'action', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
@@ -52,6 +58,9 @@ class ActivityLog(db.Model):
 
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        db.Index('ix_products_category', 'category'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -71,17 +80,30 @@ class Product(db.Model):
     def __repr__(self):
         return f'<Product {self.name} (ID: {self.id})>'
     
-    @property
+    @hybrid_property
     def is_low_stock(self):
         """Check if the product quantity is at or below the minimum stock level."""
         return self.quantity <= self.min_stock_level
     
+    @is_low_stock.expression
+    def is_low_stock(cls):
+        # Same test written as a difference so ix_products_low_stock can serve it
+        return cls.quantity - cls.min_stock_level <= 0
+    
     def assign_to_student(self, student):
-        """Assign this product to a student."""
-        if self.quantity <= 0:
+        """Assign this product to a student.
+        
+        The decrement is a single conditional UPDATE so two concurrent
+        assignments cannot both take the last unit.
+        """
+        result = db.session.execute(
+            db.update(Product).where(Product.id == self.id, Product.quantity >= 1).values(
+                quantity=Product.quantity - 1
+            ).execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
             raise ValueError("Product is out of stock")
-            
-        self.quantity -= 1
+        db.session.refresh(self, ['quantity'])
         self.is_assigned = (self.quantity == 0)
         
         assignment = ProductAssignment(
@@ -96,10 +118,10 @@ class Product(db.Model):
     
     def return_from_student(self, student):
         """Return this product from a student."""
-        assignment = ProductAssignment.query.filter_by(
-            product_id=self.id,
-            student_id=student.id,
-            status='assigned'
+        assignment = ProductAssignment.query.filter(
+            ProductAssignment.student_id == student.id,
+            ProductAssignment.product_id == self.id,
+            ProductAssignment.is_open
         ).first()
         
         if not assignment:
@@ -108,13 +130,33 @@ class Product(db.Model):
         assignment.returned_date = datetime.utcnow()
         assignment.status = 'returned'
         
-        self.quantity += 1
+        db.session.execute(
+            db.update(Product).where(Product.id == self.id).values(
+                quantity=Product.quantity + 1
+            ).execution_options(synchronize_session=False)
+        )
+        db.session.refresh(self, ['quantity'])
         self.is_assigned = False
         
         return assignment
 
+# A plain index cannot compare two columns of the same row, so index the difference
+db.Index('ix_products_low_stock', Product.quantity - Product.min_stock_level)
+
+# WHERE clause of the partial indexes over open assignments
+OPEN_ASSIGNMENT = db.text("status = 'assigned'")
+
 class ProductAssignment(db.Model):
     __tablename__ = 'product_assignments'
+    __table_args__ = (
+        db.Index('ix_product_assignments_open_student', 'student_id', 'product_id',
+                 sqlite_where=OPEN_ASSIGNMENT, postgresql_where=OPEN_ASSIGNMENT),
+        db.Index('ix_product_assignments_open_product', 'product_id',
+                 sqlite_where=OPEN_ASSIGNMENT, postgresql_where=OPEN_ASSIGNMENT),
+        db.Index('ix_product_assignments_open_assigned_date', 'assigned_date',
+                 sqlite_where=OPEN_ASSIGNMENT, postgresql_where=OPEN_ASSIGNMENT),
+        db.Index('ix_product_assignments_assigned_date', 'assigned_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
@@ -131,9 +173,24 @@ class ProductAssignment(db.Model):
     
     def __repr__(self):
         return f'<ProductAssignment {self.id}: {self.product.name} -> {self.student.full_name}>'
+    
+    @hybrid_property
+    def is_open(self):
+        """Check if the product has not been returned yet."""
+        return self.status == 'assigned'
+    
+    @is_open.expression
+    def is_open(cls):
+        # Rendered as a literal: SQLite only uses a partial index when the
+        # query repeats the index's WHERE clause, which a bound parameter does not
+        return cls.status == db.literal('assigned', literal_execute=True)
 
 class Student(db.Model):
     __tablename__ = 'students'
+    __table_args__ = (
+        db.Index('ix_students_department', 'department'),
+        db.Index('ix_students_product_id', 'product_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     full_name = db.Column(db.String(100), nullable=False)
@@ -159,9 +216,11 @@ class Student(db.Model):
     @property
     def current_assignment(self):
         """Get the current product assignment if any."""
-        return ProductAssignment.query.filter_by(
-            student_id=self.id,
-            status='assigned'
+        if self.product_id is None:
+            return None
+        return ProductAssignment.query.filter(
+            ProductAssignment.student_id == self.id,
+            ProductAssignment.is_open
         ).first()
     
     @property
@@ -173,5 +232,9 @@ class Student(db.Model):
     
     @property
     def has_active_assignment(self):
-        """Check if the student currently has an assigned product."""
-        return self.current_assignment is not None
+        """Check if the student currently has an assigned product.
+        
+        product_id is set on assignment and cleared on return, so this needs
+        no query.
+        """
+        return self.product_id is not None
@@ -0,0 +1,172 @@
+"""
+In-memory prefix index for type-ahead lookups
+
+PrefixIndex keeps a sorted list of (key, id) pairs and answers "which
+entries start with this prefix" with a bisect plus a short forward scan,
+so a lookup costs microseconds regardless of how many entries there are.
+Each entry is indexed under its full text and under every word suffix of
+it ("blue microscope" is found by "blu", "micro" and "blue mi").
+
+The index is filled by a loader function on first use (or explicitly with
+load()), updated in place with put()/remove(), and can be marked stale
+with invalidate() after a bulk change so the next lookup reloads it.
+
+Each process holds its own copy. To notice changes made by other
+processes, give the index a ``version()`` function returning a number
+that every change to the source data increments (e.g. a counter row in
+the database): lookups compare it with the version the index was loaded
+at, at most every ``check_interval`` seconds, and reload on a difference.
+A process that applies its own change in place calls advance() with the
+version its change produced.
+"""
+
+import bisect
+import threading
+import time
+
+def normalize(text):
+    """Lowercase and collapse whitespace, as both keys and queries are."""
+    return ' '.join((text or '').lower().split())
+
+def keys_for(texts):
+    """Every key an entry with these texts is found under."""
+    keys = set()
+    for text in texts:
+        words = normalize(text).split(' ')
+        for start in range(len(words)):
+            if words[start]:
+                keys.add(' '.join(words[start:]))
+    return keys
+
+class PrefixIndex:
+    """Sorted-array prefix index mapping text to ``(id, payload)`` entries.
+
+    ``loader()`` returns an iterable of ``(id, texts, payload)`` tuples and
+    is called whenever the index is used while not loaded.
+    """
+
+    def __init__(self, loader=None, version=None, check_interval=1.0):
+        self.loader = loader
+        self.version = version
+        self.check_interval = check_interval
+        self._keys = []
+        self._entries = {}
+        self._loaded = False
+        self._version = None
+        self._next_check = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def load(self, items=None):
+        """Replace the contents with ``items`` (default: the loader's)."""
+        # Read before the data: a change committed in between makes the
+        # next check reload again rather than go unnoticed
+        version = self.version() if self.version else None
+        if items is None:
+            items = self.loader() if self.loader else ()
+        keys = []
+        entries = {}
+        for id_, texts, payload in items:
+            entry_keys = keys_for(texts)
+            entries[id_] = (entry_keys, payload)
+            keys.extend((key, id_) for key in entry_keys)
+        keys.sort()
+        with self._lock:
+            self._keys = keys
+            self._entries = entries
+            self._loaded = True
+            self._version = version
+            self._next_check = time.monotonic() + self.check_interval
+
+    def invalidate(self):
+        """Drop the contents; the next lookup reloads from the loader."""
+        with self._lock:
+            self._loaded = False
+
+    def advance(self, previous, version):
+        """Record that a change turning the source from ``previous`` into
+        ``version`` has been applied in place. An index that was not at
+        ``previous`` has missed other changes and reloads instead."""
+        if self.version is None:
+            return
+        with self._lock:
+            if self._loaded and self._version == previous:
+                self._version = version
+            else:
+                self._loaded = False
+
+    def _ensure_loaded(self):
+        if self._loaded and self.version is not None and time.monotonic() >= self._next_check:
+            current = self.version()
+            with self._lock:
+                if current != self._version:
+                    self._loaded = False
+                self._next_check = time.monotonic() + self.check_interval
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load()
+
+    def _remove_keys(self, id_):
+        entry = self._entries.pop(id_, None)
+        if entry is None:
+            return
+        for key in entry[0]:
+            position = bisect.bisect_left(self._keys, (key, id_))
+            if position < len(self._keys) and self._keys[position] == (key, id_):
+                del self._keys[position]
+
+    def put(self, id_, texts, payload):
+        """Add an entry, or replace the texts and payload of an existing one."""
+        with self._lock:
+            if not self._loaded:
+                return
+            entry_keys = keys_for(texts)
+            current = self._entries.get(id_)
+            if current is not None and current[0] == entry_keys:
+                self._entries[id_] = (entry_keys, payload)
+                return
+            self._remove_keys(id_)
+            self._entries[id_] = (entry_keys, payload)
+            for key in entry_keys:
+                bisect.insort(self._keys, (key, id_))
+
+    def update_payload(self, id_, payload):
+        with self._lock:
+            entry = self._entries.get(id_)
+            if entry is not None:
+                self._entries[id_] = (entry[0], payload)
+
+    def remove(self, id_):
+        with self._lock:
+            self._remove_keys(id_)
+
+    def search(self, prefix, limit=10, predicate=None):
+        """Up to ``limit`` ``(id, payload)`` pairs whose text starts with
+        ``prefix`` (at any word), in key order; ``predicate(payload)``
+        filters entries."""
+        self._ensure_loaded()
+        prefix = normalize(prefix)
+        results = []
+        seen = set()
+        with self._lock:
+            keys = self._keys
+            position = bisect.bisect_left(keys, (prefix,))
+            while position < len(keys) and len(results) < limit:
+                key, id_ = keys[position]
+                if not key.startswith(prefix):
+                    break
+                position += 1
+                if id_ in seen:
+                    continue
+                seen.add(id_)
+                payload = self._entries[id_][1]
+                if predicate is None or predicate(payload):
+                    results.append((id_, payload))
+        return results
@@ -0,0 +1,172 @@
+"""
+On-demand stack-sampling profiler for individual requests
+
+Profiler.init_app() profiles a request when either
+
+  * it is picked by the sampling rate (``sample_rate``, 0 to 1), optionally
+    only for some endpoints, e.g. ``{'reports', 'students'}``; or
+  * it carries the trigger header (``X-Profile: 1``) and ``authorize()``
+    accepts it, i.e. it comes from an admin.
+
+While a profiled request runs, a sampler thread records the request
+thread's Python stack every ``interval`` seconds. The samples are kept as
+collapsed stacks (``outer;inner;leaf count`` per line), the input format of
+flamegraph.pl, speedscope and most other flame-graph viewers, in a bounded
+in-memory store of recent profiles (per process).
+
+Sampling rather than cProfile keeps the profiled request close to its
+normal speed, and the rate and endpoints can be changed at runtime, so a
+slow route in production can be profiled without a redeploy. When nothing
+is sampled and no trigger header is sent, the per-request cost is a couple
+of attribute checks (see bench_profiler.py).
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from itertools import count
+
+from flask import request
+
+ENVIRON_KEY = 'inventory.profile'
+
+def frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':')
+
+def collapse(frame):
+    """``frame``'s stack as one collapsed-stack key, outermost call first."""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+class StackSampler:
+    """Samples the stack of thread ``thread_id`` from a background thread."""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+            del frame
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        return self.stacks
+
+class Profiler:
+    """Per-request sampling profiles, kept in memory for download."""
+
+    def __init__(self, sample_rate=0.0, endpoints=(), interval=0.005, max_profiles=50,
+                 header='X-Profile', authorize=None):
+        self.sample_rate = sample_rate
+        self.endpoints = set(endpoints)
+        self.interval = interval
+        self.header = header
+        self._environ_header = 'HTTP_' + header.upper().replace('-', '_')
+        self.authorize = authorize or (lambda: False)
+        self._profiles = deque(maxlen=max_profiles)
+        self._ids = count(1)
+        self._lock = threading.Lock()
+        self._running = 0
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def configure(self, sample_rate=None, endpoints=None):
+        if sample_rate is not None:
+            self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+        if endpoints is not None:
+            self.endpoints = set(endpoints)
+
+    def settings(self):
+        return {'sample_rate': self.sample_rate, 'endpoints': sorted(self.endpoints),
+                'interval_ms': self.interval * 1000, 'header': self.header}
+
+    def _wanted(self, environ):
+        if environ.get(self._environ_header) == '1' and self.authorize():
+            return True
+        if self.endpoints and request.endpoint not in self.endpoints:
+            return False
+        return random.random() < self.sample_rate
+
+    def _before_request(self):
+        # Fast path: this runs on every request
+        environ = request.environ
+        if not self.sample_rate and self._environ_header not in environ:
+            return
+        if self._wanted(environ):
+            with self._lock:
+                self._running += 1
+            environ[ENVIRON_KEY] = {
+                'started_at': datetime.utcnow(),
+                'start': time.perf_counter(),
+                'sampler': StackSampler(threading.get_ident(), self.interval).start(),
+            }
+
+    def _after_request(self, response):
+        if not self._running:
+            return response
+        profile = request.environ.get(ENVIRON_KEY)
+        if profile is not None:
+            profile['status'] = response.status_code
+        return response
+
+    def _teardown_request(self, exc):
+        if not self._running:
+            return
+        # Kept in the WSGI environ rather than g: the request context may
+        # be torn down after its application context (the test client)
+        profile = request.environ.pop(ENVIRON_KEY, None)
+        if profile is None:
+            return
+        stacks = profile['sampler'].stop()
+        with self._lock:
+            self._running -= 1
+        record = {
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': profile.get('status', 500),
+            'started_at': profile['started_at'].isoformat(),
+            'duration_ms': round((time.perf_counter() - profile['start']) * 1000, 2),
+            'samples': sum(stacks.values()),
+            'stacks': stacks,
+        }
+        with self._lock:
+            record['id'] = next(self._ids)
+            self._profiles.append(record)
+
+    def profiles(self):
+        """Recent profiles, newest first, without their stacks."""
+        with self._lock:
+            records = list(self._profiles)
+        return [{key: value for key, value in record.items() if key != 'stacks'} for record in reversed(records)]
+
+    def collapsed(self, profile_id):
+        """Collapsed-stack text of a stored profile, or None."""
+        with self._lock:
+            record = next((record for record in self._profiles if record['id'] == profile_id), None)
+        if record is None:
+            return None
+        return ''.join(f'{stack} {samples}\n' for stack, samples in sorted(record['stacks'].items()))
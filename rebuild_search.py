@@ -0,0 +1,22 @@
+"""
+Create and refill the full-text search indexes
+The indexes are created automatically with the tables and kept in sync by
+triggers; run this script after restoring a backup or editing the database
+outside the application.
+"""
+
+from app import app, db
+import search
+
+def rebuild_search():
+    with app.app_context():
+        db.create_all()
+        with db.engine.begin() as connection:
+            installed = search.install(connection)
+            search.rebuild(connection)
+        for table in installed:
+            print(f"+ Created search index for {table}")
+        print("[OK] Search indexes rebuilt")
+
+if __name__ == '__main__':
+    rebuild_search()
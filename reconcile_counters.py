@@ -0,0 +1,25 @@
+"""
+Rebuild the materialized inventory counters from the base tables
+Run this script after editing the database by hand or restoring a backup;
+it reports any counter that had drifted from the real totals.
+"""
+
+from app import app, db, rebuild_inventory_counters
+
+def reconcile_counters():
+    with app.app_context():
+        db.create_all()
+        drift = rebuild_inventory_counters()
+        db.session.commit()
+        
+        if not drift:
+            print("[OK] Inventory counters are in sync")
+            return drift
+        
+        print(f"[FIXED] {len(drift)} counter(s) had drifted:")
+        for field, (stored, actual) in sorted(drift.items()):
+            print(f"  - {field}: stored {stored}, actual {actual} ({actual - stored:+d})")
+        return drift
+
+if __name__ == '__main__':
+    reconcile_counters()
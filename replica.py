@@ -0,0 +1,127 @@
+"""
+Read-replica routing
+
+Reports and exports run long read queries that do not need to compete with
+checkouts on the primary database. When a replica is configured
+(DATABASE_READ_URL, registered as the ``replica`` bind), views marked as
+read-only let their session send plain SELECTs to it, while:
+
+  * anything else (INSERT/UPDATE/DELETE, flushes, raw SQL) goes to the
+    primary, and once a session has written, all of its later reads do
+    too (read-after-write within a request);
+  * a view can opt its session out with use_primary(), e.g. before reading
+    something it is about to write back;
+  * the replica is probed before first use and skipped for
+    ``retry_interval`` seconds whenever the probe or a query on it fails,
+    so an unavailable replica means reads on the primary, not errors.
+
+Keeping the replica in sync (streaming replication on PostgreSQL, file
+copies or litestream on SQLite) happens outside the application; readers
+may see data that is a little behind the primary. To try it locally with
+two SQLite files, copy the database and point DATABASE_READ_URL at the
+copy:
+
+    sqlite3 instance/inventory.db ".backup instance/inventory_replica.db"
+    DATABASE_READ_URL=sqlite:///inventory_replica.db python app.py
+
+or, with two local PostgreSQL servers, set DATABASE_URL and
+DATABASE_READ_URL to the primary and the standby.
+"""
+
+import logging
+import threading
+import time
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql import Select
+
+logger = logging.getLogger(__name__)
+
+class ReplicaRouter:
+    """Decides whether the replica ``engine`` is usable.
+
+    ``probe`` is a statement that must succeed on a healthy replica, e.g. a
+    SELECT from an application table (an empty SQLite file answers
+    ``SELECT 1`` just fine).
+    """
+
+    def __init__(self, engine=None, probe=None, retry_interval=30):
+        self.probe = probe
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._healthy_until = 0
+        self._down_until = 0
+        self.engine = None
+        if engine is not None:
+            self.configure(engine)
+
+    def configure(self, engine):
+        """Route to ``engine`` (None turns routing off)."""
+        with self._lock:
+            self.engine = engine
+            self._healthy_until = 0
+            self._down_until = 0
+        if engine is not None and not event.contains(engine, 'handle_error', self._on_error):
+            event.listen(engine, 'handle_error', self._on_error)
+
+    def _on_error(self, context):
+        # Lost connections, missing files or tables, not bad queries
+        if context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError):
+            self.mark_down(context.original_exception)
+
+    def mark_down(self, reason=None):
+        with self._lock:
+            if self._down_until <= time.monotonic():
+                logger.warning(f'Read replica unavailable, using the primary: {reason}')
+            self._down_until = time.monotonic() + self.retry_interval
+            self._healthy_until = 0
+
+    def available(self):
+        engine = self.engine
+        if engine is None:
+            return False
+        now = time.monotonic()
+        if now < self._down_until:
+            return False
+        if now < self._healthy_until:
+            return True
+        try:
+            with engine.connect() as connection:
+                if self.probe is not None:
+                    connection.execute(self.probe).all()
+        except Exception as e:
+            self.mark_down(e)
+            return False
+        with self._lock:
+            self._healthy_until = now + self.retry_interval
+        return True
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends SELECTs to the replica while
+    ``info['replica_router']`` is set and the session has not written."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        router = self.info.get('replica_router')
+        if (bind is None and router is not None and isinstance(clause, Select)
+                and not self.info.get('wrote') and router.available()):
+            return router.engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def use_replica(session, router):
+    """Let ``session`` read from ``router``'s replica from now on."""
+    session.info['replica_router'] = router
+
+def use_primary(session):
+    """Keep every further query of ``session`` on the primary."""
+    session.info['wrote'] = True
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _flushed(session, flush_context):
+    use_primary(session)
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _executed(orm_execute_state):
+    if not orm_execute_state.is_select:
+        use_primary(orm_execute_state.session)
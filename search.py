@@ -0,0 +1,156 @@
+"""
+Full-text search over products and students
+
+On SQLite each searchable table gets an FTS5 index (``<table>_fts``) over
+its text columns. The index is an external-content table, so the text is
+not stored twice, and triggers on the base table keep it in sync on every
+INSERT, UPDATE and DELETE, including the bulk Core statements used by the
+importers. On PostgreSQL the same columns feed a generated ``tsvector``
+column with a GIN index, which PostgreSQL keeps up to date itself.
+
+Searches follow type-ahead rules: every word but the last must match a
+whole word, the last one matches as a prefix. Results come back in id
+order rather than by relevance: scoring needs the full list of matches,
+which for a short prefix on a large table costs far more than the lookup
+itself. When neither backend feature is available (e.g. SQLite built
+without FTS5) searches fall back to LIKE prefix matching.
+
+This module only needs a SQLAlchemy connection; app.py installs the
+indexes when the tables are created and exposes /api/search.
+"""
+
+import re
+
+from sqlalchemy import text
+
+# name -> (table, searchable columns)
+SEARCH_TABLES = {
+    'products': ('products', ('name', 'description', 'category')),
+    'students': ('students', ('full_name', 'roll_number', 'email', 'department')),
+}
+
+MAX_TERMS = 8
+
+def parse_terms(query):
+    """Split free text into at most MAX_TERMS lowercase word tokens."""
+    return [term.lower() for term in re.findall(r'\w+', query or '')][:MAX_TERMS]
+
+def fts5_available(connection):
+    try:
+        connection.exec_driver_sql('CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_probe USING fts5(x)')
+        connection.exec_driver_sql('DROP TABLE temp.fts5_probe')
+        return True
+    except Exception:
+        return False
+
+def _sqlite_ddl(table, columns):
+    fts = f'{table}_fts'
+    names = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='1 2 3 4 5 6')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN '
+        f'INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); END",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {names} ON {table} BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); "
+        f'INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END',
+    ]
+
+def _postgres_ddl(table, columns):
+    document = " || ' ' || ".join(f"coalesce({column}, '')" for column in columns)
+    return [
+        f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector '
+        f"GENERATED ALWAYS AS (to_tsvector('simple', {document})) STORED",
+        f'CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING gin (search_vector)',
+    ]
+
+def install(connection):
+    """Create the search indexes that do not exist yet; safe to call on
+    every start. Returns the names of the tables that were indexed."""
+    dialect = connection.dialect.name
+    installed = []
+    for table, columns in SEARCH_TABLES.values():
+        if dialect == 'sqlite':
+            if not fts5_available(connection):
+                return installed
+            exists = connection.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (f'{table}_fts',)
+            ).scalar()
+            statements = _sqlite_ddl(table, columns)
+            if exists:
+                statements = statements[1:]
+            for statement in statements:
+                connection.exec_driver_sql(statement)
+            if not exists:
+                # Index the rows that existed before the search table
+                connection.exec_driver_sql(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+                installed.append(table)
+        elif dialect == 'postgresql':
+            for statement in _postgres_ddl(table, columns):
+                connection.exec_driver_sql(statement)
+            installed.append(table)
+    return installed
+
+def uninstall(connection):
+    """Drop the SQLite search tables (the triggers go with the base tables)."""
+    if connection.dialect.name != 'sqlite':
+        return
+    for table, _ in SEARCH_TABLES.values():
+        connection.exec_driver_sql(f'DROP TABLE IF EXISTS {table}_fts')
+
+def rebuild(connection):
+    """Re-index every row, e.g. after editing the database by hand."""
+    if connection.dialect.name != 'sqlite':
+        return
+    for table, _ in SEARCH_TABLES.values():
+        connection.exec_driver_sql(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+def _backend(connection, table):
+    dialect = connection.dialect.name
+    if dialect == 'sqlite' and connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (f'{table}_fts',)
+    ).scalar():
+        return 'fts5'
+    if dialect == 'postgresql':
+        return 'tsvector'
+    return 'like'
+
+def match_ids(connection, kind, query, limit=20):
+    """Ids of the ``kind`` rows (a SEARCH_TABLES key) matching ``query``,
+    in id order."""
+    table, columns = SEARCH_TABLES[kind]
+    terms = parse_terms(query)
+    if not terms:
+        return []
+    backend = _backend(connection, table)
+    if backend == 'fts5':
+        # Quoted terms cannot be mistaken for FTS5 operators. Prefixes of up
+        # to six characters are served by the prefix indexes; longer ones
+        # merge the postings of every matching word.
+        expression = ' AND '.join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+        statement = text(f'SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH :expression '
+                         f'ORDER BY rowid LIMIT :limit')
+        params = {'expression': expression, 'limit': limit}
+    elif backend == 'tsvector':
+        expression = ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+        statement = text(f"SELECT id FROM {table} WHERE search_vector @@ to_tsquery('simple', :expression) "
+                         f'ORDER BY id LIMIT :limit')
+        params = {'expression': expression, 'limit': limit}
+    else:
+        params = {'limit': limit}
+        conditions = []
+        for index, term in enumerate(terms):
+            escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params[f'start{index}'] = escaped + '%'
+            params[f'word{index}'] = '% ' + escaped + '%'
+            # The term starts the column or one of its words
+            conditions.append('(' + ' OR '.join(
+                f"lower({column}) LIKE :start{index} ESCAPE '\\' OR lower({column}) LIKE :word{index} ESCAPE '\\'"
+                for column in columns
+            ) + ')')
+        statement = text(f"SELECT id FROM {table} WHERE {' AND '.join(conditions)} ORDER BY id LIMIT :limit")
+    return [row[0] for row in connection.execute(statement, params)]
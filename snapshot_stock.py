@@ -0,0 +1,18 @@
+"""
+Record the current stock of every category in the stock history
+Run this once after upgrading (so every category has a starting point) and
+then from cron, e.g. hourly, so the history stays complete even for
+categories that see no assignments or returns.
+"""
+
+from app import app, db, take_stock_snapshot
+
+def snapshot_stock():
+    with app.app_context():
+        db.create_all()
+        categories = take_stock_snapshot()
+        db.session.commit()
+        print(f"[OK] Recorded stock for {categories} categor{'y' if categories == 1 else 'ies'}")
+
+if __name__ == '__main__':
+    snapshot_stock()
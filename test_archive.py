@@ -0,0 +1,68 @@
+"""
+Test archiving of old assignments and activity logs
+"""
+
+from datetime import datetime, timedelta
+
+from app import (app, db, ActivityLog, ActivityLogArchive, Product, ProductAssignment,
+                 ProductAssignmentArchive, Student, archive_activity_logs, archive_assignments,
+                 count_assignments)
+
+def test_archive_moves_old_history_in_batches():
+    """Old returned assignments and log entries move to the archive; open
+    and recent ones stay, and exports over old ranges still include them"""
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            with client.session_transaction() as sess:
+                sess['user_id'] = 1
+                sess['username'] = 'admin'
+                sess['is_admin'] = True
+
+            now = datetime.utcnow()
+            long_ago = now - timedelta(days=800)
+            product = Product(name='Archive Kit', quantity=5, min_stock_level=1)
+            student = Student(full_name='Archive Student', roll_number='ARCH001', department='Archive Test')
+            db.session.add_all([product, student])
+            db.session.flush()
+            old = [ProductAssignment(product_id=product.id, student_id=student.id, status='returned',
+                                     assigned_date=long_ago, returned_date=long_ago + timedelta(days=10))
+                   for _ in range(5)]
+            still_open = ProductAssignment(product_id=product.id, student_id=student.id, status='assigned',
+                                           assigned_date=long_ago)
+            recent = ProductAssignment(product_id=product.id, student_id=student.id, status='returned',
+                                       assigned_date=now - timedelta(days=5), returned_date=now)
+            db.session.add_all(old + [still_open, recent])
+            db.session.add_all([ActivityLog(action='archive_test', timestamp=long_ago),
+                                ActivityLog(action='archive_test', timestamp=now)])
+            db.session.commit()
+            old_ids = sorted(a.id for a in old)
+            try:
+                assert list(archive_assignments(365, batch_size=2, max_batches=1)) == [2]
+                assert list(archive_assignments(365, batch_size=2)) == [2, 1]
+                assert list(archive_activity_logs(180)) == [1]
+
+                archived = ProductAssignmentArchive.query.filter(ProductAssignmentArchive.id.in_(old_ids))
+                assert sorted(a.id for a in archived) == old_ids
+                assert {a.product_id for a in ProductAssignment.query.filter_by(student_id=student.id)} == {product.id}
+                assert ProductAssignment.query.filter_by(student_id=student.id).count() == 2
+                assert ActivityLog.query.filter_by(action='archive_test').count() == 1
+                assert ActivityLogArchive.query.filter_by(action='archive_test').count() == 1
+
+                # Recent ranges skip the archive, old ranges include it
+                assert count_assignments(start=now - timedelta(days=30)) >= 1
+                start = (long_ago - timedelta(days=1)).strftime('%Y-%m-%d')
+                end = (long_ago + timedelta(days=1)).strftime('%Y-%m-%d')
+                response = client.get(f'/export/assignments?start={start}&end={end}')
+                lines = response.get_data(as_text=True).strip().splitlines()
+                exported = [line for line in lines[1:] if 'Archive Kit' in line]
+                assert len(exported) == 6
+                assert sum(',returned' in line for line in exported) == 5
+            finally:
+                ProductAssignment.query.filter_by(student_id=student.id).delete()
+                ProductAssignmentArchive.query.filter_by(student_id=student.id).delete()
+                ActivityLog.query.filter_by(action='archive_test').delete()
+                ActivityLogArchive.query.filter_by(action='archive_test').delete()
+                db.session.delete(student)
+                db.session.delete(product)
+                db.session.commit()
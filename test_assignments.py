@@ -0,0 +1,132 @@
+"""
+Test bulk assignment and bulk return of products
+"""
+
+import io
+
+from app import (app, db, Product, Student, ProductAssignment, compute_inventory_counters,
+                 get_inventory_counters, rebuild_inventory_counters, COUNTER_FIELDS)
+
+def login(client):
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['username'] = 'admin'
+        sess['is_admin'] = True
+
+def counters_in_sync():
+    counters = get_inventory_counters()
+    db.session.refresh(counters)
+    return {field: getattr(counters, field) for field in COUNTER_FIELDS} == compute_inventory_counters()
+
+def cleanup():
+    student_ids = [s.id for s in Student.query.filter_by(department='Bulk Test')]
+    ProductAssignment.query.filter(ProductAssignment.student_id.in_(student_ids)).delete()
+    Student.query.filter_by(department='Bulk Test').delete()
+    Product.query.filter(Product.name.like('Bulk Kit%')).delete()
+    db.session.commit()
+    rebuild_inventory_counters()
+    db.session.commit()
+
+def test_bulk_assign_reports_each_student():
+    """Eligible students get the product in one go; the rest are reported"""
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                login(client)
+                product = Product(name='Bulk Kit', quantity=5, min_stock_level=1, category='Lab Equipment')
+                holder_product = Product(name='Bulk Kit Other', quantity=1, min_stock_level=1)
+                db.session.add_all([product, holder_product])
+                db.session.flush()
+                students = [Student(full_name=f'Bulk {i}', roll_number=f'BULK{i:03d}', department='Bulk Test')
+                            for i in range(3)]
+                students[2].product_id = holder_product.id
+                db.session.add_all(students)
+                db.session.commit()
+                rebuild_inventory_counters()
+                db.session.commit()
+                try:
+                    ids = [s.id for s in students]
+                    response = client.post('/assign_product/bulk', json={
+                        'product_id': product.id, 'student_ids': ids + [999999]
+                    })
+                    payload = response.get_json()
+                    assert payload['assigned'] == 2
+                    assert payload['remaining_quantity'] == 3
+                    assert [r['status'] for r in payload['results']] == [
+                        'assigned', 'assigned', 'already_assigned', 'not_found'
+                    ]
+                    assert ProductAssignment.query.filter_by(product_id=product.id, status='assigned').count() == 2
+                    assert counters_in_sync()
+                finally:
+                    cleanup()
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
+
+def test_bulk_assign_is_all_or_nothing_on_low_stock():
+    """If the stock cannot cover the whole class nobody is assigned"""
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                login(client)
+                product = Product(name='Bulk Kit Scarce', quantity=2, min_stock_level=1)
+                db.session.add(product)
+                db.session.add_all([Student(full_name=f'Bulk {i}', roll_number=f'BULK{i:03d}', department='Bulk Test')
+                                    for i in range(3)])
+                db.session.commit()
+                try:
+                    response = client.post('/assign_product/bulk', json={
+                        'product_id': product.id, 'department': 'Bulk Test'
+                    })
+                    assert response.status_code == 400
+                    db.session.refresh(product)
+                    assert product.quantity == 2
+                    assert Student.query.filter_by(department='Bulk Test').filter(
+                        Student.product_id.isnot(None)).count() == 0
+                finally:
+                    cleanup()
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
+
+def test_bulk_return_from_scan_file():
+    """A scan file returns every listed student's product in one request"""
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                login(client)
+                product = Product(name='Bulk Kit Return', quantity=10, min_stock_level=8, category='Sports')
+                db.session.add(product)
+                db.session.add_all([Student(full_name=f'Bulk {i}', roll_number=f'BULK{i:03d}', department='Bulk Test')
+                                    for i in range(4)])
+                db.session.commit()
+                rebuild_inventory_counters()
+                db.session.commit()
+                try:
+                    client.post('/assign_product/bulk', json={'product_id': product.id, 'department': 'Bulk Test'})
+                    db.session.refresh(product)
+                    assert product.quantity == 6
+
+                    scans = 'roll_number\nBULK000\nBULK001\nBULK002\n\nNOPE999\n'
+                    response = client.post('/return_product/bulk', data={
+                        'file': (io.BytesIO(scans.encode('utf-8')), 'scans.txt')
+                    }, content_type='multipart/form-data')
+                    payload = response.get_json()
+                    assert payload['returned'] == 3
+                    assert [r['status'] for r in payload['results']] == ['returned'] * 3 + ['not_found']
+
+                    response = client.post('/return_product/bulk', json={'roll_numbers': ['BULK000', 'BULK003']})
+                    assert [r['status'] for r in response.get_json()['results']] == ['nothing_assigned', 'returned']
+
+                    db.session.refresh(product)
+                    assert product.quantity == 10
+                    assert ProductAssignment.query.filter_by(product_id=product.id, status='assigned').count() == 0
+                    assert counters_in_sync()
+                finally:
+                    cleanup()
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
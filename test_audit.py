@@ -0,0 +1,210 @@
+"""
+Test the buffered activity log writer
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from audit import AuditWriter
+from app import app, db, ActivityLog, audit_writer, log_activity, write_activity_batch
+
+def test_failed_flush_is_replayed_from_fallback_file():
+    """Entries that could not be written survive in the fallback file and
+    are written, in order, by the next successful flush"""
+    stored = []
+    database_up = {'value': False}
+
+    def flush_fn(entries):
+        if not database_up['value']:
+            raise RuntimeError('database is locked')
+        stored.extend(entries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fallback = os.path.join(tmp, 'audit_fallback.jsonl')
+        writer = AuditWriter(flush_fn, batch_size=1000, flush_interval=60, fallback_path=fallback,
+                             transient_errors=(RuntimeError,))
+        stamp = datetime(2024, 5, 1, 12, 30)
+        writer.submit({'action': 'first', 'timestamp': stamp})
+        assert writer.flush() == 0
+        assert os.path.exists(fallback)
+
+        database_up['value'] = True
+        writer.submit({'action': 'second', 'timestamp': stamp})
+        writer.close()
+
+        assert [entry['action'] for entry in stored] == ['first', 'second']
+        assert stored[0]['timestamp'] == stamp
+        assert not os.path.exists(fallback)
+
+def test_poisoned_entry_is_quarantined():
+    """An entry the database rejects is set aside instead of going to the
+    fallback file and failing every later flush with it"""
+    with tempfile.TemporaryDirectory() as tmp:
+        fallback = os.path.join(tmp, 'audit_fallback.jsonl')
+        writer = AuditWriter(write_activity_batch, batch_size=1000, flush_interval=60, fallback_path=fallback,
+                             transient_errors=audit_writer.transient_errors)
+        with app.app_context():
+            db.create_all()
+            try:
+                # One left over in the fallback file from an outage
+                writer._write_fallback([{'action': 'poison_test', 'details': 'replayed'},
+                                        {'action': None, 'details': 'poisoned'}])
+                writer.submit({'action': 'poison_test', 'details': 'queued'})
+                assert writer.flush() == 2
+                assert not os.path.exists(fallback)
+                with open(writer.quarantine_path, encoding='utf-8') as quarantined:
+                    assert [json.loads(line)['details'] for line in quarantined] == ['poisoned']
+
+                writer.submit({'action': 'poison_test', 'details': 'later'})
+                assert writer.flush() == 1
+                details = sorted(log.details for log in ActivityLog.query.filter_by(action='poison_test'))
+                assert details == ['later', 'queued', 'replayed']
+            finally:
+                writer.close()
+                ActivityLog.query.filter_by(action='poison_test').delete()
+                db.session.commit()
+
+def test_writers_sharing_a_fallback_file():
+    """Entries another writer (worker process) adds to the fallback file
+    while it is being replayed are kept for the next replay, and every
+    entry is stored exactly once"""
+    stored = []
+    entered, release = threading.Event(), threading.Event()
+    database_up = {'a': False}
+
+    def flush_a(entries):
+        if not database_up['a']:
+            raise RuntimeError('database is locked')
+        stored.extend(entries)
+
+    def flush_b(entries):
+        entered.set()
+        release.wait(5)
+        stored.extend(entries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fallback = os.path.join(tmp, 'audit_fallback.jsonl')
+        writer_a = AuditWriter(flush_a, batch_size=1000, flush_interval=60, fallback_path=fallback,
+                               transient_errors=(RuntimeError,))
+        writer_b = AuditWriter(flush_b, batch_size=1000, flush_interval=60, fallback_path=fallback,
+                               transient_errors=(RuntimeError,))
+        writer_a.submit({'action': 'a1'})
+        writer_a.flush()
+
+        writer_b.submit({'action': 'b1'})
+        replaying = threading.Thread(target=writer_b.flush)
+        replaying.start()
+        assert entered.wait(5)
+        writer_a.submit({'action': 'a2'})
+        appending = threading.Thread(target=writer_a.flush)
+        appending.start()
+        time.sleep(0.1)
+        # Waits for the replay to finish with the file
+        assert appending.is_alive()
+        release.set()
+        replaying.join()
+        appending.join()
+
+        database_up['a'] = True
+        writer_a.flush()
+        assert sorted(entry['action'] for entry in stored) == ['a1', 'a2', 'b1']
+        assert not os.path.exists(fallback)
+
+def test_log_activity_is_buffered_until_flush():
+    """log_activity queues the entry; the flush writes it with one insert"""
+    with app.test_request_context('/', environ_base={'REMOTE_ADDR': '10.1.2.3'}):
+        db.create_all()
+        app.config['AUDIT_BUFFER_ENABLED'] = True
+        audit_writer.flush()
+
+        log_activity(1, 'audit_test', 'buffered entry')
+        audit_writer.flush()
+
+        entry = ActivityLog.query.filter_by(action='audit_test').one()
+        assert entry.details == 'buffered entry'
+        assert entry.ip_address == '10.1.2.3'
+        ActivityLog.query.filter_by(action='audit_test').delete()
+        db.session.commit()
+
+def test_activity_logs_cursor_pagination():
+    """Pages follow each other without gaps or repeats, newest first, and
+    the filters and approximate total apply"""
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            with client.session_transaction() as sess:
+                sess['user_id'] = 1
+                sess['username'] = 'admin'
+                sess['is_admin'] = True
+
+            stamp = datetime(2031, 3, 1, 9, 0)
+            # Two entries share every timestamp, so the id must break ties
+            db.session.add_all([
+                ActivityLog(user_id=7 if i % 3 == 0 else 8, action='page_test', details=str(i),
+                            timestamp=stamp + timedelta(minutes=i // 2))
+                for i in range(25)
+            ])
+            db.session.commit()
+            try:
+                seen = []
+                url = '/api/activity_logs?action=page_test&per_page=10&total=1'
+                payload = client.get(url).get_json()
+                assert (payload['total'], payload['total_exact']) == (25, True)
+                while True:
+                    seen.extend(payload['logs'])
+                    if not payload['next_cursor']:
+                        break
+                    payload = client.get(f'{url}&cursor={payload["next_cursor"]}').get_json()
+                keys = [(log['timestamp'], log['id']) for log in seen]
+                assert len(seen) == 25
+                assert keys == sorted(keys, reverse=True)
+
+                payload = client.get('/api/activity_logs?action=page_test&user_id=7&start=2031-03-01&end=2031-03-01').get_json()
+                assert len(payload['logs']) == 9
+                assert client.get('/api/activity_logs?start=March').status_code == 400
+            finally:
+                ActivityLog.query.filter_by(action='page_test').delete()
+                db.session.commit()
+
+def test_activity_logs_pages_reach_entries_without_timestamp():
+    """Legacy entries with a NULL timestamp are listed after all the others
+    instead of failing the page"""
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            with client.session_transaction() as sess:
+                sess['user_id'] = 1
+                sess['username'] = 'admin'
+                sess['is_admin'] = True
+
+            stamp = datetime(2031, 4, 1, 9, 0)
+            db.session.add_all([
+                ActivityLog(action='null_page_test', details=str(i), timestamp=stamp + timedelta(minutes=i))
+                for i in range(8)
+            ])
+            db.session.flush()
+            # The column default would fill in a NULL on insert
+            db.session.execute(db.update(ActivityLog).where(
+                ActivityLog.action == 'null_page_test', ActivityLog.details.in_(['5', '6', '7'])
+            ).values(timestamp=None))
+            db.session.commit()
+            try:
+                for per_page in (3, 5, 20):
+                    seen = []
+                    url = f'/api/activity_logs?action=null_page_test&per_page={per_page}'
+                    response = client.get(url)
+                    while True:
+                        assert response.status_code == 200
+                        payload = response.get_json()
+                        seen.extend(log['details'] for log in payload['logs'])
+                        if not payload['next_cursor']:
+                            break
+                        response = client.get(f'{url}&cursor={payload["next_cursor"]}')
+                    assert seen == ['4', '3', '2', '1', '0', '7', '6', '5'], per_page
+            finally:
+                ActivityLog.query.filter_by(action='null_page_test').delete()
+                db.session.commit()
@@ -0,0 +1,155 @@
+"""
+Test the in-memory prefix index and the autocomplete endpoints
+"""
+
+from prefix_index import PrefixIndex
+from app import app, db, AutocompleteVersion, Product, ProductAssignment, Student, product_index
+
+def test_prefix_index_matches_any_word():
+    """Entries are found by a prefix of their text or of any later word,
+    once each, and updates and removals take effect in place"""
+    index = PrefixIndex(lambda: [
+        (1, ['Blue Microscope'], {'quantity': 2}),
+        (2, ['Micrometer'], {'quantity': 0}),
+        (3, ['Ruler', 'R-77'], {'quantity': 5}),
+    ])
+    assert [id_ for id_, _ in index.search('micro')] == [2, 1]
+    assert [id_ for id_, _ in index.search('blue  MI')] == [1]
+    assert [id_ for id_, _ in index.search('micro', predicate=lambda p: p['quantity'] > 0)] == [1]
+    assert [id_ for id_, _ in index.search('r-7')] == [3]
+    assert len(index.search('', limit=10)) == 3
+
+    index.put(1, ['Red Telescope'], {'quantity': 2})
+    index.remove(2)
+    assert index.search('micro') == []
+    assert index.search('tele') == [(1, {'quantity': 2})]
+
+    index.invalidate()
+    assert [id_ for id_, _ in index.search('micro')] == [2, 1]
+
+def test_autocomplete_follows_writes():
+    """ORM changes, stock movements and bulk deletes all reach the index"""
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                with client.session_transaction() as sess:
+                    sess['user_id'] = 1
+                    sess['username'] = 'admin'
+                    sess['is_admin'] = True
+
+                def names(q, **args):
+                    query = '&'.join(f'{key}={value}' for key, value in args.items())
+                    products = client.get(f'/api/autocomplete/products?q={q}&{query}').get_json()['products']
+                    return [(p['name'], p['quantity']) for p in products]
+
+                product_index.load()
+                product = Product(name='Quokka Lab Goggles', quantity=1, min_stock_level=0)
+                student = Student(full_name='Quentin Quokkason', roll_number='QUOK001', department='Quokka Test')
+                db.session.add_all([product, student])
+                db.session.commit()
+                try:
+                    assert names('quokka') == [('Quokka Lab Goggles', 1)]
+                    assert names('lab gog') == [('Quokka Lab Goggles', 1)]
+                    students = client.get('/api/autocomplete/students?q=quok').get_json()['students']
+                    assert [s['roll_number'] for s in students] == ['QUOK001']
+
+                    # The last unit goes: hidden from the picker, still listed with available=0
+                    client.post(f'/assign_product/{student.id}', json={'product_id': product.id})
+                    assert names('quokka') == []
+                    assert names('quokka', available=0) == [('Quokka Lab Goggles', 0)]
+                    client.post(f'/return_product/{student.id}')
+                    assert names('quokka') == [('Quokka Lab Goggles', 1)]
+
+                    product.name = 'Wombat Lab Goggles'
+                    db.session.commit()
+                    assert names('quokka') == []
+                    assert names('womb') == [('Wombat Lab Goggles', 1)]
+
+                    Product.query.filter_by(id=product.id).delete()
+                    db.session.commit()
+                    assert names('womb') == []
+                finally:
+                    ProductAssignment.query.filter_by(student_id=student.id).delete()
+                    Student.query.filter_by(department='Quokka Test').delete()
+                    Product.query.filter(Product.name.like('% Lab Goggles')).delete()
+                    db.session.commit()
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
+
+def test_prefix_index_follows_source_version():
+    """A version change made elsewhere reloads the index; a change applied
+    in place on top of the current version does not"""
+    source = {'version': 1, 'items': [(1, ['Alpha'], {})]}
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return list(source['items'])
+
+    index = PrefixIndex(loader, lambda: source['version'], check_interval=0)
+    assert [id_ for id_, _ in index.search('al')] == [1]
+
+    index.put(2, ['Alder'], {})
+    source['items'].append((2, ['Alder'], {}))
+    source['version'] = 2
+    index.advance(1, 2)
+    assert [id_ for id_, _ in index.search('al')] == [2, 1]
+    assert len(loads) == 1
+
+    # Another process added an entry and bumped the version
+    source['items'].append((3, ['Almond'], {}))
+    source['version'] = 3
+    assert [id_ for id_, _ in index.search('al')] == [2, 3, 1]
+    assert len(loads) == 2
+
+    # A change on top of a version this copy never saw forces a reload
+    index.advance(4, 5)
+    assert not index.loaded
+
+def test_autocomplete_sees_writes_from_other_processes():
+    """Rows written by another worker, which bumps the table's version in
+    its transaction, show up once this process checks the version"""
+    interval = product_index.check_interval
+    product_index.check_interval = 0
+    try:
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                with client.session_transaction() as sess:
+                    sess['user_id'] = 1
+                    sess['username'] = 'admin'
+                    sess['is_admin'] = True
+                product_index.load()
+                assert client.get('/api/autocomplete/products?q=numbat').get_json()['products'] == []
+
+                # What another worker's add_product commits
+                with db.engine.begin() as connection:
+                    connection.execute(db.insert(Product), {'name': 'Numbat Field Kit', 'quantity': 4,
+                                                            'min_stock_level': 1})
+                    connection.execute(db.update(AutocompleteVersion).where(
+                        AutocompleteVersion.name == 'products'
+                    ).values(version=AutocompleteVersion.version + 1))
+                try:
+                    products = client.get('/api/autocomplete/products?q=numbat').get_json()['products']
+                    assert [p['name'] for p in products] == ['Numbat Field Kit']
+
+                    # This process's own writes advance its copy without a reload
+                    loads = []
+                    loader = product_index.loader
+                    product_index.loader = lambda: loads.append(1) or loader()
+                    try:
+                        product = Product.query.filter_by(name='Numbat Field Kit').one()
+                        product.name = 'Numbat Survey Kit'
+                        db.session.commit()
+                        products = client.get('/api/autocomplete/products?q=numbat').get_json()['products']
+                        assert [p['name'] for p in products] == ['Numbat Survey Kit']
+                        assert loads == []
+                    finally:
+                        product_index.loader = loader
+                finally:
+                    Product.query.filter(Product.name.like('Numbat %')).delete()
+                    db.session.commit()
+    finally:
+        product_index.check_interval = interval
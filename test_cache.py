@@ -0,0 +1,86 @@
+"""
+Test the view cache and its invalidation from the write routes
+"""
+
+from cache import MemoryCache, ViewCache
+from app import (app, db, Product, ProductAssignment, Student, StockSnapshot, view_cache,
+                 cached_dashboard_stats, record_stock_change)
+
+def test_view_cache_hits_expiry_and_invalidation():
+    """Results are reused per view and arguments until their TTL runs out,
+    the view is invalidated or the LRU evicts them"""
+    calls = []
+    cache = ViewCache(MemoryCache(max_entries=2), default_ttl=60)
+
+    @cache.cached('totals')
+    def totals(category=None):
+        calls.append(category)
+        return len(calls)
+
+    assert totals('Sports') == 1
+    assert totals('Sports') == 1
+    assert totals('Furniture') == 2
+    assert cache.stats()['views']['totals'] == {'hits': 1, 'misses': 2, 'invalidations': 0, 'hit_rate': 0.3333}
+
+    cache.invalidate('totals', 'unrelated')
+    assert totals('Sports') == 3
+    assert totals('Sports') == 3
+
+    # A third key pushes out the least recently used one
+    totals('Other')
+    totals('Furniture')
+    assert calls == ['Sports', 'Furniture', 'Sports', 'Other', 'Furniture']
+    assert totals.uncached('Sports') == 6
+
+    assert cache.get_or_compute('expired', lambda: len(calls), ttl=0) == 6
+    assert cache.get_or_compute('expired', lambda: 'recomputed', ttl=0) == 'recomputed'
+
+def test_views_follow_writes():
+    """Cached analytics and dashboard data are served again until a write
+    route commits, then recomputed"""
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                with client.session_transaction() as sess:
+                    sess['user_id'] = 1
+                    sess['username'] = 'admin'
+                    sess['is_admin'] = True
+
+                def stock():
+                    data = client.get('/api/analytics?category=Cache+Test').get_json()
+                    return data['stock_trend'][-1]['stock']
+
+                view_cache.clear()
+                product = Product(name='Cache Test Beaker', category='Cache Test', quantity=3, min_stock_level=5)
+                student = Student(full_name='Cache Tester', roll_number='CACHE001', department='Cache Test')
+                db.session.add_all([product, student])
+                record_stock_change('Cache Test', 3, 1)
+                db.session.commit()
+                try:
+                    assert stock() == 3
+                    assert stock() == 3
+                    stats = client.get('/api/cache/stats').get_json()
+                    assert stats['views']['analytics']['hits'] == 1
+
+                    stats = cached_dashboard_stats()
+                    assert cached_dashboard_stats() is stats
+                    assert any(p.name == 'Cache Test Beaker' and p.is_low_stock for p in stats.low_stock_products)
+
+                    client.post(f'/assign_product/{student.id}', json={'product_id': product.id})
+                    assert stock() == 2
+                    recent = cached_dashboard_stats().recent_assignments[0]
+                    assert (recent.product.name, recent.student.full_name) == ('Cache Test Beaker', 'Cache Tester')
+
+                    client.post(f'/return_product/{student.id}')
+                    assert stock() == 3
+                finally:
+                    ProductAssignment.query.filter_by(student_id=student.id).delete()
+                    Student.query.filter_by(department='Cache Test').delete()
+                    Product.query.filter_by(category='Cache Test').delete()
+                    StockSnapshot.query.filter_by(category='Cache Test').delete()
+                    db.session.commit()
+                    view_cache.clear()
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
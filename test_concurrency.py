@@ -0,0 +1,215 @@
+"""
+Test that concurrent assignments cannot oversell the last units of a product
+"""
+
+import threading
+
+from sqlalchemy import event
+
+from app import (app, db, Product, Student, ProductAssignment, compute_inventory_counters,
+                 get_inventory_counters, rebuild_inventory_counters, COUNTER_FIELDS)
+
+STOCK = 5
+STUDENTS = 25
+
+def login(client):
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['username'] = 'admin'
+        sess['is_admin'] = True
+
+def hammer(urls, payload_for, attempts=50):
+    """POST to every url from its own thread and test client at the same
+    time. Requests that fail on a locked database are retried until they
+    get a definitive answer; returns the final status codes."""
+    statuses = [None] * len(urls)
+    barrier = threading.Barrier(len(urls))
+
+    def worker(index, url):
+        with app.test_client() as client:
+            login(client)
+            barrier.wait()
+            for _ in range(attempts):
+                response = client.post(url, json=payload_for(index))
+                statuses[index] = response.status_code
+                if response.status_code != 500:
+                    break
+
+    threads = [threading.Thread(target=worker, args=(i, url)) for i, url in enumerate(urls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses
+
+def test_concurrent_assign_and_return():
+    """Exactly STOCK of STUDENTS simultaneous assignments succeed, the
+    quantity never goes negative, and concurrent returns restore it"""
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.app_context():
+            db.create_all()
+            product = Product(name='Race Kit', quantity=STOCK, min_stock_level=1, category='Sports')
+            db.session.add(product)
+            students = [Student(full_name=f'Race {i}', roll_number=f'RACE{i:03d}', department='Race Test')
+                        for i in range(STUDENTS)]
+            db.session.add_all(students)
+            db.session.commit()
+            rebuild_inventory_counters()
+            db.session.commit()
+            product_id = product.id
+            student_ids = [s.id for s in students]
+            try:
+                statuses = hammer([f'/assign_product/{sid}' for sid in student_ids],
+                                  lambda i: {'product_id': product_id})
+                assert statuses.count(200) == STOCK
+                assert statuses.count(400) == STUDENTS - STOCK
+
+                db.session.expire_all()
+                assert db.session.get(Product, product_id).quantity == 0
+                assert ProductAssignment.query.filter_by(product_id=product_id, status='assigned').count() == STOCK
+                holders = [s.id for s in Student.query.filter_by(product_id=product_id)]
+                assert len(holders) == STOCK
+
+                statuses = hammer([f'/return_product/{sid}' for sid in holders + holders],
+                                  lambda i: {})
+                assert statuses.count(200) == STOCK
+                assert statuses.count(400) == STOCK
+
+                db.session.expire_all()
+                assert db.session.get(Product, product_id).quantity == STOCK
+                assert ProductAssignment.query.filter_by(product_id=product_id, status='assigned').count() == 0
+                counters = get_inventory_counters()
+                db.session.refresh(counters)
+                assert {field: getattr(counters, field) for field in COUNTER_FIELDS} == compute_inventory_counters()
+            finally:
+                ProductAssignment.query.filter(ProductAssignment.student_id.in_(student_ids)).delete()
+                Student.query.filter_by(department='Race Test').delete()
+                Product.query.filter_by(name='Race Kit').delete()
+                db.session.commit()
+                rebuild_inventory_counters()
+                db.session.commit()
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
+
+def test_concurrent_assign_and_return_through_write_coordinator():
+    """The same race with the writes grouped on the single writer thread"""
+    app.config['WRITE_COORDINATOR_ENABLED'] = True
+    try:
+        test_concurrent_assign_and_return()
+    finally:
+        app.config['WRITE_COORDINATOR_ENABLED'] = False
+
+def test_bulk_return_racing_a_single_return():
+    """A return committed between the bulk return's read and its first write
+    is not credited a second time by the bulk return"""
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.app_context():
+            db.create_all()
+            product = Product(name='Race Return Kit', quantity=0, min_stock_level=0, category='Sports')
+            student = Student(full_name='Race Returner', roll_number='RACERET01', department='Race Test')
+            db.session.add_all([product, student])
+            db.session.flush()
+            student.product_id = product.id
+            db.session.add(ProductAssignment(product_id=product.id, student_id=student.id, status='assigned'))
+            db.session.commit()
+            rebuild_inventory_counters()
+            db.session.commit()
+            product_id, student_id = product.id, student.id
+
+            raced = []
+
+            def return_first(conn, cursor, statement, parameters, context, executemany):
+                if raced or not statement.lstrip().upper().startswith('UPDATE'):
+                    return
+                raced.append(True)
+                thread = threading.Thread(target=lambda: raced.append(hammer([f'/return_product/{student_id}'],
+                                                                             lambda i: {})))
+                thread.start()
+                thread.join()
+
+            event.listen(db.engine, 'before_cursor_execute', return_first)
+            try:
+                with app.test_client() as client:
+                    login(client)
+                    response = client.post('/return_product/bulk', json={'student_ids': [student_id]})
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', return_first)
+            try:
+                assert raced == [True, [200]]
+                assert response.status_code == 200
+                assert response.get_json()['returned'] == 0
+                assert response.get_json()['results'] == [{'student_id': student_id, 'status': 'nothing_assigned'}]
+
+                db.session.expire_all()
+                assert db.session.get(Product, product_id).quantity == 1
+                counters = get_inventory_counters()
+                db.session.refresh(counters)
+                assert {field: getattr(counters, field) for field in COUNTER_FIELDS} == compute_inventory_counters()
+            finally:
+                ProductAssignment.query.filter_by(student_id=student_id).delete()
+                Student.query.filter_by(id=student_id).delete()
+                Product.query.filter_by(id=product_id).delete()
+                db.session.commit()
+                rebuild_inventory_counters()
+                db.session.commit()
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
+
+def test_product_edit_racing_an_assignment():
+    """An assignment committed while a product edit is in flight is neither
+    overwritten by the edit's quantity nor lost from the counters"""
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.app_context():
+            db.create_all()
+            product = Product(name='Race Edit Kit', quantity=5, min_stock_level=1, category='Lab Equipment')
+            student = Student(full_name='Race Editor', roll_number='RACEEDIT01', department='Race Test')
+            db.session.add_all([product, student])
+            db.session.commit()
+            rebuild_inventory_counters()
+            db.session.commit()
+            product_id, student_id = product.id, student.id
+
+            raced = []
+
+            def assign_first(conn, cursor, statement, parameters, context, executemany):
+                if raced or not statement.lstrip().upper().startswith('UPDATE'):
+                    return
+                raced.append(True)
+                thread = threading.Thread(target=lambda: raced.append(hammer([f'/assign_product/{student_id}'],
+                                                                             lambda i: {'product_id': product_id})))
+                thread.start()
+                thread.join()
+
+            event.listen(db.engine, 'before_cursor_execute', assign_first)
+            try:
+                with app.test_client() as client:
+                    login(client)
+                    client.post('/update_product', data={
+                        'product_id': product_id,
+                        'name': 'Race Edit Kit',
+                        'category': 'Lab Equipment',
+                        'quantity': 8,
+                        'min_stock_level': 1,
+                    })
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', assign_first)
+            try:
+                assert raced == [True, [200]]
+                db.session.expire_all()
+                assert db.session.get(Product, product_id).quantity == 4
+                assert db.session.get(Student, student_id).product_id == product_id
+                counters = get_inventory_counters()
+                db.session.refresh(counters)
+                assert {field: getattr(counters, field) for field in COUNTER_FIELDS} == compute_inventory_counters()
+            finally:
+                ProductAssignment.query.filter_by(student_id=student_id).delete()
+                Student.query.filter_by(id=student_id).delete()
+                Product.query.filter_by(id=product_id).delete()
+                db.session.commit()
+                rebuild_inventory_counters()
+                db.session.commit()
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
@@ -0,0 +1,90 @@
+"""
+Test that the materialized inventory counters follow every write route
+"""
+
+from app import (app, db, Product, Student, ProductAssignment, compute_inventory_counters,
+                 get_inventory_counters, rebuild_inventory_counters, COUNTER_FIELDS)
+
+def stored_counters():
+    counters = get_inventory_counters()
+    db.session.refresh(counters)
+    return {field: getattr(counters, field) for field in COUNTER_FIELDS}
+
+def test_counters_follow_writes():
+    """Add, update, assign, return and delete a product and compare the
+    counters with the totals computed from the base tables after each step"""
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                rebuild_inventory_counters()
+                db.session.commit()
+
+                with client.session_transaction() as sess:
+                    sess['user_id'] = 1
+                    sess['username'] = 'admin'
+                    sess['is_admin'] = True
+
+                client.post('/add_product', data={
+                    'name': 'Counter Test Kit',
+                    'category': 'Lab Equipment',
+                    'quantity': 6,
+                    'min_stock_level': 5,
+                    'description': 'Created by test_counters'
+                })
+                product = Product.query.filter_by(name='Counter Test Kit').one()
+                assert stored_counters() == compute_inventory_counters()
+
+                client.post('/add_student', data={
+                    'fullName': 'Counter Test Student',
+                    'rollNumber': 'CNTTEST01',
+                    'department': 'QA'
+                })
+                student = Student.query.filter_by(roll_number='CNTTEST01').one()
+                assert stored_counters() == compute_inventory_counters()
+
+                # 6 -> 5 crosses into low stock
+                response = client.post(f'/assign_product/{student.id}', json={'product_id': product.id})
+                assert response.get_json()['success']
+                assert stored_counters() == compute_inventory_counters()
+
+                response = client.post(f'/return_product/{student.id}')
+                assert response.get_json()['success']
+                assert stored_counters() == compute_inventory_counters()
+
+                client.post('/update_product', data={
+                    'product_id': product.id,
+                    'name': 'Counter Test Kit',
+                    'category': 'Lab Equipment',
+                    'quantity': 2,
+                    'min_stock_level': 1,
+                })
+                assert stored_counters() == compute_inventory_counters()
+
+                ProductAssignment.query.filter_by(student_id=student.id).delete()
+                db.session.delete(db.session.get(Student, student.id))
+                db.session.commit()
+                client.post(f'/delete_product/{product.id}')
+                assert db.session.get(Product, product.id) is None
+
+                rebuild_inventory_counters()
+                db.session.commit()
+                assert stored_counters() == compute_inventory_counters()
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
+
+def test_rebuild_reports_drift():
+    """A hand-edited counter is reported and corrected by a rebuild"""
+    with app.app_context():
+        db.create_all()
+        counters = get_inventory_counters()
+        counters.total_quantity += 7
+        db.session.commit()
+
+        drift = rebuild_inventory_counters()
+        db.session.commit()
+
+        stored, actual = drift['total_quantity']
+        assert stored - actual == 7
+        assert stored_counters() == compute_inventory_counters()
@@ -0,0 +1,29 @@
+"""
+Test the database engine profile
+"""
+
+from app import app, db
+from config import Config
+from engine_profile import engine_options
+
+def test_sqlite_connections_get_pragmas():
+    """Every pooled SQLite connection runs in WAL mode and waits for locks"""
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            return
+        with db.engine.connect() as connection:
+            assert connection.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+            assert connection.exec_driver_sql('PRAGMA synchronous').scalar() == 1  # NORMAL
+            assert connection.exec_driver_sql('PRAGMA busy_timeout').scalar() == Config.SQLITE_PRAGMAS['busy_timeout']
+            assert connection.exec_driver_sql('PRAGMA cache_size').scalar() == Config.SQLITE_PRAGMAS['cache_size']
+
+def test_pool_is_sized_per_dialect():
+    """File databases get a pool, in-memory SQLite keeps its single
+    connection, server databases are pinged and recycled"""
+    assert engine_options('sqlite:///inventory.db', pool_size=4)['pool_size'] == 4
+    assert engine_options('sqlite:///inventory.db', busy_timeout=2500)['connect_args'] == {'timeout': 2.5}
+    assert engine_options('sqlite:///:memory:') == {}
+    assert engine_options('sqlite://') == {}
+    postgres = engine_options('postgresql://localhost/inventory', pool_recycle=600)
+    assert postgres['pool_pre_ping'] and postgres['pool_recycle'] == 600
+    assert 'connect_args' not in postgres
@@ -0,0 +1,138 @@
+"""
+Test the bulk product and student import endpoints
+"""
+
+import io
+import json
+
+from app import app, db, Product, Student, import_students, rebuild_inventory_counters
+
+def test_import_products_csv_and_json():
+    """Valid rows are inserted, invalid ones are reported by row number"""
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                with client.session_transaction() as sess:
+                    sess['user_id'] = 1
+                    sess['username'] = 'admin'
+                    sess['is_admin'] = True
+
+                csv_data = (
+                    'Name,Category,Quantity,Min Stock Level,Description\n'
+                    '"Import Kit, large",Sports,12,3,From CSV\n'
+                    'Import Kit small,Sports,-1,3,\n'
+                    'Import Kit medium,Toys,4,2,\n'
+                )
+                response = client.post('/import/products', data={
+                    'file': (io.BytesIO(csv_data.encode('utf-8')), 'kits.csv')
+                }, content_type='multipart/form-data')
+                report = response.get_json()
+                assert report['imported'] == 1
+                assert report['rejected'] == 2
+                assert [error['row'] for error in report['errors']] == [2, 3]
+
+                json_data = json.dumps([
+                    {'name': 'Import Kit json', 'category': 'Sports', 'quantity': 5, 'min_stock_level': 1}
+                ])
+                response = client.post('/import/products', data={
+                    'file': (io.BytesIO(json_data.encode('utf-8')), 'kits.json')
+                }, content_type='multipart/form-data')
+                assert response.get_json()['imported'] == 1
+
+                names = sorted(p.name for p in Product.query.filter(Product.name.like('Import Kit%')))
+                assert names == ['Import Kit json', 'Import Kit, large']
+
+                response = client.post('/import/products', data={
+                    'file': (io.BytesIO(b'x'), 'kits.exe')
+                }, content_type='multipart/form-data')
+                assert response.status_code == 400
+
+                Product.query.filter(Product.name.like('Import Kit%')).delete()
+                db.session.commit()
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
+
+def test_import_students_upserts_on_roll_number():
+    """A second import of the same roll numbers updates instead of duplicating"""
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                with client.session_transaction() as sess:
+                    sess['user_id'] = 1
+                    sess['username'] = 'admin'
+                    sess['is_admin'] = True
+
+                def upload(text):
+                    return client.post('/import/students', data={
+                        'file': (io.BytesIO(text.encode('utf-8')), 'roster.csv')
+                    }, content_type='multipart/form-data').get_json()
+
+                report = upload(
+                    'full_name,roll_number,email,department\n'
+                    'Roster One,ROSTER001,roster1@example.edu,Physics\n'
+                    'Roster Two,ROSTER002,roster2@example.edu,Physics\n'
+                    'X,ROSTER003,,Physics\n'
+                )
+                assert (report['created'], report['updated'], report['rejected']) == (2, 0, 1)
+
+                report = upload(
+                    'Full Name,Roll Number,Email,Department\n'
+                    'Roster One Renamed,ROSTER001,roster1@example.edu,Chemistry\n'
+                    'Roster Four,ROSTER004,roster2@example.edu,Physics\n'
+                    'Roster Five,ROSTER005,,Physics\n'
+                )
+                # ROSTER004 reuses ROSTER002's email and is the only row rejected
+                assert (report['created'], report['updated'], report['rejected']) == (1, 1, 1)
+
+                renamed = Student.query.filter_by(roll_number='ROSTER001').one()
+                assert (renamed.full_name, renamed.department) == ('Roster One Renamed', 'Chemistry')
+                assert Student.query.filter(Student.roll_number.like('ROSTER%')).count() == 3
+
+                Student.query.filter(Student.roll_number.like('ROSTER%')).delete()
+                db.session.commit()
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
+
+def test_import_students_repeated_roll_number():
+    """A roll number repeated in the file is imported once, from its first
+    row, and counted once; the repeats are rejected"""
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                with client.session_transaction() as sess:
+                    sess['user_id'] = 1
+                    sess['username'] = 'admin'
+                    sess['is_admin'] = True
+
+                try:
+                    report = client.post('/import/students', data={'file': (io.BytesIO(
+                        'full_name,roll_number,email,department\n'
+                        'Repeat One,REPEAT001,,Physics\n'
+                        'Repeat One Again,REPEAT001,,Chemistry\n'
+                        'Repeat Two,REPEAT002,,Physics\n'.encode('utf-8')
+                    ), 'roster.csv')}, content_type='multipart/form-data').get_json()
+                    assert (report['created'], report['updated'], report['rejected']) == (2, 0, 1)
+                    assert report['errors'] == [{'row': 2, 'errors': ['roll_number: repeats row 1']}]
+                    student = Student.query.filter_by(roll_number='REPEAT001').one()
+                    assert (student.full_name, student.department) == ('Repeat One', 'Physics')
+
+                    # Also when the repeat lands in a later batch
+                    report = import_students([
+                        {'full_name': 'Repeat Three', 'roll_number': 'REPEAT003', 'department': 'Physics'},
+                        {'full_name': 'Repeat One', 'roll_number': 'REPEAT001', 'department': 'Physics'},
+                        {'full_name': 'Repeat Three Again', 'roll_number': 'REPEAT003', 'department': 'Physics'},
+                    ], batch_size=1)
+                    assert (report['created'], report['updated'], report['rejected']) == (1, 1, 1)
+                finally:
+                    Student.query.filter(Student.roll_number.like('REPEAT%')).delete()
+                    db.session.commit()
+                    rebuild_inventory_counters()
+                    db.session.commit()
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
@@ -0,0 +1,79 @@
+"""
+Test the /metrics endpoint and the slow-query log
+"""
+
+import logging
+
+from app import app, db, instrumentation
+from metrics import parameter_shape
+
+def sample(text, prefix):
+    """Value of the first line of ``text`` starting with ``prefix``."""
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+def test_metrics_endpoint():
+    """Requests, their SQL and cache lookups show up in Prometheus format,
+    and only admins or token holders can read them"""
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            assert client.get('/metrics').status_code == 403
+
+            with client.session_transaction() as sess:
+                sess['user_id'] = 1
+                sess['username'] = 'admin'
+                sess['is_admin'] = True
+            for _ in range(2):
+                assert client.get('/api/search?q=widget&type=products').status_code == 200
+            assert client.get('/api/analytics').status_code == 200
+
+            response = client.get('/metrics')
+            assert response.status_code == 200
+            assert response.mimetype == 'text/plain'
+            text = response.get_data(as_text=True)
+            assert '# TYPE inventory_request_duration_seconds histogram' in text
+            assert sample(text, 'inventory_request_duration_seconds_count{endpoint="api_search",method="GET",status="200"}') >= 2
+            assert sample(text, 'inventory_request_duration_seconds_bucket{endpoint="api_search",method="GET",status="200",le="+Inf"}') >= 2
+            assert sample(text, 'inventory_sql_statements_total{endpoint="api_search"}') >= 2
+            assert sample(text, 'inventory_sql_seconds_total{endpoint="api_search"}') > 0
+            assert sample(text, 'inventory_request_sql_statements_count{endpoint="api_search"}') >= 2
+            assert sample(text, 'inventory_pool_checkout_wait_seconds_count{bind="primary"}') >= 1
+            assert sample(text, 'inventory_cache_misses_total{view="analytics"}') >= 1
+
+    app.config['METRICS_TOKEN'] = 'scrape-secret'
+    try:
+        with app.test_client() as client:
+            assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+            assert client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'}).status_code == 200
+    finally:
+        app.config['METRICS_TOKEN'] = None
+
+def test_slow_query_log(caplog):
+    """Statements over the threshold are logged with the route and the
+    parameter shape, but not the values"""
+    threshold = instrumentation.slow_query_threshold
+    instrumentation.slow_query_threshold = 0
+    try:
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                with client.session_transaction() as sess:
+                    sess['user_id'] = 1
+                    sess['username'] = 'admin'
+                    sess['is_admin'] = True
+                with caplog.at_level(logging.WARNING, logger=app.logger.name):
+                    client.get('/api/search?q=secretvalue&type=products')
+    finally:
+        instrumentation.slow_query_threshold = threshold
+    slow = [record.getMessage() for record in caplog.records if record.getMessage().startswith('Slow query')]
+    assert slow
+    assert any(' in api_search: SELECT' in message for message in slow)
+    assert not any('secretvalue' in message for message in slow)
+
+    assert parameter_shape(()) == 'none'
+    assert parameter_shape((1, 'a')) == '2 positional'
+    assert parameter_shape({'b': 1, 'a': 2}) == '2 named (a, b)'
+    assert parameter_shape([(1, 2), (3, 4)], executemany=True) == '2 rows of 2 positional'
@@ -0,0 +1,60 @@
+"""
+Test on-demand request profiling and the collapsed-stack download
+"""
+
+import time
+
+from app import app, db, profiler
+
+def slow_view():
+    time.sleep(0.05)
+    return 'done'
+
+app.add_url_rule('/_test/slow', 'test_slow_view', slow_view)
+
+def test_profile_with_header_and_sampling():
+    """Admins profile one request with X-Profile, sampling picks requests
+    of the configured endpoints, and the stacks download as collapsed text"""
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                before = len(profiler.profiles())
+
+                # Not an admin: the header is ignored, the settings are off limits
+                client.get('/_test/slow', headers={'X-Profile': '1'})
+                assert len(profiler.profiles()) == before
+                assert client.get('/admin/profiles').status_code == 302
+
+                with client.session_transaction() as sess:
+                    sess['user_id'] = 1
+                    sess['username'] = 'admin'
+                    sess['is_admin'] = True
+                assert client.get('/_test/slow', headers={'X-Profile': '1'}).status_code == 200
+                latest = client.get('/admin/profiles').get_json()['profiles'][0]
+                assert latest['endpoint'] == 'test_slow_view'
+                assert latest['status'] == 200
+                assert latest['duration_ms'] >= 50
+                assert latest['samples'] > 0
+
+                response = client.get(f'/admin/profiles/{latest["id"]}.folded')
+                assert response.status_code == 200
+                assert 'attachment' in response.headers['Content-Disposition']
+                lines = response.get_data(as_text=True).splitlines()
+                assert lines and all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+                assert any(';slow_view (test_profiler.py:' in line for line in lines)
+                assert client.get('/admin/profiles/999999.folded').status_code == 404
+
+                response = client.post('/admin/profiles/settings', json={'sample_rate': 2, 'endpoints': ['test_slow_view']})
+                assert response.get_json()['sample_rate'] == 1.0
+                assert client.post('/admin/profiles/settings', json={'endpoints': ['nope']}).status_code == 400
+                assert client.post('/admin/profiles/settings', json={'sample_rate': 'x'}).status_code == 400
+                count = len(profiler.profiles())
+                client.get('/admin/profiles')
+                assert len(profiler.profiles()) == count
+                client.get('/_test/slow')
+                assert len(profiler.profiles()) == count + 1
+    finally:
+        profiler.configure(sample_rate=0, endpoints=[])
+        app.config['WTF_CSRF_ENABLED'] = True
@@ -0,0 +1,206 @@
+"""
+Query-plan regression tests for the hot queries
+
+Each query below mirrors one issued by a route. The tests ask the database
+for its plan and fail if any of them reads a whole table instead of using
+an index. SQLite is always checked; set QUERY_PLAN_POSTGRES_URL to a
+scratch PostgreSQL database to check the same queries there as well.
+"""
+
+import os
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import (app, db, ActivityLog, Product, ProductAssignment, Student, STORE_SORTS, keyset_filter,
+                 store_sort_key)
+from migrate_indexes import create_missing_indexes
+
+def hot_queries():
+    """name -> statement for every query that must be served by an index"""
+    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    return {
+        # return_product
+        'return_lookup': db.select(ProductAssignment).where(
+            ProductAssignment.student_id == 1, ProductAssignment.product_id == 1, ProductAssignment.is_open
+        ).order_by(ProductAssignment.assigned_date.desc()).limit(1),
+        # delete_product
+        'product_open_assignments': db.select(db.func.count(ProductAssignment.id)).where(
+            ProductAssignment.product_id == 1, ProductAssignment.is_open
+        ),
+        # bulk_return_products
+        'students_open_assignments': db.select(ProductAssignment.id, ProductAssignment.student_id).where(
+            ProductAssignment.student_id.in_([1, 2, 3]), ProductAssignment.is_open
+        ),
+        # compute_inventory_counters
+        'open_assignment_count': db.select(db.func.count(ProductAssignment.id)).where(
+            ProductAssignment.is_open
+        ),
+        # notifications
+        'overdue_assignments': db.select(ProductAssignment).where(
+            ProductAssignment.is_open,
+            ProductAssignment.assigned_date < thirty_days_ago
+        ),
+        # reports
+        'recent_assignment_count': db.select(db.func.count(ProductAssignment.id)).where(
+            ProductAssignment.assigned_date >= thirty_days_ago
+        ),
+        # get_dashboard_stats
+        'latest_assignments': db.select(ProductAssignment.id).order_by(
+            ProductAssignment.assigned_date.desc()
+        ).limit(5),
+        'low_stock_products': db.select(Product).where(Product.is_low_stock).limit(5),
+        # store
+        'products_by_category': db.select(Product).where(Product.category == 'Sports'),
+        # activity_logs, first and later pages, filtered by action
+        'activity_log_page': db.select(ActivityLog).where(ActivityLog.timestamp.isnot(None)).order_by(
+            ActivityLog.timestamp.desc(), ActivityLog.id.desc()
+        ).limit(21),
+        'activity_log_next_page': db.select(ActivityLog).where(
+            ActivityLog.action == 'assign_product',
+            ActivityLog.timestamp.isnot(None),
+            keyset_filter((ActivityLog.timestamp, ActivityLog.id), [thirty_days_ago, 1000], descending=True)
+        ).order_by(ActivityLog.timestamp.desc(), ActivityLog.id.desc()).limit(21),
+        # ... then the entries without a timestamp
+        'activity_log_untimed_page': db.select(ActivityLog).where(
+            ActivityLog.action == 'assign_product',
+            ActivityLog.timestamp.is_(None),
+            keyset_filter((ActivityLog.id,), [1000], descending=True)
+        ).order_by(ActivityLog.id.desc()).limit(21),
+        # store, first and later pages of every sort, with and without a category
+        **store_listing_queries(),
+        # students, first and later pages, whole roster and one department
+        'students_page': db.select(Student).order_by(Student.full_name, Student.id).limit(21),
+        'students_page_next': db.select(Student).where(
+            keyset_filter((Student.full_name, Student.id), ['M', 1000])
+        ).order_by(Student.full_name, Student.id).limit(21),
+        'students_page_in_department': db.select(Student).where(Student.department == 'Physics').order_by(
+            Student.full_name, Student.id
+        ).limit(21),
+        'students_page_in_department_next': db.select(Student).where(
+            Student.department == 'Physics', keyset_filter((Student.full_name, Student.id), ['M', 1000])
+        ).order_by(Student.full_name, Student.id).limit(21),
+        # bulk_assign_product
+        'students_by_department': db.select(Student.id, Student.product_id).where(
+            Student.department == 'Physics'
+        ).order_by(Student.id),
+        # holders of a product
+        'product_holders': db.select(Student.id).where(Student.product_id == 1),
+    }
+
+LISTING_QUERY_PREFIXES = ('store_', 'students_page', 'activity_log_')
+
+def store_listing_queries():
+    """The first and a later page of every store sort, with and without a
+    category filter, in both directions"""
+    queries = {}
+    for sort in STORE_SORTS:
+        after = [3, 1000] if sort == 'quantity' else ['M', 1000]
+        for category in (None, 'Sports'):
+            columns, _ = store_sort_key(sort, category)
+            for descending in (False, True):
+                name = f'store_{sort}{"_in_category" if category else ""}{"_desc" if descending else ""}'
+                statement = db.select(Product).order_by(
+                    *[column.desc() if descending else column for column in columns]
+                ).limit(21)
+                if category:
+                    statement = statement.where(Product.category == category)
+                queries[name] = statement
+                queries[name + '_next'] = statement.where(
+                    keyset_filter(columns, after[-len(columns):], descending)
+                )
+    return queries
+
+def sqlite_plan(connection, statement):
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={'render_postcompile': True})
+    params = compiled.construct_params()
+    args = tuple(params[name] for name in compiled.positiontup)
+    rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), args).all()
+    return [row[-1] for row in rows]
+
+def postgres_plan(connection, statement):
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={'render_postcompile': True})
+    rows = connection.exec_driver_sql('EXPLAIN ' + str(compiled), compiled.params).all()
+    return [row[0] for row in rows]
+
+def full_scans(plan, pattern):
+    tables = set(db.metadata.tables)
+    return [line for line in plan
+            if (match := re.search(pattern, line)) and match.group(1) in tables]
+
+def test_sqlite_hot_queries_use_indexes():
+    """No hot query falls back to a full table scan on SQLite"""
+    with app.app_context():
+        db.create_all()
+        create_missing_indexes()
+        if db.engine.dialect.name != 'sqlite':
+            pytest.skip('the application database is not SQLite')
+
+        regressions = {}
+        with db.engine.connect() as connection:
+            for name, statement in hot_queries().items():
+                plan = sqlite_plan(connection, statement)
+                # "SCAN t" reads the table; "SCAN t USING INDEX" walks an index in order
+                scans = full_scans(plan, r'^SCAN (\w+)$')
+                if scans:
+                    regressions[name] = plan
+        assert not regressions, f'full table scans: {regressions}'
+
+def test_open_assignment_queries_use_partial_indexes():
+    """Lookups of open assignments read only the open-assignment indexes,
+    never the history"""
+    with app.app_context():
+        db.create_all()
+        create_missing_indexes()
+        if db.engine.dialect.name != 'sqlite':
+            pytest.skip('the application database is not SQLite')
+
+        queries = hot_queries()
+        with db.engine.connect() as connection:
+            for name in ['return_lookup', 'product_open_assignments', 'students_open_assignments',
+                         'open_assignment_count', 'overdue_assignments']:
+                plan = sqlite_plan(connection, queries[name])
+                assert any('ix_product_assignments_open_' in line for line in plan), (name, plan)
+
+def test_listing_pages_are_read_in_index_order():
+    """Listing pages walk an index in the requested order instead of
+    sorting the whole (filtered) table for every page"""
+    with app.app_context():
+        db.create_all()
+        create_missing_indexes()
+        if db.engine.dialect.name != 'sqlite':
+            pytest.skip('the application database is not SQLite')
+
+        sorted_pages = {}
+        with db.engine.connect() as connection:
+            for name, statement in hot_queries().items():
+                if not name.startswith(LISTING_QUERY_PREFIXES):
+                    continue
+                plan = sqlite_plan(connection, statement)
+                if any('TEMP B-TREE' in line for line in plan):
+                    sorted_pages[name] = plan
+        assert not sorted_pages, f'sorted per page: {sorted_pages}'
+
+def test_postgres_hot_queries_use_indexes():
+    """Same check against PostgreSQL, when a scratch database is configured"""
+    url = os.environ.get('QUERY_PLAN_POSTGRES_URL')
+    if not url:
+        pytest.skip('QUERY_PLAN_POSTGRES_URL is not set')
+
+    engine = db.create_engine(url)
+    try:
+        db.metadata.create_all(engine)
+        regressions = {}
+        with engine.connect() as connection:
+            # Empty tables are always cheapest to read sequentially; make the
+            # planner show whether an index could be used at all
+            connection.exec_driver_sql('SET enable_seqscan = off')
+            for name, statement in hot_queries().items():
+                plan = postgres_plan(connection, statement)
+                scans = full_scans(plan, r'Seq Scan on (\w+)')
+                if scans:
+                    regressions[name] = plan
+        assert not regressions, f'sequential scans: {regressions}'
+    finally:
+        engine.dispose()
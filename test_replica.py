@@ -0,0 +1,120 @@
+"""
+Test read-replica routing with a second SQLite file as the replica
+"""
+
+import os
+import sqlite3
+import tempfile
+
+from app import (app, db, Product, ProductAssignment, Student, StockSnapshot, rebuild_inventory_counters,
+                 replica_router, take_stock_snapshot)
+
+def test_read_only_views_use_replica_with_fallback():
+    """Exports read from the replica, a user who just wrote reads from the
+    primary, and an unreachable replica falls back to the primary"""
+    path = os.path.join(tempfile.mkdtemp(), 'replica.db')
+    replica = db.create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(replica)
+    with replica.begin() as connection:
+        connection.execute(db.insert(Product), {'name': 'Replica Only Widget', 'quantity': 3, 'min_stock_level': 1})
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                with client.session_transaction() as sess:
+                    sess['user_id'] = 1
+                    sess['username'] = 'admin'
+                    sess['is_admin'] = True
+
+                def exported():
+                    response = client.get('/export/products')
+                    assert response.status_code == 200
+                    return response.get_data(as_text=True)
+
+                replica_router.configure(replica)
+                try:
+                    assert 'Replica Only Widget' in exported()
+                    # Views that are not marked read-only stay on the primary
+                    found = client.get('/api/search?q=replica+only&type=products').get_json()['products']
+                    assert found == []
+
+                    client.post('/add_product', data={
+                        'name': 'Replica Sticky Gadget', 'category': 'Other',
+                        'quantity': 2, 'min_stock_level': 1, 'description': ''
+                    })
+                    csv = exported()
+                    assert 'Replica Sticky Gadget' in csv and 'Replica Only Widget' not in csv
+
+                    with client.session_transaction() as sess:
+                        sess['primary_until'] = 0
+                    assert 'Replica Only Widget' in exported()
+
+                    replica_router.configure(db.create_engine(f'sqlite:///{path}-missing-dir/replica.db'))
+                    csv = exported()
+                    assert 'Replica Sticky Gadget' in csv and 'Replica Only Widget' not in csv
+                finally:
+                    replica_router.configure(None)
+                    db.session.info.pop('replica_router', None)
+                    Product.query.filter_by(name='Replica Sticky Gadget').delete()
+                    db.session.commit()
+                    rebuild_inventory_counters()
+                    db.session.commit()
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
+        replica.dispose()
+        os.remove(path)
+
+def login(client):
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['username'] = 'admin'
+        sess['is_admin'] = True
+
+def test_cached_replica_reads_do_not_reach_the_writer():
+    """Another user filling the view cache from the lagging replica right
+    after a write does not hand the writer a result from before it"""
+    path = os.path.join(tempfile.mkdtemp(), 'replica.db')
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.app_context():
+            db.create_all()
+            product = Product(name='Replica Cache Kit', category='Replica Cache Test', quantity=50, min_stock_level=1)
+            student = Student(full_name='Replica Cache Writer', roll_number='REPLCACHE01', department='Replica Test')
+            db.session.add_all([product, student])
+            db.session.commit()
+            take_stock_snapshot()
+            rebuild_inventory_counters()
+            db.session.commit()
+            product_id, student_id = product.id, student.id
+            # The replica is a copy taken now and never catches up
+            source = sqlite3.connect(db.engine.url.database)
+            copy = sqlite3.connect(path)
+            source.backup(copy)
+            copy.close()
+            source.close()
+            replica = db.create_engine(f'sqlite:///{path}')
+            replica_router.configure(replica)
+            try:
+                url = '/api/analytics?category=Replica+Cache+Test'
+                writer, reader = app.test_client(), app.test_client()
+                login(writer)
+                login(reader)
+                response = writer.post(f'/assign_product/{student_id}', json={'product_id': product_id})
+                assert response.status_code == 200
+                assert reader.get(url).get_json()['stock_trend'][-1]['stock'] == 50
+                assert writer.get(url).get_json()['stock_trend'][-1]['stock'] == 49
+            finally:
+                replica_router.configure(None)
+                replica.dispose()
+                db.session.info.pop('replica_router', None)
+                ProductAssignment.query.filter_by(student_id=student_id).delete()
+                Student.query.filter_by(id=student_id).delete()
+                Product.query.filter_by(id=product_id).delete()
+                StockSnapshot.query.filter_by(category='Replica Cache Test').delete()
+                db.session.commit()
+                rebuild_inventory_counters()
+                db.session.commit()
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
+        os.remove(path)
@@ -2,7 +2,14 @@
 Test the reports page functionality
 """
 
-from app import app, db, Product, Student, ProductAssignment
+from sqlalchemy import event
+
+from datetime import datetime, timedelta
+
+import io
+
+from app import (app, db, Product, Student, ProductAssignment, StockSnapshot, rebuild_inventory_counters,
+                 category_stocks, stock_buckets, take_stock_snapshot)
 
 def test_reports_page():
     """Test that reports page loads with all data"""
@@ -106,6 +113,193 @@ def test_export_routes():
             
             return products_ok and students_ok
 
+def test_analytics_history():
+    """The stock trend comes from recorded snapshots, carrying the last
+    known value forward through days without movements"""
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            with client.session_transaction() as sess:
+                sess['user_id'] = 1
+                sess['username'] = 'admin'
+                sess['is_admin'] = True
+            
+            day = datetime(2024, 1, 10)
+            db.session.add_all([
+                StockSnapshot(granularity='day', bucket=day - timedelta(days=5), category='Analytics Test',
+                              total_quantity=40, product_count=2),
+                StockSnapshot(granularity='day', bucket=day + timedelta(days=2), category='Analytics Test',
+                              total_quantity=35, product_count=2),
+            ])
+            db.session.commit()
+            try:
+                response = client.get('/api/analytics?category=Analytics+Test&start=2024-01-10&end=2024-01-14')
+                trend = response.get_json()['stock_trend']
+                assert [point['date'] for point in trend] == [
+                    '2024-01-10', '2024-01-11', '2024-01-12', '2024-01-13', '2024-01-14'
+                ]
+                assert [point['stock'] for point in trend] == [40, 40, 35, 35, 35]
+                
+                response = client.get('/api/analytics?start=2024-01-14&end=2024-01-10')
+                assert response.status_code == 400
+            finally:
+                StockSnapshot.query.filter_by(category='Analytics Test').delete()
+                db.session.commit()
+
+def test_analytics_counts_categories_without_movements():
+    """Categories that have not moved still count: at their current total
+    before any snapshot, then through the seeding of a new bucket"""
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                with client.session_transaction() as sess:
+                    sess['user_id'] = 1
+                    sess['username'] = 'admin'
+                    sess['is_admin'] = True
+                
+                # Loaded directly, like init_database.py does: no stock history
+                steady = Product(name='Analytics Steady', category='Analytics Steady', quantity=100, min_stock_level=1)
+                moving = Product(name='Analytics Moving', category='Analytics Moving', quantity=50, min_stock_level=1)
+                student = Student(full_name='Analytics Student', roll_number='ANALYTICS01', department='Analytics Test')
+                db.session.add_all([steady, moving, student])
+                db.session.commit()
+                rebuild_inventory_counters()
+                db.session.commit()
+                
+                def today():
+                    response = client.get('/api/analytics?by_category=1')
+                    categories = response.get_json()['stock_trend'][-1]['categories']
+                    return categories.get('Analytics Steady'), categories.get('Analytics Moving')
+                
+                try:
+                    assert today() == (100, 50)
+                    
+                    response = client.post(f'/assign_product/{student.id}', json={'product_id': moving.id})
+                    assert response.status_code == 200
+                    assert today() == (100, 49)
+                    seeded = StockSnapshot.query.filter_by(category='Analytics Steady', granularity='day').one()
+                    assert seeded.total_quantity == 100
+                finally:
+                    ProductAssignment.query.filter_by(student_id=student.id).delete()
+                    Student.query.filter_by(id=student.id).delete()
+                    Product.query.filter(Product.category.in_(['Analytics Steady', 'Analytics Moving'])).delete()
+                    StockSnapshot.query.filter(
+                        StockSnapshot.category.in_(['Analytics Steady', 'Analytics Moving'])
+                    ).delete()
+                    db.session.commit()
+                    rebuild_inventory_counters()
+                    db.session.commit()
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
+
+def test_stock_snapshots_of_several_categories_in_a_new_bucket():
+    """Movements of several categories recorded together in a bucket that
+    is seeded by them are each counted once"""
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                with client.session_transaction() as sess:
+                    sess['user_id'] = 1
+                    sess['username'] = 'admin'
+                    sess['is_admin'] = True
+                
+                def current_buckets():
+                    return db.or_(*[db.and_(StockSnapshot.granularity == granularity, StockSnapshot.bucket == bucket)
+                                    for granularity, bucket in stock_buckets()])
+                
+                def assert_buckets_match_stock():
+                    stocks = category_stocks()
+                    rows = StockSnapshot.query.filter(current_buckets()).all()
+                    assert rows
+                    for row in rows:
+                        assert (row.total_quantity, row.product_count) == stocks.get(row.category, (0, 0)), row.category
+                
+                StockSnapshot.query.filter(current_buckets()).delete()
+                db.session.commit()
+                try:
+                    csv_data = (
+                        'Name,Category,Quantity,Min Stock Level,Description\n'
+                        'Snapshot Kit ball,Sports,10,1,\n'
+                        'Snapshot Kit desk,Furniture,7,1,\n'
+                        'Snapshot Kit misc,Other,3,1,\n'
+                    )
+                    response = client.post('/import/products', data={
+                        'file': (io.BytesIO(csv_data.encode('utf-8')), 'kits.csv')
+                    }, content_type='multipart/form-data')
+                    assert response.get_json()['imported'] == 3
+                    assert_buckets_match_stock()
+                    
+                    desk = Product.query.filter_by(name='Snapshot Kit desk').one()
+                    client.post('/update_product', data={
+                        'product_id': desk.id,
+                        'name': desk.name,
+                        'category': 'Lab Equipment',
+                        'quantity': 9,
+                        'min_stock_level': 1,
+                    })
+                    assert db.session.get(Product, desk.id).category == 'Lab Equipment'
+                    assert_buckets_match_stock()
+                finally:
+                    Product.query.filter(Product.name.like('Snapshot Kit%')).delete()
+                    db.session.commit()
+                    take_stock_snapshot()
+                    rebuild_inventory_counters()
+                    db.session.commit()
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
+
+def test_export_students_query_count():
+    """The students export runs the same number of statements no matter how
+    many students hold a product (no per-row lazy loads)"""
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            with client.session_transaction() as sess:
+                sess['user_id'] = 1
+                sess['username'] = 'admin'
+                sess['is_admin'] = True
+            
+            def export_statement_count():
+                statements = []
+                def on_execute(conn, cursor, statement, parameters, context, executemany):
+                    statements.append(statement)
+                event.listen(db.engine, 'before_cursor_execute', on_execute)
+                try:
+                    response = client.get('/export/students')
+                    body = response.get_data(as_text=True)
+                finally:
+                    event.remove(db.engine, 'before_cursor_execute', on_execute)
+                return len(statements), body
+            
+            try:
+                for batch in range(2):
+                    product = Product(name=f'Export Kit, batch {batch}', quantity=5, min_stock_level=1)
+                    db.session.add(product)
+                    db.session.flush()
+                    db.session.add_all([
+                        Student(full_name=f'Export "Test" {batch}-{i}', roll_number=f'EXP{batch}{i:03d}',
+                                department='Export Test', product_id=product.id)
+                        for i in range(10)
+                    ])
+                    db.session.commit()
+                    if batch == 0:
+                        first_count, _ = export_statement_count()
+                
+                second_count, body = export_statement_count()
+                print(f"Statements for 10 vs 20 assigned students: {first_count} vs {second_count}")
+                assert first_count == second_count
+                # Names with commas and quotes survive the round trip
+                assert '"Export Kit, batch 1"' in body
+                assert '"Export ""Test"" 1-9"' in body
+            finally:
+                Student.query.filter_by(department='Export Test').delete()
+                Product.query.filter(Product.name.like('Export Kit, batch %')).delete()
+                db.session.commit()
+
 if __name__ == '__main__':
     print("\n" + "="*60)
     print("REPORTS PAGE TESTING")
@@ -0,0 +1,52 @@
+"""
+Test the full-text search endpoint and its sync with the base tables
+"""
+
+from app import app, db, Product, Student
+
+def test_search_follows_inserts_updates_and_deletes():
+    """Completed words and a trailing prefix match across columns, and edits
+    made through the ORM or bulk Core statements are searchable immediately"""
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            with client.session_transaction() as sess:
+                sess['user_id'] = 1
+                sess['username'] = 'admin'
+                sess['is_admin'] = True
+
+            def search(q, kind=None):
+                url = f'/api/search?q={q}' + (f'&type={kind}' if kind else '')
+                return client.get(url).get_json()
+
+            product = Product(name='Zephyrite Microscope', description='Binocular, 40x zoom',
+                              quantity=3, min_stock_level=1, category='Lab Equipment')
+            db.session.add(product)
+            db.session.execute(db.insert(Student), [
+                {'full_name': 'Quillon Zephyrine', 'roll_number': 'ZEPH001', 'email': 'quillon@example.edu',
+                 'department': 'Physics'},
+            ])
+            db.session.commit()
+            try:
+                assert [p['name'] for p in search('zephyrite micro', 'products')['products']] == ['Zephyrite Microscope']
+                assert [p['name'] for p in search('binoc')['products']] == ['Zephyrite Microscope']
+                assert [s['roll_number'] for s in search('zeph')['students']] == ['ZEPH001']
+                assert search('zeph micro', 'products')['products'] == []
+                assert 'students' not in search('zeph', 'products')
+                assert search('"zeph*(')['products'][0]['name'] == 'Zephyrite Microscope'
+                assert search('')['products'] == []
+
+                product.name = 'Xanthic Telescope'
+                db.session.commit()
+                assert search('zephyrite', 'products')['products'] == []
+                assert [p['id'] for p in search('xanth', 'products')['products']] == [product.id]
+
+                Student.query.filter_by(roll_number='ZEPH001').delete()
+                db.session.delete(product)
+                db.session.commit()
+                assert search('xanth')['products'] == []
+                assert search('zeph')['students'] == []
+            finally:
+                Student.query.filter_by(roll_number='ZEPH001').delete()
+                Product.query.filter(Product.name.in_(['Zephyrite Microscope', 'Xanthic Telescope'])).delete()
+                db.session.commit()
@@ -0,0 +1,74 @@
+"""
+Test that the students page loads in a constant number of queries
+"""
+
+from sqlalchemy import event
+
+from app import app, db, Product, Student, load_students_page
+
+def count_statements(fn):
+    """Run fn and return how many SQL statements it executed"""
+    statements = []
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', on_execute)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', on_execute)
+    return len(statements)
+
+def render_page(per_page):
+    """Load a page and touch what the template reads for every row"""
+    students, _ = load_students_page(department='N+1 Test Dept', per_page=per_page)
+    for student in students:
+        if student.current_product:
+            student.current_product.name
+    db.session.expunge_all()
+    return students
+
+def test_students_page_query_count_is_constant():
+    """A page of 5 and a page of 30 students cost the same number of queries"""
+    with app.app_context():
+        db.create_all()
+        products = [Product(name=f'N+1 Kit {i}', quantity=10, min_stock_level=1) for i in range(10)]
+        db.session.add_all(products)
+        db.session.flush()
+        db.session.add_all([
+            Student(full_name=f'N+1 Student {i:02d}', roll_number=f'NPLUS{i:03d}',
+                    department='N+1 Test Dept', product_id=products[i % 10].id)
+            for i in range(30)
+        ])
+        db.session.commit()
+        try:
+            small = count_statements(lambda: render_page(5))
+            large = count_statements(lambda: render_page(30))
+            assert small == large
+            assert len(render_page(30)) == 30
+        finally:
+            Student.query.filter_by(department='N+1 Test Dept').delete()
+            Product.query.filter(Product.name.like('N+1 Kit %')).delete()
+            db.session.commit()
+
+def test_available_products_endpoint():
+    """The picker endpoint only lists in-stock products matching the prefix"""
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            with client.session_transaction() as sess:
+                sess['user_id'] = 1
+                sess['username'] = 'admin'
+                sess['is_admin'] = True
+
+            db.session.add_all([
+                Product(name='Picker Alpha', quantity=3, min_stock_level=1),
+                Product(name='Picker Empty', quantity=0, min_stock_level=1)
+            ])
+            db.session.commit()
+            try:
+                response = client.get('/api/products/available?q=Picker')
+                names = [p['name'] for p in response.get_json()['products']]
+                assert names == ['Picker Alpha']
+            finally:
+                Product.query.filter(Product.name.like('Picker %')).delete()
+                db.session.commit()
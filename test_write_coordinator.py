@@ -0,0 +1,58 @@
+"""
+Test the single-writer queue with group commit
+"""
+
+import os
+import tempfile
+import threading
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from write_coordinator import WriteCoordinator
+
+def test_operations_share_transactions_but_fail_alone():
+    """Concurrent submissions are committed in fewer transactions than
+    operations, and a failing operation only rolls back its own changes"""
+    path = os.path.join(tempfile.mkdtemp(), 'writer.db')
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as connection:
+        connection.exec_driver_sql('CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT NOT NULL)')
+    session = Session(engine)
+    coordinator = WriteCoordinator(lambda: session, max_batch=50, max_delay=0.05)
+
+    def insert(name):
+        session.execute(text('INSERT INTO items (name) VALUES (:name)'), {'name': name})
+        if name == 'bad':
+            raise ValueError(name)
+        return name
+
+    names = [f'item {i}' for i in range(20)] + ['bad']
+    outcomes = {}
+    barrier = threading.Barrier(len(names))
+
+    def client(name):
+        barrier.wait()
+        try:
+            outcomes[name] = coordinator.run(insert, name, timeout=10)
+        except ValueError as e:
+            outcomes[name] = e
+
+    threads = [threading.Thread(target=client, args=(name,)) for name in names]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    coordinator.close()
+    try:
+        assert isinstance(outcomes.pop('bad'), ValueError)
+        assert outcomes == {name: name for name in names[:-1]}
+        assert coordinator.operations == 20
+        assert coordinator.transactions < coordinator.operations
+        with engine.connect() as connection:
+            stored = connection.exec_driver_sql('SELECT name FROM items').scalars().all()
+        assert sorted(stored) == sorted(names[:-1])
+    finally:
+        session.close()
+        engine.dispose()
+        os.remove(path)
@@ -0,0 +1,152 @@
+"""
+Single writer thread with group commit
+
+SQLite has one write lock per database. When every request thread takes
+it for a transaction of its own, the threads queue on the lock with
+busy_timeout sleeps in between, and every commit pays its own sync.
+WriteCoordinator runs write operations on one dedicated thread instead:
+operations queue up while the current transaction commits, and the writer
+runs the next few in a single transaction (group commit), each inside a
+SAVEPOINT so a failing operation is rolled back on its own. Reads do not
+go through the coordinator and stay concurrent, which WAL mode allows.
+
+An operation is a plain function, run on the writer thread against that
+thread's session. submit() returns a Future and run() waits for it; either
+way the result is only delivered once the transaction it was part of has
+committed, so callers get the same guarantee as from their own commit.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import nullcontext
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class WriteCoordinator:
+    """Run submitted write operations in batched transactions on one thread.
+
+    ``get_session()`` returns the session operations use and is called on
+    the writer thread, inside ``context()`` when given (app.py passes
+    ``app.app_context`` so that thread gets a db.session of its own).
+    """
+
+    def __init__(self, get_session, context=None, max_batch=50, max_delay=0.002):
+        self.get_session = get_session
+        self.context = context
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.operations = 0
+        self.transactions = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def submit(self, fn, *args):
+        """Queue ``fn(*args)``; returns a Future for its result."""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('The write coordinator has been closed')
+            if self._thread is None:
+                self._start()
+        self._queue.put((fn, args, future))
+        return future
+
+    def run(self, fn, *args, timeout=None):
+        """Run ``fn(*args)`` on the writer thread and return its result once
+        committed, re-raising its exception if it failed.
+
+        Called from an operation (i.e. on the writer thread) it runs
+        straight away as part of the current transaction.
+        """
+        if threading.current_thread() is self._thread:
+            return fn(*args)
+        return self.submit(fn, *args).result(timeout)
+
+    def close(self, timeout=10):
+        """Run what is already queued, then stop the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='write-coordinator', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _next_batch(self):
+        """Wait for an operation, then gather whatever else arrives within
+        max_delay, up to max_batch. Returns (batch, stop)."""
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        with self.context() if self.context else nullcontext():
+            stop = False
+            while not stop:
+                batch, stop = self._next_batch()
+                if batch:
+                    try:
+                        self._execute(batch)
+                    except Exception:
+                        logger.exception('Unexpected error in the write coordinator thread')
+
+    def _execute(self, batch):
+        session = self.get_session()
+        done = []
+        try:
+            if session.get_bind().dialect.name == 'sqlite':
+                # Take the write lock up front: a deferred transaction that
+                # reads first can fail to upgrade without waiting. It also
+                # makes pysqlite nest the savepoints in this transaction
+                # instead of committing each one on release.
+                session.connection().exec_driver_sql('BEGIN IMMEDIATE')
+            for fn, args, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with session.begin_nested():
+                        done.append((future, fn(*args)))
+                except Exception as e:
+                    future.set_exception(e)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            for future, _ in done:
+                future.set_exception(e)
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.operations += len(done)
+        self.transactions += 1
+        for future, result in done:
+            future.set_result(result)